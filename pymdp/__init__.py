@@ -1,4 +1,7 @@
 from . import agent
+from . import vector_agent
+from . import model
+from . import io
 from . import envs
 from . import utils
 from . import maths
@@ -8,3 +11,13 @@ from . import learning
 from . import algos
 from . import default_models
 from . import jax
+
+# submodules that are only imported on first access: `viz` depends on the (slow to import) plotting libraries, `rollout` and `parallel` on
+# `multiprocessing` (and `concurrent.futures`), and `serving` on `asyncio`, which most uses of the package don't need
+_LAZY_SUBMODULES = ["viz", "rollout", "serving", "parallel"]
+
+def __getattr__(name):
+    if name in _LAZY_SUBMODULES:
+        import importlib
+        return importlib.import_module("." + name, __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
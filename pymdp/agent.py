@@ -60,9 +60,12 @@ class Agent(object):
         factors_to_learn="all",
         lr_pB=1.0,
         lr_pD=1.0,
+        learning_flush_interval=None,
         use_BMA=True,
         policy_sep_prior=False,
         save_belief_hist=False,
+        belief_hist_len=None,
+        belief_hist_dir=None,
         A_factor_list=None,
         B_factor_list=None,
         sophisticated=False,
@@ -72,6 +75,7 @@ class Agent(object):
         si_prune_penalty=512,
         ii_depth=10,
         ii_threshold=1/16,
+        ii_sparse=False,
     ):
 
         ### Constant parameters ###
@@ -92,6 +96,7 @@ class Agent(object):
         self.factors_to_learn = factors_to_learn
         self.lr_pB = lr_pB
         self.lr_pD = lr_pD
+        self.learning_flush_interval = learning_flush_interval # if not `None`, updates of `pA` and `pB` are buffered and applied every `learning_flush_interval` timesteps
 
         # sophisticated inference parameters
         self.sophisticated = sophisticated
@@ -103,7 +108,7 @@ class Agent(object):
         self.si_prune_penalty = si_prune_penalty
 
         # Initialise observation model (A matrices)
-        if not isinstance(A, np.ndarray):
+        if not isinstance(A, (np.ndarray, utils.Ragged)):
             raise TypeError(
                 'A matrix must be a numpy array'
             )
@@ -117,10 +122,10 @@ class Agent(object):
         self.num_modalities = len(self.num_obs)
 
         # Assigning prior parameters on observation model (pA matrices)
-        self.pA = pA
+        self.pA = utils.to_obj_array(pA) if isinstance(pA, utils.Ragged) else pA
 
         # Initialise transition model (B matrices)
-        if not isinstance(B, np.ndarray):
+        if not isinstance(B, (np.ndarray, utils.Ragged)):
             raise TypeError(
                 'B matrix must be a numpy array'
             )
@@ -134,7 +139,7 @@ class Agent(object):
         self.num_factors = len(self.num_states)
 
         # Assigning prior parameters on transition model (pB matrices) 
-        self.pB = pB
+        self.pB = utils.to_obj_array(pB) if isinstance(pB, utils.Ragged) else pB
 
         # If no `num_controls` are given, then this is inferred from the shapes of the input B matrices
         if num_controls == None:
@@ -218,7 +223,7 @@ class Agent(object):
         # Construct prior preferences (uniform if not specified)
 
         if C is not None:
-            if not isinstance(C, np.ndarray):
+            if not isinstance(C, (np.ndarray, utils.Ragged)):
                 raise TypeError(
                     'C vector must be a numpy array'
                 )
@@ -234,7 +239,7 @@ class Agent(object):
         # Construct prior over hidden states (uniform if not specified)
     
         if D is not None:
-            if not isinstance(D, np.ndarray):
+            if not isinstance(D, (np.ndarray, utils.Ragged)):
                 raise TypeError(
                     'D vector must be a numpy array'
                 )
@@ -253,7 +258,11 @@ class Agent(object):
         assert utils.is_normalized(self.D), "D vector is not normalized (i.e. D[f].sum() must all equal 1.0 for all factors)"
 
         # Assigning prior parameters on initial hidden states (pD vectors)
-        self.pD = pD
+        self.pD = utils.to_obj_array(pD) if isinstance(pD, utils.Ragged) else pD
+
+        # the Dirichlet parameters before learning, used to score reductions of the model (see `Agent.reduce_model`)
+        self._pB_prior = self.pB
+        self._pD_prior = self.pD
 
         # Construct prior over policies (uniform if not specified) 
         if E is not None:
@@ -269,12 +278,12 @@ class Agent(object):
             self.E = self._construct_E_prior()
         
         # Construct I for backwards induction (if H specified)
-        if H is not None:
-            self.H = H
-            self.I = control.backwards_induction(H, B, B_factor_list, threshold=ii_threshold, depth=ii_depth)
-        else:
-            self.H = None
-            self.I = None
+        self.ii_depth = ii_depth
+        self.ii_threshold = ii_threshold
+        self.ii_sparse = ii_sparse # whether the reachability matrices of backwards induction are stored as `scipy.sparse` matrices
+        self.H = H
+        self.I = None
+        self._update_I(range(self.num_factors))
 
         self.edge_handling_params = {}
         self.edge_handling_params['use_BMA'] = use_BMA # creates a 'D-like' moving prior
@@ -306,15 +315,173 @@ class Agent(object):
             self.inference_horizon = inference_horizon
 
         if save_belief_hist:
-            self.qs_hist = []
-            self.q_pi_hist = []
+            self._init_belief_hist(belief_hist_len, belief_hist_dir)
         
         self.prev_obs = []
+        self._owned_arrays = {} # sub-arrays of the generative model that are private to this agent, and can therefore be updated in-place by learning
+        self._B_by_action = None # cached action-major copy of `B`, see `Agent._get_B_by_action`
         self.reset()
         
         self.action = None
         self.prev_actions = None
 
+    @classmethod
+    def from_shared_model(cls, model, **kwargs):
+        """
+        Constructs an ``Agent`` whose generative model references the read-only arrays of a ``model.SharedModel``, rather than owning copies of them.
+        Learning is copy-on-write: only the sub-arrays of the modalities and factors that the agent updates are replaced by arrays of its own.
+
+        Parameters
+        ----------
+        model: ``model.SharedModel``
+            The shared generative model
+        **kwargs: keyword arguments
+            Any other arguments to the ``Agent`` constructor (e.g. ``policy_len``, ``lr_pA``, ``modalities_to_learn``)
+
+        Returns
+        ----------
+        agent: ``Agent``
+            The agent, referencing the shared model arrays
+        """
+
+        params = model.agent_params()
+        params.update(kwargs)
+
+        return cls(**params)
+
+    @classmethod
+    def from_shared_memory(cls, handle, **kwargs):
+        """
+        Constructs an ``Agent`` from a generative model stored in shared memory by a ``parallel.SharedMemoryModel``, e.g. in a worker process
+        that received the (picklable) handle of the model. The agent references read-only views onto the shared memory, rather than owning copies
+        of the arrays, and learning is copy-on-write (as with ``Agent.from_shared_model``).
+
+        Parameters
+        ----------
+        handle: ``parallel.ModelHandle``
+            Handle of the shared generative model
+        **kwargs: keyword arguments
+            Any other arguments to the ``Agent`` constructor (e.g. ``policy_len``, ``lr_pA``, ``modalities_to_learn``)
+
+        Returns
+        ----------
+        agent: ``Agent``
+            The agent, referencing the shared model arrays
+        """
+
+        params = handle.attach()
+        params.update(kwargs)
+
+        return cls(**params)
+
+    @classmethod
+    def from_sparsified_model(cls, A, B, pA=None, pB=None, A_factor_list=None, B_factor_list=None, **kwargs):
+        """
+        Constructs an ``Agent`` from a generative model whose arrays may be conditioned on more hidden state factors than they actually depend on
+        (e.g. fully connected ones, with ``A_factor_list=None``). The factors that each modality and the dynamics of each factor depend on are detected
+        with ``utils.sparsify_factor_lists``, and the agent is constructed with the reduced arrays and the minimal ``A_factor_list`` and ``B_factor_list``,
+        so that all contractions during inference, planning and learning only involve the factors that matter.
+
+        Parameters
+        ----------
+        A: ``numpy.ndarray`` of dtype object
+            Sensory likelihood mapping or 'observation model'
+        B: ``numpy.ndarray`` of dtype object
+            Dynamics likelihood mapping or 'transition model'
+        pA: ``numpy.ndarray`` of dtype object, default ``None``
+            Dirichlet parameters over the observation model (same shape as ``A``)
+        pB: ``numpy.ndarray`` of dtype object, default ``None``
+            Dirichlet parameters over the transition model (same shape as ``B``)
+        A_factor_list: ``list`` of ``list`` of ``int``, default ``None``
+            The hidden state factors that the modalities of ``A`` are conditioned on (defaults to all factors)
+        B_factor_list: ``list`` of ``list`` of ``int``, default ``None``
+            The hidden state factors that the dynamics in ``B`` are conditioned on (defaults to each factor itself)
+        **kwargs: keyword arguments
+            Any other arguments to the ``Agent`` constructor
+
+        Returns
+        ----------
+        agent: ``Agent``
+            The agent, with the reduced generative model
+        """
+
+        A, B, pA, pB, A_factor_list, B_factor_list = utils.sparsify_factor_lists(
+            A, B, A_factor_list=A_factor_list, B_factor_list=B_factor_list, pA=pA, pB=pB
+        )
+
+        return cls(A=A, B=B, pA=pA, pB=pB, A_factor_list=A_factor_list, B_factor_list=B_factor_list, **kwargs)
+
+    # constructor arguments that only set attributes of the agent, and can therefore be given per-agent in `Agent.from_compiled`
+    _COMPILED_AGENT_PARAMS = {
+        "gamma", "alpha", "use_utility", "use_states_info_gain", "use_param_info_gain", "action_selection", "sampling_mode",
+        "inference_params", "modalities_to_learn", "lr_pA", "factors_to_learn", "lr_pB", "lr_pD",
+        "learning_flush_interval", "save_belief_hist", "belief_hist_len", "belief_hist_dir",
+    }
+
+    @classmethod
+    def from_compiled(cls, model, **kwargs):
+        """
+        Constructs an ``Agent`` from a ``model.CompiledModel``, without re-running the validation of the generative model or re-constructing
+        the policies, factor lists and Markov blankets, all of which are computed once when the model is compiled.
+        As with ``Agent.from_shared_model``, the agent references the read-only arrays of the model, and learning is copy-on-write.
+
+        Parameters
+        ----------
+        model: ``model.CompiledModel``
+            The compiled generative model
+        **kwargs: keyword arguments
+            Per-agent arguments to the ``Agent`` constructor that do not change the structure of the model: ``gamma``, ``alpha``,
+            ``use_utility``, ``use_states_info_gain``, ``use_param_info_gain``, ``action_selection``, ``sampling_mode``, ``inference_params``,
+            ``modalities_to_learn``, ``lr_pA``, ``factors_to_learn``, ``lr_pB``, ``lr_pD``, ``learning_flush_interval``, ``save_belief_hist``, ``belief_hist_len`` and ``belief_hist_dir``.
+            Defaults to the values the model was compiled with.
+
+        Returns
+        ----------
+        agent: ``Agent``
+            The agent, referencing the compiled model
+        """
+
+        unknown = set(kwargs) - cls._COMPILED_AGENT_PARAMS
+        if unknown:
+            raise ValueError(
+                f"Cannot override {sorted(unknown)} in `Agent.from_compiled`, since they change the structure of the model: compile a new `CompiledModel` instead"
+            )
+
+        hist_params = {name: kwargs.pop(name, default) for name, default in model.belief_hist_params.items()}
+
+        agent = cls.__new__(cls)
+        agent.__dict__.update(model.agent_state())
+        for name, value in kwargs.items():
+            setattr(agent, name, value)
+        if agent.inference_params is None:
+            agent.inference_params = agent._get_default_params()
+
+        if hist_params["save_belief_hist"]:
+            agent._init_belief_hist(hist_params["belief_hist_len"], hist_params["belief_hist_dir"])
+
+        agent.prev_obs = []
+        agent._owned_arrays = {}
+        agent._init_beliefs()
+
+        agent.action = None
+        agent.prev_actions = None
+
+        return agent
+
+    def _init_belief_hist(self, belief_hist_len=None, belief_hist_dir=None):
+        """
+        Allocates the histories of posterior beliefs about hidden states and policies
+        """
+
+        # beliefs are stored in preallocated ring buffers, retaining the latest `belief_hist_len` timesteps (or all of them, if `None`)
+        if self.inference_algo == "VANILLA":
+            max_shapes = [(ns,) for ns in self.num_states]
+        else:
+            max_shapes = [(len(self.policies), self.inference_horizon + self.policy_len + 1, ns) for ns in self.num_states]
+        self.qs_hist = utils.BeliefHistory(max_shapes, maxlen=belief_hist_len, memmap_dir=belief_hist_dir)
+        self.q_pi_hist = []
+        self._q_pi_hist_offset = 0 # number of (oldest) entries of `q_pi_hist` that have been discarded
+
     def _construct_C_prior(self):
         
         C = utils.obj_array_zeros(self.num_obs)
@@ -353,13 +520,31 @@ class Agent(object):
 
         Returns
         ---------
-        qs: ``numpy.ndarray`` of dtype object
+        qs: ``numpy.ndarray`` of dtype object or ``utils.PolicyBeliefArray``
            Initialized posterior over hidden states. Depending on the inference algorithm chosen and other parameters (such as the parameters stored within ``edge_handling_paramss),
            the resulting ``qs`` variable will have additional sub-structure to reflect whether beliefs are additionally conditioned on timepoint and policy.
-            For example, in case the ``self.inference_algo == 'MMP' `, the indexing structure of ``qs`` is policy->timepoint-->factor, so that 
+            For example, in case the ``self.inference_algo == 'MMP' `, ``qs`` is a ``utils.PolicyBeliefArray`` that stores one array of shape ``(num_policies, num_timesteps, num_states[f])``
+            per hidden state factor. Its indexing structure is policy->timepoint-->factor, so that 
             ``qs[p_idx][t_idx][f_idx]`` refers to beliefs about marginal factor ``f_idx`` expected under policy ``p_idx`` 
-            at timepoint ``t_idx``. In this case, the returned ``qs`` will only have entries filled out for the first timestep, i.e. for ``q[p_idx][0]``, for all 
-            policy-indices ``p_idx``. Subsequent entries ``q[:][1, 2, ...]`` will be initialized to empty ``numpy.ndarray`` objects.
+            at timepoint ``t_idx``. In this case, all entries of the returned ``qs`` are initialized to uniform distributions.
+        """
+
+        self._init_beliefs(init_qs)
+
+        if getattr(self, "_learning_buffer", None) is not None:
+            self.flush_learning() # the updates accumulated over the previous episode
+        
+        if self.pA is not None:
+            self.A = utils.norm_dist_obj_arr(self.pA, like=self.A)
+        
+        if self.pB is not None:
+            self.B = utils.norm_dist_obj_arr(self.pB, like=self.B)
+
+        return self.qs
+
+    def _init_beliefs(self, init_qs=None):
+        """
+        Initializes the posterior beliefs about hidden states (to uniform distributions, if ``init_qs`` is not provided) and resets time to the first timestep
         """
 
         self.curr_timestep = 0
@@ -368,30 +553,91 @@ class Agent(object):
             if self.inference_algo == 'VANILLA':
                 self.qs = utils.obj_array_uniform(self.num_states)
             else: # in the case you're doing MMP (i.e. you have an inference_horizon > 1), we have to account for policy- and timestep-conditioned posterior beliefs
-                self.qs = utils.obj_array(len(self.policies))
-                for p_i, _ in enumerate(self.policies):
-                    self.qs[p_i] = utils.obj_array(self.inference_horizon + self.policy_len + 1) # + 1 to include belief about current timestep
-                    self.qs[p_i][0] = utils.obj_array_uniform(self.num_states)
-                
-                first_belief = utils.obj_array(len(self.policies))
-                for p_i, _ in enumerate(self.policies):
-                    first_belief[p_i] = copy.deepcopy(self.D) 
+                self.qs = utils.PolicyBeliefArray.uniform(len(self.policies), self.inference_horizon + self.policy_len + 1, self.num_states) # + 1 to include belief about current timestep
                 
                 if self.edge_handling_params['policy_sep_prior']:
+                    first_belief = utils.PolicyBeliefArray.tile(self.D, len(self.policies))
                     self.set_latest_beliefs(last_belief = first_belief)
                 else:
                     self.set_latest_beliefs(last_belief = self.D)
             
         else:
             self.qs = init_qs
-        
-        if self.pA is not None:
-            self.A = utils.norm_dist_obj_arr(self.pA)
-        
-        if self.pB is not None:
-            self.B = utils.norm_dist_obj_arr(self.pB)
 
-        return self.qs
+    # attributes that make up the state of the agent, as recorded by `Agent.snapshot`
+    _SNAPSHOT_ATTRS = ["curr_timestep", "qs", "latest_belief", "q_pi", "G", "F", "action", "prev_obs", "prev_actions",
+                       "A", "B", "D", "pA", "pB", "pD", "q_pi_hist", "_q_pi_hist_offset", "_learning_buffer",
+                       "num_states", "H", "I", "_I_reachability", "_pB_prior", "_pD_prior"]
+
+    def snapshot(self):
+        """
+        Records the current state of the agent (its beliefs about hidden states and policies, its histories of observations, actions and beliefs,
+        the current timestep and the learned parameters of its generative model), so that it can later be reinstated with ``Agent.restore``,
+        e.g. to branch off counterfactual rollouts from the same state.
+
+        Beliefs and histories are copied, while the arrays of the generative model are shared with the agent rather than copied, since learning
+        copies any sub-array that is shared before modifying it. Taking a snapshot therefore costs on the order of the size of the beliefs,
+        rather than the size of the model.
+
+        Returns
+        ----------
+        snapshot: ``dict``
+            The recorded state of the agent
+        """
+
+        snapshot = {}
+        for name in self._SNAPSHOT_ATTRS:
+            if hasattr(self, name):
+                snapshot[name] = self._copy_state(name, getattr(self, name))
+
+        if hasattr(self, "qs_hist"):
+            snapshot["qs_hist"] = self.qs_hist.snapshot()
+
+        self._owned_arrays = {} # the model arrays are now shared with the snapshot
+
+        return snapshot
+
+    def restore(self, snapshot):
+        """
+        Reinstates a state of the agent recorded by ``Agent.snapshot``. The same snapshot can be restored any number of times.
+
+        Parameters
+        ----------
+        snapshot: ``dict``
+            The recorded state of the agent, as returned by ``Agent.snapshot``
+        """
+
+        for name in self._SNAPSHOT_ATTRS:
+            if name in snapshot:
+                setattr(self, name, self._copy_state(name, snapshot[name]))
+            elif hasattr(self, name):
+                delattr(self, name) # e.g. posteriors over policies that had not been inferred yet when the snapshot was taken
+
+        if "qs_hist" in snapshot:
+            self.qs_hist.restore(snapshot["qs_hist"])
+
+        self._predicted_qs = None
+        self._owned_arrays = {}
+
+    @staticmethod
+    def _copy_state(name, value):
+        """
+        Copies an attribute recorded by ``Agent.snapshot``: beliefs and histories are copied, model arrays are (shallow) copied object arrays that share their sub-arrays
+        """
+
+        if value is None or np.isscalar(value):
+            return value
+        if isinstance(value, learning.DirichletAccumulator):
+            return value.copy()
+        if isinstance(value, list):
+            return list(value)
+        if isinstance(value, utils.PolicyBeliefArray):
+            return value.copy()
+        if name in ["A", "B", "D", "H", "pA", "pB", "pD", "_pB_prior", "_pD_prior"]:
+            return utils.obj_array_from_list(list(value))
+        if utils.is_obj_array(value):
+            return utils.obj_array_from_list([np.copy(value_i) for value_i in value])
+        return np.copy(value)
 
     def step_time(self):
         """
@@ -409,10 +655,12 @@ class Agent(object):
             self.prev_actions = [self.action]
         else:
             self.prev_actions.append(self.action)
+            if len(self.prev_actions) > self.inference_horizon:
+                del self.prev_actions[:-self.inference_horizon] # only the actions within the inference horizon are kept
 
         self.curr_timestep += 1
 
-        if self.inference_algo == "MMP" and (self.curr_timestep - self.inference_horizon) >= 0:
+        if self.inference_algo in ["MMP", "VMP"] and (self.curr_timestep - self.inference_horizon) >= 0:
             self.set_latest_beliefs()
         
         return self.curr_timestep
@@ -426,25 +674,23 @@ class Agent(object):
 
         Returns
         ---------
-        latest_belief: ``numpy.ndarray`` of dtype object
+        latest_belief: ``numpy.ndarray`` of dtype object or ``utils.PolicyBeliefArray``
             Penultimate posterior beliefs over hidden states at the timestep just before the first timestep of the inference horizon. 
             Depending on the value of ``self.edge_handling_params['use_BMA']``, the shape of this output array will differ.
             If ``self.edge_handling_params['use_BMA'] == True``, then ``latest_belief`` will be a Bayesian model average 
             of beliefs about hidden states, where the average is taken with respect to posterior beliefs about policies.
-            Otherwise, `latest_belief`` will be the full, policy-conditioned belief about hidden states, and will have indexing structure
-            policies->factors, such that ``latest_belief[p_idx][f_idx]`` refers to the penultimate belief about marginal factor ``f_idx``
+            Otherwise, `latest_belief`` will be the full, policy-conditioned belief about hidden states (a ``utils.PolicyBeliefArray`` of shape ``(num_policies,)``), 
+            and will have indexing structure policies->factors, such that ``latest_belief[p_idx][f_idx]`` refers to the penultimate belief about marginal factor ``f_idx``
             under policy ``p_idx``.
         """
 
         if last_belief is None:
-            last_belief = utils.obj_array(len(self.policies))
-            for p_i, _ in enumerate(self.policies):
-                last_belief[p_i] = copy.deepcopy(self.qs[p_i][0])
+            last_belief = self.qs[:, 0].copy()
 
         begin_horizon_step = self.curr_timestep - self.inference_horizon
         if self.edge_handling_params['use_BMA'] and (begin_horizon_step >= 0):
             if hasattr(self, "q_pi_hist"):
-                self.latest_belief = inference.average_states_over_policies(last_belief, self.q_pi_hist[begin_horizon_step]) # average the earliest marginals together using contemporaneous posterior over policies (`self.q_pi_hist[0]`)
+                self.latest_belief = inference.average_states_over_policies(last_belief, self.q_pi_hist[begin_horizon_step - self._q_pi_hist_offset]) # average the earliest marginals together using contemporaneous posterior over policies (`self.q_pi_hist[0]`)
             else:
                 self.latest_belief = inference.average_states_over_policies(last_belief, self.q_pi) # average the earliest marginals together using posterior over policies (`self.q_pi`)
         else:
@@ -461,16 +707,14 @@ class Agent(object):
 
         Returns
         ---------
-        future_qs_seq: ``numpy.ndarray`` of dtype object
-            Posterior beliefs over hidden states under a policy, in the future. This is a nested ``numpy.ndarray`` object array, with one
-            sub-array ``future_qs_seq[p_idx]`` for each policy. The indexing structure is policy->timepoint-->factor, so that 
+        future_qs_seq: ``utils.PolicyBeliefArray``
+            Posterior beliefs over hidden states under a policy, in the future. This is a view onto ``self.qs`` (no data is copied), with 
+            one entry ``future_qs_seq[p_idx]`` for each policy. The indexing structure is policy->timepoint-->factor, so that 
             ``future_qs_seq[p_idx][t_idx][f_idx]`` refers to beliefs about marginal factor ``f_idx`` expected under policy ``p_idx`` 
             at future timepoint ``t_idx``, relative to the current timestep.
         """
         
-        future_qs_seq = utils.obj_array(len(self.qs))
-        for p_idx in range(len(self.qs)):
-            future_qs_seq[p_idx] = self.qs[p_idx][-(self.policy_len+1):] # this grabs only the last `policy_len`+1 beliefs about hidden states, under each policy
+        future_qs_seq = self.qs[:, -(self.policy_len+1):] # this grabs only the last `policy_len`+1 beliefs about hidden states, under each policy
 
         return future_qs_seq
 
@@ -497,17 +741,25 @@ class Agent(object):
             at timepoint ``t_idx``.
         """
 
-        observation = tuple(observation) if not distr_obs else observation
+        return self._infer_states_impl(observation, distr_obs)
+
+    def _infer_states_impl(self, observation, distr_obs=False, empirical_prior=None):
+        """
+        Implementation of ``infer_states``, shared with ``step``. With ``inference_algo == "VANILLA"``, the ``empirical_prior`` over hidden states
+        can be provided, rather than computed from ``qs``, ``B`` and ``action`` (or set to ``D`` at the first timestep).
+        """
+
+        observation = self._format_observation(observation, distr_obs)
 
         if not hasattr(self, "qs"):
             self.reset()
 
         if self.inference_algo == "VANILLA":
-            if self.action is not None:
+            if empirical_prior is None and self.action is not None:
                 empirical_prior = control.get_expected_states_interactions(
-                    self.qs, self.B, self.B_factor_list, self.action.reshape(1, -1) 
+                    self.qs, self.B, self.B_factor_list, self.action.reshape(1, -1), B_by_action=self._get_B_by_action()
                 )[0]
-            else:
+            elif empirical_prior is None:
                 empirical_prior = self.D
             qs = inference.update_posterior_states_factorized(
                 self.A,
@@ -518,15 +770,14 @@ class Agent(object):
                 empirical_prior,
                 **self.inference_params
             )
-        elif self.inference_algo == "MMP":
+        elif self.inference_algo in ["MMP", "VMP"]:
 
             self.prev_obs.append(observation)
             if len(self.prev_obs) > self.inference_horizon:
-                latest_obs = self.prev_obs[-self.inference_horizon:]
-                latest_actions = self.prev_actions[-(self.inference_horizon-1):]
-            else:
-                latest_obs = self.prev_obs
-                latest_actions = self.prev_actions
+                del self.prev_obs[:-self.inference_horizon] # only the observations within the inference horizon are kept
+
+            latest_obs = self.prev_obs
+            latest_actions = self.prev_actions[-(len(latest_obs)-1):] if len(latest_obs) > 1 else None
 
             qs, F = inference.update_posterior_states_full_factorized(
                 self.A,
@@ -538,6 +789,8 @@ class Agent(object):
                 latest_actions, 
                 prior = self.latest_belief, 
                 policy_sep_prior = self.edge_handling_params['policy_sep_prior'],
+                inference_algo = self.inference_algo,
+                B_by_action = self._get_B_by_action(),
                 **self.inference_params
             )
 
@@ -549,6 +802,17 @@ class Agent(object):
 
         return qs
 
+    def _format_observation(self, observation, distr_obs):
+        """
+        Returns the observation as an integer array of observation indices, one per modality (see ``utils.to_obs_indices``), which is used
+        throughout inference and learning without constructing one-hot vectors. Distributional observations are returned unchanged.
+        """
+
+        if distr_obs:
+            return observation
+        obs_idx = utils.to_obs_indices(observation, self.num_modalities)
+        return tuple(observation) if obs_idx is None else np.array(obs_idx) # a copy, since the observations are kept in `prev_obs`
+
     def _infer_states_test(self, observation, distr_obs=False):
         """
         Test version of ``infer_states()`` that additionally returns intermediate variables of MMP, such as
@@ -576,11 +840,10 @@ class Agent(object):
 
             self.prev_obs.append(observation)
             if len(self.prev_obs) > self.inference_horizon:
-                latest_obs = self.prev_obs[-self.inference_horizon:]
-                latest_actions = self.prev_actions[-(self.inference_horizon-1):]
-            else:
-                latest_obs = self.prev_obs
-                latest_actions = self.prev_actions
+                del self.prev_obs[:-self.inference_horizon] # only the observations within the inference horizon are kept
+
+            latest_obs = self.prev_obs
+            latest_actions = self.prev_actions[-(len(latest_obs)-1):] if len(latest_obs) > 1 else None
 
             qs, F, xn, vn = inference._update_posterior_states_full_test(
                 self.A,
@@ -595,6 +858,8 @@ class Agent(object):
 
             self.F = F # variational free energy of each policy  
 
+            qs = utils.PolicyBeliefArray.from_obj_array(qs)
+
         if hasattr(self, "qs_hist"):
             self.qs_hist.append(qs)
 
@@ -622,6 +887,14 @@ class Agent(object):
             Negative expected free energies of each policy, i.e. a vector containing one negative expected free energy per policy.
         """
 
+        return self._infer_policies_impl()
+
+    def _infer_policies_impl(self, qs_pi_out=None):
+        """
+        Implementation of ``infer_policies``, shared with ``step``. If ``qs_pi_out`` is a ``list`` (and policies are evaluated with
+        ``control.update_posterior_policies_factorized``), the predictive beliefs about hidden states under each policy are appended to it.
+        """
+
         if self.inference_algo == "VANILLA":
             if self.sophisticated:
                 q_pi, G = control.sophisticated_inference_search(
@@ -639,7 +912,8 @@ class Agent(object):
                     self.si_prune_penalty,
                     1.0,
                     self.inference_params,
-                    n=0
+                    n=0,
+                    B_by_action=self._get_B_by_action()
                 )
             else:
                 q_pi, G = control.update_posterior_policies_factorized(
@@ -657,9 +931,11 @@ class Agent(object):
                     self.pB,
                     E = self.E,
                     I = self.I,
-                    gamma = self.gamma
+                    gamma = self.gamma,
+                    qs_pi_out = qs_pi_out,
+                    B_by_action = self._get_B_by_action()
                 )
-        elif self.inference_algo == "MMP":
+        elif self.inference_algo in ["MMP", "VMP"]:
 
             future_qs_seq = self.get_future_qs()
 
@@ -684,14 +960,25 @@ class Agent(object):
             )
 
         if hasattr(self, "q_pi_hist"):
-            self.q_pi_hist.append(q_pi)
-            if len(self.q_pi_hist) > self.inference_horizon:
-                self.q_pi_hist = self.q_pi_hist[-(self.inference_horizon-1):]
+            self._append_q_pi_hist(q_pi)
 
         self.q_pi = q_pi
         self.G = G
         return q_pi, G
 
+    def _append_q_pi_hist(self, q_pi):
+        """
+        Appends the posterior over policies to ``self.q_pi_hist``. As for ``self.qs_hist``, the whole history is kept unless ``belief_hist_len`` is set,
+        in which case only the latest ``belief_hist_len`` entries are kept, as well as those needed to average beliefs at the beginning of the
+        inference horizon (i.e. the latest ``self.inference_horizon + 1`` timesteps)
+        """
+
+        self.q_pi_hist.append(q_pi)
+        maxlen = self.qs_hist.maxlen
+        if maxlen is not None and len(self.q_pi_hist) > max(maxlen, self.inference_horizon + 1):
+            del self.q_pi_hist[0]
+            self._q_pi_hist_offset += 1
+
     def sample_action(self):
         """
         Sample or select a discrete action from the posterior over control states.
@@ -746,6 +1033,58 @@ class Agent(object):
 
         return action, p_dist
 
+    def step(self, observation, distr_obs=False):
+        """
+        Runs one full perception-action cycle: state inference given ``observation``, followed by policy inference and action selection.
+        This is equivalent to calling ``infer_states``, ``infer_policies`` and ``sample_action`` in sequence.
+        With ``inference_algo == "VANILLA"`` (and without sophisticated inference), the predictive beliefs about hidden states that are computed
+        during policy inference are kept, so that those expected under the selected action are reused as the empirical prior
+        of the next call, instead of being recomputed from ``qs``, ``B`` and ``action``.
+
+        Parameters
+        ----------
+        observation: ``list`` or ``tuple`` of ints
+            The observation input. Each entry ``observation[m]`` stores the index of the discrete
+            observation for modality ``m``.
+        distr_obs: ``bool``
+            Whether the observation is a distribution over possible observations, rather than a single observation.
+
+        Returns
+        ----------
+        action: 1D ``numpy.ndarray``
+            Vector containing the indices of the actions for each control factor
+        """
+
+        if self.inference_algo != "VANILLA" or self.sophisticated:
+            self.infer_states(observation, distr_obs=distr_obs)
+            self.infer_policies()
+            return self.sample_action()
+
+        if not hasattr(self, "qs"):
+            self.reset()
+
+        # the cached predictive beliefs are only valid if the beliefs, transition model and action they were computed from are unchanged
+        cached = getattr(self, "_predicted_qs", None)
+        empirical_prior = None
+        if self.action is not None and cached is not None and cached[0] is self.qs and cached[1] is self.B and cached[2] is self.action:
+            empirical_prior = cached[3]
+
+        self._infer_states_impl(observation, distr_obs, empirical_prior=empirical_prior)
+
+        qs_pi_all = []
+        self._infer_policies_impl(qs_pi_out=qs_pi_all)
+
+        action = self.sample_action()
+
+        # the first predictive belief of any policy that starts with the selected action is the empirical prior for the next timestep
+        self._predicted_qs = None
+        for p_idx, policy in enumerate(self.policies):
+            if np.array_equal(policy[0], action):
+                self._predicted_qs = (self.qs, self.B, self.action, qs_pi_all[p_idx][0])
+                break
+
+        return action
+
     def update_A(self, obs):
         """
         Update approximate posterior beliefs about Dirichlet parameters that parameterise the observation likelihood or ``A`` array.
@@ -760,9 +1099,22 @@ class Agent(object):
         -----------
         qA: ``numpy.ndarray`` of dtype object
             Posterior Dirichlet parameters over observation model (same shape as ``A``), after having updated it with observations.
+            This is the agent's own ``pA``, whose sub-arrays are updated in-place by subsequent calls. If ``learning_flush_interval`` is set,
+            the update is only buffered, and included in ``pA`` once the accumulated updates are flushed (see ``Agent.flush_learning``).
         """
 
-        qA = learning.update_obs_likelihood_dirichlet_factorized(
+        if self.learning_flush_interval is not None:
+            self._get_learning_buffer().add_obs(obs, self.qs, self.A_factor_list, self.lr_pA, self.modalities_to_learn)
+            self._flush_learning_if_due()
+            return self.pA
+
+        modalities = range(self.num_modalities) if self.modalities_to_learn == "all" else self.modalities_to_learn
+        for m in modalities:
+            self._own_array("pA", m)
+            self._own_array("A", m)
+
+        # the Dirichlet parameters of the observed outcomes, and the columns of ``A`` that depend on them, are updated in-place
+        qA = learning.update_obs_likelihood_dirichlet_inplace(
             self.pA, 
             self.A, 
             obs, 
@@ -772,11 +1124,137 @@ class Agent(object):
             self.modalities_to_learn
         )
 
-        self.pA = qA # set new prior to posterior
-        self.A = utils.norm_dist_obj_arr(qA) # take expected value of posterior Dirichlet parameters to calculate posterior over A array
-
         return qA
 
+    def flush_learning(self):
+        """
+        Applies the updates of the Dirichlet parameters ``pA`` and ``pB`` that have been accumulated since the last flush (if ``learning_flush_interval`` is set),
+        and renormalizes the corresponding ``A`` and ``B``. This is done automatically every ``learning_flush_interval`` timesteps and on ``Agent.reset``.
+
+        Returns
+        -----------
+        qA: ``numpy.ndarray`` of dtype object
+            Posterior Dirichlet parameters over observation model
+        qB: ``numpy.ndarray`` of dtype object
+            Posterior Dirichlet parameters over transition model
+        """
+
+        if getattr(self, "_learning_buffer", None) is not None:
+            self._flush_learning_buffer(observations=True, transitions=True)
+
+        return self.pA, self.pB
+
+    def _get_learning_buffer(self):
+        if getattr(self, "_learning_buffer", None) is None:
+            self._learning_buffer = learning.DirichletAccumulator()
+        return self._learning_buffer
+
+    def _flush_learning_if_due(self):
+        buffer = self._learning_buffer
+        observations = buffer.num_obs_updates >= self.learning_flush_interval
+        transitions = buffer.num_transition_updates >= self.learning_flush_interval
+        if observations or transitions:
+            self._flush_learning_buffer(observations, transitions)
+
+    def _flush_learning_buffer(self, observations, transitions):
+        buffer = self._learning_buffer
+        if observations:
+            for m in buffer.A_rows:
+                self._own_array("pA", m)
+                self._own_array("A", m)
+        if transitions:
+            for f in buffer.B_slices:
+                self._own_array("pB", f)
+                self._own_array("B", f)
+            self._predicted_qs = None # the cached predictive beliefs of `Agent.step` were computed with the previous transition model
+
+        updated_factors = list(buffer.B_slices) if transitions else []
+
+        buffer.flush(
+            self.pA if observations else None, self.A,
+            self.pB if transitions else None, self.B
+        )
+        self._invalidate_B_by_action(updated_factors)
+        self._update_I(updated_factors)
+
+    def _get_B_by_action(self):
+        """
+        Returns the action-major copy of ``B`` (see ``utils.action_major``), whose contiguous per-action matrices are used by inference and planning in place of
+        the strided slices ``B[f][..., u]``. The copy of each factor is cached, and only recomputed when ``B[f]`` has been replaced by another array
+        or updated in-place by learning (see ``Agent._invalidate_B_by_action``).
+        """
+
+        cached = self._B_by_action
+        if cached is None or len(cached[1]) != len(self.B):
+            cached = (utils.obj_array(len(self.B)), [None] * len(self.B))
+
+        B_by_action, sources = cached
+        stale = [f for f, B_f in enumerate(self.B) if sources[f] is not B_f]
+        if stale:
+            # the cache is replaced rather than updated in-place, since it may be shared with other agents (e.g. constructed from a `model.CompiledModel`)
+            B_by_action = utils.action_major(self.B, factors=stale, out=utils.obj_array_from_list(list(B_by_action)))
+            self._B_by_action = (B_by_action, list(self.B))
+
+        return B_by_action
+
+    def _invalidate_B_by_action(self, factors):
+        """
+        Marks the cached action-major copies of the factors ``factors`` of ``B`` as stale, after their sub-arrays have been updated in-place
+        """
+
+        if self._B_by_action is not None:
+            B_by_action, sources = self._B_by_action
+            self._B_by_action = (B_by_action, [None if f in factors else B_f for f, B_f in enumerate(sources)])
+
+    def _update_I(self, factors):
+        """
+        Updates the inductive matrices ``I`` (if ``H`` is specified) after the factors ``factors`` of ``B`` have changed. The reachability matrix used by
+        backwards induction for each factor of ``I`` (see ``control.get_reachability``) is cached, and the induction is only rerun for the factors whose
+        reachability matrix has changed, which learning seldom does.
+        """
+
+        if self.H is None:
+            self.I, self._I_reachability = None, None
+            return
+
+        if self.I is None or len(self.I) != len(self.H):
+            self.I, self._I_reachability = utils.obj_array(len(self.H)), [None] * len(self.H)
+
+        I = None
+        for factor in range(len(self.H)):
+            B_idx = control._induction_factor(factor, self.B_factor_list)
+            if B_idx not in factors:
+                continue
+
+            b = control.get_reachability(self.B[B_idx], self.ii_threshold, sparse=self.ii_sparse)
+            cached = self._I_reachability[factor]
+            if cached is not None and cached.shape == b.shape and (cached != b).sum() == 0:
+                continue
+
+            if I is None:
+                # `I` and the cached reachability matrices are replaced rather than updated in-place, since they may be shared with
+                # a snapshot of the agent, or with other agents constructed from the same `model.CompiledModel`
+                I = utils.obj_array_from_list(list(self.I))
+                self._I_reachability = list(self._I_reachability)
+            I[factor] = control.backwards_induction_factor(self.H[factor], b, self.ii_depth)
+            self._I_reachability[factor] = b
+
+        if I is not None:
+            self.I = I
+
+    def _own_array(self, name, idx):
+        """
+        Copy-on-write of the generative model: makes sure that the sub-array ``idx`` of the object array attribute ``name`` (e.g. ``"pA"``) is private to the agent,
+        i.e. not shared with e.g. the arrays the agent was constructed with, a ``model.SharedModel`` or a snapshot, by copying it (once) if necessary
+        """
+
+        obj_arr = getattr(self, name)
+        if self._owned_arrays.get((name, idx)) is not obj_arr[idx]:
+            obj_arr = utils.obj_array_from_list(list(obj_arr)) # the object array itself may be shared as well
+            obj_arr[idx] = np.array(obj_arr[idx], dtype=float)
+            setattr(self, name, obj_arr)
+            self._owned_arrays[(name, idx)] = obj_arr[idx]
+
     def _update_A_old(self, obs):
         """
         Update approximate posterior beliefs about Dirichlet parameters that parameterise the observation likelihood or ``A`` array.
@@ -803,11 +1281,11 @@ class Agent(object):
         )
 
         self.pA = qA # set new prior to posterior
-        self.A = utils.norm_dist_obj_arr(qA) # take expected value of posterior Dirichlet parameters to calculate posterior over A array
+        self.A = utils.norm_dist_obj_arr(qA, like=self.A) # take expected value of posterior Dirichlet parameters to calculate posterior over A array
 
         return qA
 
-    def update_B(self, qs_prev):
+    def update_B(self, qs_prev=None, qs_joint=None):
         """
         Update posterior beliefs about Dirichlet parameters that parameterise the transition likelihood 
         
@@ -815,14 +1293,34 @@ class Agent(object):
         -----------
         qs_prev: 1D ``numpy.ndarray`` or ``numpy.ndarray`` of dtype object
             Marginal posterior beliefs over hidden states at previous timepoint.
+        qs_joint: ``numpy.ndarray`` of dtype object, default ``None``
+            If provided, the joint posterior over each factor's current hidden states and its parents' previous hidden states (e.g. one timestep of the
+            pairwise joints ``qss`` returned by ``inference.smooth_posterior_states``), which is used in place of the outer product of ``self.qs`` and ``qs_prev``
+            (see ``learning.update_state_likelihood_dirichlet_inplace``). In this case, ``qs_prev`` is not needed.
     
         Returns
         -----------
         qB: ``numpy.ndarray`` of dtype object
             Posterior Dirichlet parameters over transition model (same shape as ``B``), after having updated it with state beliefs and actions.
+            This is the agent's own ``pB``, whose sub-arrays are updated in-place by subsequent calls. If ``learning_flush_interval`` is set,
+            the update is only buffered, and included in ``pB`` once the accumulated updates are flushed (see ``Agent.flush_learning``).
         """
 
-        qB = learning.update_state_likelihood_dirichlet_interactions(
+        if qs_prev is None and qs_joint is None:
+            raise ValueError("Either the beliefs about hidden states at the previous timepoint (`qs_prev`) or their joint with the current ones (`qs_joint`) must be provided")
+
+        if self.learning_flush_interval is not None:
+            self._get_learning_buffer().add_transition(self.action, self.qs, qs_prev, self.B_factor_list, self.lr_pB, self.factors_to_learn, qs_joint=qs_joint)
+            self._flush_learning_if_due()
+            return self.pB
+
+        factors = range(self.num_factors) if self.factors_to_learn == "all" else self.factors_to_learn
+        for f in factors:
+            self._own_array("pB", f)
+            self._own_array("B", f)
+
+        # only the slices of the actions taken are updated (and renormalized) in-place
+        qB = learning.update_state_likelihood_dirichlet_inplace(
             self.pB,
             self.B,
             self.action,
@@ -830,11 +1328,12 @@ class Agent(object):
             qs_prev,
             self.B_factor_list,
             self.lr_pB,
-            self.factors_to_learn
+            self.factors_to_learn,
+            qs_joint=qs_joint
         )
-
-        self.pB = qB # set new prior to posterior
-        self.B = utils.norm_dist_obj_arr(qB)  # take expected value of posterior Dirichlet parameters to calculate posterior over B array
+        self._invalidate_B_by_action(factors)
+        self._update_I(factors)
+        self._predicted_qs = None # the cached predictive beliefs of `Agent.step` were computed with the previous transition model
 
         return qB
     
@@ -864,7 +1363,7 @@ class Agent(object):
         )
 
         self.pB = qB # set new prior to posterior
-        self.B = utils.norm_dist_obj_arr(qB)  # take expected value of posterior Dirichlet parameters to calculate posterior over B array
+        self.B = utils.norm_dist_obj_arr(qB, like=self.B)  # take expected value of posterior Dirichlet parameters to calculate posterior over B array
 
         return qB
     
@@ -877,8 +1376,9 @@ class Agent(object):
         -----------
         qs_t0: 1D ``numpy.ndarray``, ``numpy.ndarray`` of dtype object, or ``None``
             Marginal posterior beliefs over hidden states at current timepoint. If ``None``, the 
-            value of ``qs_t0`` is set to ``self.qs_hist[0]`` (i.e. the initial hidden state beliefs at the first timepoint).
-            If ``self.inference_algo == "MMP"``, then ``qs_t0`` is set to be the Bayesian model average of beliefs about hidden states
+            value of ``qs_t0`` is set to ``self.qs_hist[0]`` (i.e. the initial hidden state beliefs at the first timepoint), which requires
+            ``save_belief_hist`` to be set, and the first entry not to have been discarded from a history bounded by ``belief_hist_len``.
+            If ``self.inference_algo`` is ``"MMP"`` or ``"VMP"``, then ``qs_t0`` is set to be the Bayesian model average of beliefs about hidden states
             at the first timestep of the backwards inference horizon, where the average is taken with respect to posterior beliefs about policies.
       
         Returns
@@ -893,10 +1393,14 @@ class Agent(object):
                 
                 try:
                     qs_t0 = self.qs_hist[0]
-                except ValueError:
-                    print("qs_t0 must either be passed as argument to `update_D` or `save_belief_hist` must be set to True!")             
+                except (AttributeError, IndexError):
+                    raise ValueError("qs_t0 must either be passed as argument to `update_D` or `save_belief_hist` must be set to True!")
+                if self.qs_hist.num_discarded > 0:
+                    raise ValueError(
+                        "The beliefs at the first timepoint have been discarded from the belief history (see `belief_hist_len`), so qs_t0 must be passed as argument to `update_D`"
+                    )
 
-        elif self.inference_algo == "MMP":
+        elif self.inference_algo in ["MMP", "VMP"]:
             
             if self.edge_handling_params['use_BMA']:
                 qs_t0 = self.latest_belief
@@ -907,7 +1411,7 @@ class Agent(object):
                 # get beliefs about policies at the time at the beginning of the inference horizon
                 if hasattr(self, "q_pi_hist"):
                     begin_horizon_step = max(0, self.curr_timestep - self.inference_horizon)
-                    q_pi_t0 = np.copy(self.q_pi_hist[begin_horizon_step])
+                    q_pi_t0 = np.copy(self.q_pi_hist[begin_horizon_step - self._q_pi_hist_offset])
                 else:
                     q_pi_t0 = np.copy(self.q_pi)
             
@@ -916,10 +1420,111 @@ class Agent(object):
         qD = learning.update_state_prior_dirichlet(self.pD, qs_t0, self.lr_pD, factors = self.factors_to_learn)
         
         self.pD = qD # set new prior to posterior
-        self.D = utils.norm_dist_obj_arr(qD) # take expected value of posterior Dirichlet parameters to calculate posterior over D array
+        self.D = utils.norm_dist_obj_arr(qD, like=self.D) # take expected value of posterior Dirichlet parameters to calculate posterior over D array
 
         return qD
 
+    def reduce_model(self, threshold=0.0, reduction=1/16, factors="all"):
+        """
+        Online Bayesian model reduction: removes the levels of hidden state factors that the agent has (almost) never visited while learning,
+        so that subsequent inference and planning operate on smaller state spaces. Each level is scored with ``learning.score_state_reductions``, by
+        comparing the evidence for a reduced model, under which the level is (almost) never visited, with that of the full model, given the
+        Dirichlet parameters over the transition model (and over the initial hidden states, if learned) before and after learning.
+        Levels whose removal decreases the free energy by more than ``-threshold`` are removed from ``A``, ``B``, ``D`` (``H``), their Dirichlet
+        parameters and the current beliefs about hidden states; the policies and observation modalities are unchanged. This can e.g. be called
+        periodically, or at the end of each episode. Any belief history is cleared, since its dimensions no longer match.
+
+        Parameters
+        ----------
+        threshold: ``float``, default ``0.0``
+            Levels are removed if the change in free energy of removing them is lower than ``threshold``
+        reduction: ``float``, default ``1/16``
+            The factor by which the concentration parameters of a removed level are shrunk in the reduced prior
+        factors: ``list`` of ``int``, default "all"
+            The hidden state factors that may be reduced
+
+        Returns
+        ----------
+        levels_removed: ``list`` of ``list`` of ``int``
+            The levels that were removed from each hidden state factor (in terms of the indices before the reduction). At least two levels of each factor are kept.
+        """
+
+        if self.pB is None:
+            raise ValueError("Bayesian model reduction requires Dirichlet parameters over the transition model (`pB`)")
+
+        self.flush_learning()
+
+        F, occupancy = learning.score_state_reductions(self.pB, self._pB_prior, self.pD, self._pD_prior, reduction=reduction)
+
+        if factors == "all":
+            factors = list(range(self.num_factors))
+
+        levels_removed = [[] for _ in range(self.num_factors)]
+        for f in factors:
+            levels_removed[f] = [int(s) for s in np.flatnonzero(F[f] < threshold)]
+
+            # at least two levels of each factor are kept (the most visited ones), since factors with a single level are not supported
+            num_to_keep = min(2, self.num_states[f]) - (self.num_states[f] - len(levels_removed[f]))
+            if num_to_keep > 0:
+                levels_removed[f] = sorted(sorted(levels_removed[f], key=lambda s: occupancy[f][s])[:-num_to_keep])
+
+        if sum(len(levels) for levels in levels_removed) == 0:
+            return levels_removed
+
+        no_obs_removed = [[] for _ in range(self.num_modalities)]
+        no_actions_removed = [[] for _ in range(self.num_factors)]
+
+        self.A = learning._prune_A(self.A, no_obs_removed, levels_removed, A_factor_list=self.A_factor_list)
+        self.B = learning._prune_B(self.B, levels_removed, no_actions_removed, B_factor_list=self.B_factor_list)
+        self.D = learning._prune_prior(self.D, levels_removed)
+        if self.pA is not None:
+            self.pA = learning._prune_A(self.pA, no_obs_removed, levels_removed, dirichlet=True, A_factor_list=self.A_factor_list)
+            self.A = utils.norm_dist_obj_arr(self.pA)
+        self.pB = learning._prune_B(self.pB, levels_removed, no_actions_removed, dirichlet=True, B_factor_list=self.B_factor_list)
+        self._pB_prior = learning._prune_B(self._pB_prior, levels_removed, no_actions_removed, dirichlet=True, B_factor_list=self.B_factor_list)
+        self.B = utils.norm_dist_obj_arr(self.pB)
+        if self.pD is not None:
+            self.pD = learning._prune_prior(self.pD, levels_removed, dirichlet=True)
+            self._pD_prior = learning._prune_prior(self._pD_prior, levels_removed, dirichlet=True)
+            self.D = utils.norm_dist_obj_arr(self.pD)
+
+        self.num_states = [self.B[f].shape[0] for f in range(self.num_factors)]
+        self._owned_arrays = {}
+        self._predicted_qs = None
+
+        if self.H is not None:
+            self.H = learning._prune_prior(self.H, levels_removed)
+            self._I_reachability = [None] * len(self.H)
+            self._update_I(range(self.num_factors))
+
+        # the current beliefs about hidden states are restricted to the remaining levels
+        keep = [np.array(sorted(set(range(len(F[f]))) - set(levels_removed[f])), dtype=np.intp) for f in range(self.num_factors)]
+        if isinstance(self.qs, utils.PolicyBeliefArray):
+            self.qs = self._reduce_beliefs(self.qs, keep)
+        else:
+            self.qs = learning._prune_prior(self.qs, levels_removed)
+        if hasattr(self, "latest_belief"):
+            if isinstance(self.latest_belief, utils.PolicyBeliefArray):
+                self.latest_belief = self._reduce_beliefs(self.latest_belief, keep)
+            else:
+                self.latest_belief = learning._prune_prior(self.latest_belief, levels_removed)
+
+        if hasattr(self, "qs_hist"):
+            q_pi_hist, q_pi_hist_offset = self.q_pi_hist, self._q_pi_hist_offset # the policies, and therefore the posteriors over them, are unchanged
+            self._init_belief_hist(self.qs_hist.maxlen, self.qs_hist.memmap_dir)
+            self.q_pi_hist, self._q_pi_hist_offset = q_pi_hist, q_pi_hist_offset
+
+        return levels_removed
+
+    @staticmethod
+    def _reduce_beliefs(beliefs, keep):
+        """ Restricts policy-conditioned beliefs to the hidden state levels ``keep[f]`` of each factor, and renormalizes them """
+        factor_arrays = []
+        for arr, keep_f in zip(beliefs.factor_arrays, keep):
+            arr = arr[..., keep_f]
+            factor_arrays.append(arr / arr.sum(axis=-1, keepdims=True))
+        return utils.PolicyBeliefArray(factor_arrays)
+
     def _get_default_params(self):
         method = self.inference_algo
         default_params = None
@@ -928,7 +1533,7 @@ class Agent(object):
         elif method == "MMP":
             default_params = {"num_iter": 10, "grad_descent": True, "tau": 0.25}
         elif method == "VMP":
-            raise NotImplementedError("VMP is not implemented")
+            default_params = {"num_iter": 10, "tau": 0.5}
         elif method == "BP":
             raise NotImplementedError("BP is not implemented")
         elif method == "EP":
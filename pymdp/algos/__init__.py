@@ -1,2 +1,4 @@
 from .fpi import run_vanilla_fpi, run_vanilla_fpi_factorized
 from .mmp import run_mmp, run_mmp_factorized, _run_mmp_testing
+from .vmp import run_vmp_factorized
+from .forward_backward import run_forward_backward
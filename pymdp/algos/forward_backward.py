@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+from pymdp.utils import get_model_dimensions, obj_array, obj_array_uniform, obj_array_from_list
+from pymdp.maths import spm_cross
+from opt_einsum import contract
+
+def _propagate(x, B_t, transpose=False):
+    """
+    Applies the transition matrix ``B_t[f]`` of each hidden state factor along axis ``f`` of the joint (multidimensional) distribution ``x``.
+    With ``transpose = True``, the transposed matrices are applied instead (i.e. messages are passed backwards in time).
+    """
+    for f, B_f in enumerate(B_t):
+        x = np.moveaxis(np.tensordot(B_f, x, axes=([0 if transpose else 1], [f])), 0, f)
+    return x
+
+def run_forward_backward(lh_seq, B, actions=None, prior=None):
+    """
+    Exact (forward-backward) smoothing of hidden states in a hidden Markov model, whose hidden state factors evolve independently of one another
+    (i.e. ``B_factor_list[f] == [f]`` for every factor ``f``). The observation model may couple the factors arbitrarily. Messages are passed over the joint
+    hidden state space, but the transitions are applied one factor at a time, so the joint transition tensor is never built.
+    One forward and one backward pass over time return both the smoothed marginals and the pairwise (two-timestep) joint posteriors of each factor.
+
+    Parameters
+    ----------
+    lh_seq: ``numpy.ndarray`` of dtype object
+        Sequence of joint likelihoods of hidden states (e.g. the output of ``maths.get_joint_likelihood_seq``), where each ``lh_seq[t]``
+        has shape ``num_states``
+    B: ``numpy.ndarray`` of dtype object
+        Dynamics likelihood mapping or 'transition model', mapping from hidden states at ``t`` to hidden states at ``t+1``, given some control state ``u``.
+        Each element ``B[f]`` of this object array stores a 3-D tensor for hidden state factor ``f``, whose entries ``B[f][s, v, u]`` store the probability
+        of hidden state level ``s`` at the current time, given hidden state level ``v`` and action ``u`` at the previous time.
+    actions: 2D ``numpy.ndarray``, default None
+        Matrix of shape ``(T - 1, num_factors)`` storing the action taken on each control factor, between each pair of consecutive timesteps. Only
+        optional when ``T == 1``.
+    prior: ``numpy.ndarray`` of dtype object, default None
+        If provided, the prior beliefs about the initial hidden states. If ``None``, this defaults
+        to a flat (uninformative) prior over hidden states.
+
+    Returns
+    ---------
+    qs_seq: ``numpy.ndarray`` of dtype object
+        Smoothed posterior marginals over hidden states. Nesting structure is timepoints, factors,
+        where e.g. ``qs_seq[t][f]`` stores the marginal belief about factor ``f`` at timepoint ``t``.
+    qss: ``numpy.ndarray`` of dtype object
+        Pairwise joint posteriors, with one array of shape ``(T - 1, num_states[f], num_states[f])`` per hidden state factor, where
+        ``qss[f][t, s, v]`` stores the posterior probability of factor ``f`` being in level ``v`` at time ``t`` and level ``s`` at time ``t + 1``
+        (laid out like ``B[f][:, :, u]``).
+    F: float
+        Negative log evidence of the observation sequence (the variational free energy of the exact posterior)
+    """
+
+    _, num_states, _, num_factors = get_model_dimensions(A=None, B=B)
+
+    if any(B_f.ndim != 3 for B_f in B):
+        raise ValueError(
+            "Forward-backward smoothing requires each hidden state factor's dynamics to depend only on itself (`B_factor_list[f] == [f]`)"
+        )
+
+    T = len(lh_seq)
+    lh = np.stack([lh_seq[t].reshape(num_states) for t in range(T)])
+
+    if prior is None:
+        prior = obj_array_uniform(num_states)
+
+    if T > 1:
+        if actions is None:
+            raise ValueError("`actions` must be provided when smoothing over more than one timestep")
+        actions = np.array(actions).astype(int).reshape(T - 1, num_factors)
+    else:
+        actions = np.zeros((0, num_factors), dtype=int)
+
+    # transition matrices under the action taken at each step, with time as the leading dimension
+    B_seq = [np.moveaxis(B[f][:, :, actions[:, f]], -1, 0) for f in range(num_factors)]
+
+    # forward pass (normalized messages, with the normalizing constants stored in `c`)
+    alpha = np.empty_like(lh)
+    c = np.empty(T)
+    alpha[0] = spm_cross(prior).reshape(num_states) * lh[0]
+    for t in range(T):
+        if t > 0:
+            alpha[t] = _propagate(alpha[t-1], [B_f[t-1] for B_f in B_seq]) * lh[t]
+        c[t] = alpha[t].sum()
+        alpha[t] /= c[t]
+
+    # backward pass
+    beta = np.ones_like(lh)
+    for t in range(T - 2, -1, -1):
+        beta[t] = _propagate(lh[t+1] * beta[t+1], [B_f[t] for B_f in B_seq], transpose=True) / c[t+1]
+
+    gamma = alpha * beta
+    gamma /= gamma.sum(axis=tuple(range(1, num_factors + 1)), keepdims=True)
+
+    qs_seq = obj_array(T)
+    for t in range(T):
+        qs_seq[t] = obj_array_from_list(
+            [gamma[t].sum(axis=tuple(g for g in range(num_factors) if g != f)) for f in range(num_factors)]
+        )
+
+    # pairwise joints of each factor, computed for all timesteps at once (labels: time, next states, previous states)
+    qss = obj_array(num_factors)
+    if T > 1:
+        next_labels = list(range(1, num_factors + 1))
+        prev_labels = list(range(num_factors + 1, 2 * num_factors + 1))
+        msg_next = (lh[1:] * beta[1:]) / c[1:].reshape((-1,) + (1,) * num_factors)
+        args = [msg_next, [0] + next_labels, alpha[:-1], [0] + prev_labels]
+        for g in range(num_factors):
+            args += [B_seq[g], [0, next_labels[g], prev_labels[g]]]
+        for f in range(num_factors):
+            qss[f] = contract(*(args + [[0, next_labels[f], prev_labels[f]]]), backend='numpy')
+    else:
+        for f in range(num_factors):
+            qss[f] = np.zeros((0, num_states[f], num_states[f]))
+
+    F = -np.log(c).sum()
+
+    return qs_seq, qss, F
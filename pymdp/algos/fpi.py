@@ -4,7 +4,7 @@
 
 import numpy as np
 from pymdp.maths import spm_dot, dot_likelihood, get_joint_likelihood, softmax, calc_free_energy, spm_log_single, spm_log_obj_array
-from pymdp.utils import to_obj_array, obj_array, obj_array_uniform
+from pymdp.utils import to_obj_array, to_obs_indices, obj_array, obj_array_uniform
 from itertools import chain
 from copy import deepcopy
 
@@ -22,6 +22,7 @@ def run_vanilla_fpi(A, obs, num_obs, num_states, prior=None, num_iter=10, dF=1.0
     obs: numpy 1D array or numpy ndarray of dtype object
         The observation (generated by the environment). If single modality, this should be a 1D ``np.ndarray``
         (one-hot vector representation). If multi-modality, this should be ``np.ndarray`` of dtype object whose entries are 1D one-hot vectors.
+        Alternatively, this can be an integer ``np.ndarray`` of shape ``(num_modalities,)`` storing the index of the observation of each modality.
     num_obs: list of ints
         List of dimensionalities of each observation modality
     num_states: list of ints
@@ -171,6 +172,7 @@ def run_vanilla_fpi_factorized(A, obs, num_obs, num_states, mb_dict, prior=None,
     obs: numpy 1D array or numpy ndarray of dtype object
         The observation (generated by the environment). If single modality, this should be a 1D ``np.ndarray``
         (one-hot vector representation). If multi-modality, this should be ``np.ndarray`` of dtype object whose entries are 1D one-hot vectors.
+        Alternatively, this can be an integer ``np.ndarray`` of shape ``(num_modalities,)`` storing the index of the observation of each modality.
     num_obs: ``list`` of ints
         List of dimensionalities of each observation modality
     num_states: ``list`` of ints
@@ -210,7 +212,8 @@ def run_vanilla_fpi_factorized(A, obs, num_obs, num_states, mb_dict, prior=None,
     """
 
     likelihood = obj_array(n_modalities)
-    obs = to_obj_array(obs)
+    obs_idx = to_obs_indices(obs, n_modalities)
+    obs = obs_idx if obs_idx is not None else to_obj_array(obs)
     for (m, A_m) in enumerate(A):
         likelihood[m] = dot_likelihood(A_m, obs[m])
 
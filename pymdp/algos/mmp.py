@@ -3,9 +3,8 @@
 
 import numpy as np
 
-from pymdp.utils import to_obj_array, get_model_dimensions, obj_array, obj_array_zeros, obj_array_uniform
+from pymdp.utils import get_model_dimensions, obj_array, obj_array_zeros, obj_array_uniform, obj_array_from_list, action_major
 from pymdp.maths import spm_dot, spm_norm, softmax, calc_free_energy, spm_log_single, factor_dot_flex
-import copy
 
 def run_mmp(
     lh_seq, B, policy, prev_actions=None, prior=None, num_iter=10, grad_descent=True, tau=0.25, last_timestep = False):
@@ -132,7 +131,7 @@ def run_mmp(
     return qs_seq, F
 
 def run_mmp_factorized(
-    lh_seq, mb_dict, B, B_factor_list, policy, prev_actions=None, prior=None, num_iter=10, grad_descent=True, tau=0.25, last_timestep = False):
+    lh_seq, mb_dict, B, B_factor_list, policy, prev_actions=None, prior=None, num_iter=10, grad_descent=True, tau=0.25, last_timestep = False, out=None, B_by_action=None):
     """
     Marginal message passing scheme for updating marginal posterior beliefs about hidden states over time, 
     conditioned on a particular policy.
@@ -166,6 +165,13 @@ def run_mmp_factorized(
         Decay constant for use in ``grad_descent`` version. Tunes the size of the gradient descent updates to the posterior.
     last_timestep: Bool, default False
         Flag for whether we are at the last timestep of belief updating
+    out: ``list`` of 2D ``numpy.ndarray``, default None
+        If provided, one array of shape ``(infer_len, num_states[f])`` per hidden state factor, that the posterior beliefs are written into (in-place).
+        The arrays are (re-)initialized to uniform distributions before the first iteration. This is used to fill out a 
+        ``utils.PolicyBeliefArray`` directly, without allocating separate per-timestep and per-factor arrays.
+    B_by_action: ``numpy.ndarray`` of dtype object, optional
+        Action-major copy of ``B`` (as returned by ``utils.action_major``), whose contiguous sub-arrays ``B_by_action[f][u]`` are used in place of
+        the strided slices ``B[f][..., u]``. If ``None``, it is computed from ``B``.
         
     Returns
     ---------
@@ -191,9 +197,15 @@ def run_mmp_factorized(
     _, num_states, _, num_factors = get_model_dimensions(A=None, B=B)
 
     # beliefs
+    if out is None:
+        out = [np.empty((infer_len, ns)) for ns in num_states]
+    for f in range(num_factors):
+        out[f][:] = 1.0 / num_states[f]
+
+    # each `qs_seq[t][f]` is a view onto the row `out[f][t]`, so updates are written in-place
     qs_seq = obj_array(infer_len)
     for t in range(infer_len):
-        qs_seq[t] = obj_array_uniform(num_states)
+        qs_seq[t] = obj_array_from_list([out_f[t] for out_f in out])
 
     # last message
     qs_T = obj_array_zeros(num_states)
@@ -202,11 +214,9 @@ def run_mmp_factorized(
     if prior is None:
         prior = obj_array_uniform(num_states)
 
-    # transposed transition
-    trans_B = obj_array(num_factors)
-        
-    for f in range(num_factors):
-        trans_B[f] = spm_norm(np.swapaxes(B[f],0,1))
+    # action-major transition tensors, whose per-action matrices are contiguous
+    if B_by_action is None:
+        B_by_action = action_major(B)
 
     if prev_actions is not None:
         policy = np.vstack((prev_actions, policy))
@@ -235,13 +245,12 @@ def run_mmp_factorized(
                 if t < past_len:
                     for m in A_modality_list[f]:
                         lnA += spm_log_single(spm_dot(lh_seq[t][m], qs_seq[t][A_factor_list[m]], [A_factor_list[m].index(f)]))  
-                    print(f'Factorized version: lnA at time {t}: {lnA}')                
                 
                 # past message
                 if t == 0:
                     lnB_past = spm_log_single(prior[f])
                 else:
-                    past_msg = spm_dot(B[f][...,int(policy[t - 1, f])], qs_seq[t-1][B_factor_list[f]])
+                    past_msg = spm_dot(B_by_action[f][int(policy[t - 1, f])], qs_seq[t-1][B_factor_list[f]])
                     lnB_past = spm_log_single(past_msg)
 
                 # future message
@@ -252,7 +261,7 @@ def run_mmp_factorized(
 
                     B_marg_list = [] # list of the marginalized B matrices, that correspond to mapping between the factor of interest `f` and each of its children factors `i`
                     for i in inv_B_deps[f]: #loop over all the hidden state factors that are driven by f
-                        b = B[i][...,int(policy[t,i])]
+                        b = B_by_action[i][int(policy[t,i])]
                         keep_dims = (0,1+B_factor_list[i].index(f))
                         dims = []
                         idxs = []
@@ -278,13 +287,14 @@ def run_mmp_factorized(
                     coeff = 1 if (t >= future_cutoff) else 2
                     err = (coeff * lnA + lnB_past + lnB_future) - coeff * lnqs
                     lnqs = lnqs + tau * (err - err.mean())
-                    qs_seq[t][f] = softmax(lnqs)
+                    # accumulate the free energy before overwriting `sx`, since the beliefs are updated in-place
                     if (t == 0) or (t == (infer_len-1)):
                         F += sx.dot(0.5*err)
                     else:
                         F += sx.dot(0.5*(err - (num_factors - 1)*lnA/num_factors)) # @NOTE: not sure why Karl does this in SPM_MDP_VB_X, we should look into this
+                    qs_seq[t][f][:] = softmax(lnqs)
                 else:
-                    qs_seq[t][f] = softmax(lnA + lnB_past + lnB_future)
+                    qs_seq[t][f][:] = softmax(lnA + lnB_past + lnB_future)
             
             if not grad_descent:
 
@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+from pymdp.utils import get_model_dimensions, obj_array, obj_array_uniform, obj_array_from_list
+from pymdp.maths import spm_log_single, softmax
+from opt_einsum import contract
+
+def _batched_factor_dot(X, xs, dims, keep_dims):
+    """
+    Contraction of a tensor ``X``, whose leading dimension indexes time, with a set of time-indexed marginals ``xs``.
+    Each ``xs[i]`` has shape ``(T, X.shape[dims[i]])`` and is contracted against dimension ``dims[i]`` of ``X``, separately at each timestep.
+    The time dimension and the dimensions in ``keep_dims`` are retained in the output.
+    """
+    args = [X, list(range(X.ndim))]
+    for x, d in zip(xs, dims):
+        args += [x, [0, d]]
+    args += [[0] + list(keep_dims)]
+    return contract(*args, backend='numpy')
+
+def _get_vmp_messages(ln_lh_seq, ln_B_seq, ln_prior, qs, A_factor_list, B_factor_list, inv_B_deps):
+    """
+    Computes all the variational messages needed to update the marginal posteriors over hidden states, simultaneously for all timesteps.
+    Returns the (summed) log-likelihood messages ``ln_A``, the messages from the past ``lnB_past`` and the messages from the future ``lnB_future``,
+    each as a list with one array of shape ``(infer_len, num_states[f])`` per hidden state factor.
+    """
+
+    num_factors = len(qs)
+    infer_len = qs[0].shape[0]
+    past_len = ln_lh_seq[0].shape[0] if len(ln_lh_seq) > 0 else 0
+
+    ln_A = [np.zeros_like(qs_f) for qs_f in qs]
+    lnB_past = [np.zeros_like(qs_f) for qs_f in qs]
+    lnB_future = [np.zeros_like(qs_f) for qs_f in qs]
+
+    # likelihood messages: expected log likelihood of each modality, marginalizing out all parents except the factor of interest
+    for m, ln_lh_m in enumerate(ln_lh_seq):
+        for j, f in enumerate(A_factor_list[m]):
+            xs = [qs[g][:past_len] for k, g in enumerate(A_factor_list[m]) if k != j]
+            dims = [1 + k for k, g in enumerate(A_factor_list[m]) if k != j]
+            ln_A[f][:past_len] += _batched_factor_dot(ln_lh_m, xs, dims, (1 + j,))
+
+    for f in range(num_factors):
+        lnB_past[f][0] = ln_prior[f]
+
+    if infer_len > 1:
+        for f in range(num_factors):
+
+            # message from the past: expected log transition probability into `s_t`, under beliefs about the parents at `t-1`
+            xs = [qs[g][:-1] for g in B_factor_list[f]]
+            dims = [2 + k for k in range(len(B_factor_list[f]))]
+            lnB_past[f][1:] = _batched_factor_dot(ln_B_seq[f], xs, dims, (1,))
+
+            # messages from the future: one from each of the factors `i` whose dynamics depend on `f`
+            for i in inv_B_deps[f]:
+                position = B_factor_list[i].index(f)
+                xs = [qs[i][1:]] + [qs[g][:-1] for k, g in enumerate(B_factor_list[i]) if k != position]
+                dims = [1] + [2 + k for k, g in enumerate(B_factor_list[i]) if k != position]
+                lnB_future[f][:-1] += _batched_factor_dot(ln_B_seq[i], xs, dims, (2 + position,))
+
+    return ln_A, lnB_past, lnB_future
+
+def run_vmp_factorized(
+    lh_seq, mb_dict, B, B_factor_list, policy, prev_actions=None, prior=None, num_iter=10, tau=0.5, last_timestep=False, out=None, B_by_action=None):
+    """
+    Variational message passing scheme for updating marginal posterior beliefs about hidden states over time,
+    conditioned on a particular policy. Unlike marginal message passing (``run_mmp_factorized``), which visits each timestep and hidden state factor
+    in turn, here all the messages are computed in parallel, as vectorized contractions over the whole time window, and the beliefs about all
+    timesteps and factors are then updated simultaneously (with a mirror-descent step of size ``tau``).
+
+    Parameters
+    ----------
+    lh_seq: ``numpy.ndarray`` of dtype object
+        Likelihoods of hidden states under a sequence of observations over time, stored separately for each modality. Each ``lh_seq[t][m]`` contains
+        the likelihood of hidden states (over the factors in ``mb_dict['A_factor_list'][m]``) for the observation of modality ``m`` at time ``t``
+    mb_dict: ``Dict``
+        Dictionary with two keys (``A_factor_list`` and ``A_modality_list``), that stores the factor indices that influence each modality (``A_factor_list``)
+        and the modality indices influenced by each factor (``A_modality_list``).
+    B: ``numpy.ndarray`` of dtype object
+        Dynamics likelihood mapping or 'transition model', mapping from hidden states at ``t`` to hidden states at ``t+1``, given some control state ``u``.
+        Each element ``B[f]`` of this object array stores a 3-D tensor for hidden state factor ``f``, whose entries ``B[f][s, v, u]`` store the probability
+        of hidden state level ``s`` at the current time, given hidden state level ``v`` and action ``u`` at the previous time.
+    B_factor_list: ``list`` of ``list`` of ``int``
+        List of lists of hidden state factors each hidden state factor depends on. Each element ``B_factor_list[i]`` is a list of the factor indices that factor i's dynamics depend on.
+    policy: 2D ``numpy.ndarray``
+        Matrix of shape ``(policy_len, num_control_factors)`` that indicates the indices of each action (control state index) upon timestep ``t`` and control_factor ``f` in the element ``policy[t,f]`` for a given policy.
+    prev_actions: ``numpy.ndarray``, default None
+        If provided, should be a matrix of previous actions of shape ``(infer_len, num_control_factors)`` that indicates the indices of each action (control state index) taken in the past (up until the current timestep).
+    prior: ``numpy.ndarray`` of dtype object, default None
+        If provided, the prior beliefs about initial states (at t = 0, relative to ``infer_len``). If ``None``, this defaults
+        to a flat (uninformative) prior over hidden states.
+    num_iter: int, default 10
+        Number of variational iterations.
+    tau: float, default 0.5
+        Step size of the (mirror) gradient descent on the variational free energy. With ``tau = 1.0``, each iteration is a
+        parallel fixed-point update of all the marginals.
+    last_timestep: Bool, default False
+        Flag for whether we are at the last timestep of belief updating
+    out: ``list`` of 2D ``numpy.ndarray``, default None
+        If provided, one array of shape ``(infer_len, num_states[f])`` per hidden state factor, that the posterior beliefs are written into (in-place).
+        The arrays are (re-)initialized to uniform distributions before the first iteration.
+    B_by_action: ``numpy.ndarray`` of dtype object, optional
+        Action-major copy of ``B`` (as returned by ``utils.action_major``), whose contiguous sub-arrays ``B_by_action[f][u]`` are used in place of
+        the strided slices ``B[f][..., u]`` if provided.
+
+    Returns
+    ---------
+    qs_seq: ``numpy.ndarray`` of dtype object
+        Posterior beliefs over hidden states under the policy. Nesting structure is timepoints, factors,
+        where e.g. ``qs_seq[t][f]`` stores the marginal belief about factor ``f`` at timepoint ``t`` under the policy in question.
+    F: float
+        Variational free energy of the policy.
+    """
+
+    # window
+    past_len = len(lh_seq)
+    future_len = policy.shape[0]
+
+    if last_timestep:
+        infer_len = past_len + future_len - 1
+    else:
+        infer_len = past_len + future_len
+
+    # dimensions
+    _, num_states, _, num_factors = get_model_dimensions(A=None, B=B)
+    A_factor_list = mb_dict['A_factor_list']
+    num_modalities = len(A_factor_list)
+
+    # beliefs, stored as one (infer_len, num_states[f]) array per factor
+    if out is None:
+        out = [np.empty((infer_len, ns)) for ns in num_states]
+    for f in range(num_factors):
+        out[f][:] = 1.0 / num_states[f]
+    qs = out
+
+    # prior
+    if prior is None:
+        prior = obj_array_uniform(num_states)
+    ln_prior = [spm_log_single(prior[f]) for f in range(num_factors)]
+
+    if prev_actions is not None:
+        policy = np.vstack((prev_actions, policy))
+
+    # log likelihoods, stacked over time for each modality
+    ln_lh_seq = []
+    for m in range(num_modalities):
+        lh_shape = [num_states[f] for f in A_factor_list[m]]
+        ln_lh_seq.append(np.stack([spm_log_single(lh_seq[t][m]).reshape(lh_shape) for t in range(past_len)]))
+
+    # log transition tensors under the actions taken at each step, with time as the leading dimension
+    actions = policy[:(infer_len - 1)].astype(int)
+    if B_by_action is None:
+        ln_B_seq = [np.moveaxis(spm_log_single(B[f][..., actions[:, f]]), -1, 0) for f in range(num_factors)]
+    else:
+        ln_B_seq = [spm_log_single(B_by_action[f][actions[:, f]]) for f in range(num_factors)]
+
+    # for each hidden state factor, the indices of the factors whose dynamics it drives
+    inv_B_deps = [[i for i, d in enumerate(B_factor_list) if f in d] for f in range(num_factors)]
+
+    for itr in range(num_iter):
+
+        ln_A, lnB_past, lnB_future = _get_vmp_messages(ln_lh_seq, ln_B_seq, ln_prior, qs, A_factor_list, B_factor_list, inv_B_deps)
+
+        for f in range(num_factors):
+            ln_qs = spm_log_single(qs[f])
+            err = ln_A[f] + lnB_past[f] + lnB_future[f] - ln_qs
+            qs[f][:] = softmax((ln_qs + tau * err).T).T
+
+    # variational free energy: negative entropy, minus expected log likelihood and expected log prior (including the transitions)
+    _, lnB_past, _ = _get_vmp_messages(ln_lh_seq, ln_B_seq, ln_prior, qs, A_factor_list, B_factor_list, inv_B_deps)
+    F = 0.0
+    for f in range(num_factors):
+        F += (qs[f] * (spm_log_single(qs[f]) - lnB_past[f])).sum()
+    for m, ln_lh_m in enumerate(ln_lh_seq):
+        xs = [qs[g][:past_len] for g in A_factor_list[m]]
+        dims = [1 + k for k in range(len(A_factor_list[m]))]
+        F -= _batched_factor_dot(ln_lh_m, xs, dims, ()).sum()
+
+    # each `qs_seq[t][f]` is a view onto the row `qs[f][t]`
+    qs_seq = obj_array(infer_len)
+    for t in range(infer_len):
+        qs_seq[t] = obj_array_from_list([qs_f[t] for qs_f in qs])
+
+    return qs_seq, F
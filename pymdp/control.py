@@ -125,8 +125,8 @@ def update_posterior_policies_full(
             if pB is not None:
                 G[p_idx] += calc_pB_info_gain(pB, qs_seq_pi[p_idx], prior, policy)
         
-        if I is not None:
-            G[p_idx] += calc_inductive_cost(qs_bma, qs_seq_pi[p_idx], I)
+    if I is not None:
+        G += calc_inductive_cost_policies(qs_bma, qs_seq_pi, I)
 
     q_pi = softmax(G * gamma - F + lnE)
     
@@ -255,8 +255,8 @@ def update_posterior_policies_full_factorized(
             if pB is not None:
                 G[p_idx] += calc_pB_info_gain_interactions(pB, qs_seq_pi[p_idx], qs_seq_pi[p_idx], B_factor_list, policy)
         
-        if I is not None:
-            G[p_idx] += calc_inductive_cost(qs_bma, qs_seq_pi[p_idx], I)
+    if I is not None:
+        G += calc_inductive_cost_policies(qs_bma, qs_seq_pi, I)
             
     q_pi = softmax(G * gamma - F + lnE)
     
@@ -276,7 +276,8 @@ def update_posterior_policies(
     pB=None,
     E=None,
     I=None,
-    gamma=16.0
+    gamma=16.0,
+    B_by_action=None
 ):
     """
     Update posterior beliefs about policies by computing expected free energy of each policy and integrating that
@@ -320,6 +321,9 @@ def update_posterior_policies(
         of reaching the goal state backwards from state j after i steps.
     gamma: float, default 16.0
         Prior precision over policies, scales the contribution of the expected free energy to the posterior over policies
+    B_by_action: ``numpy.ndarray`` of dtype object, optional
+        Action-major copy of ``B`` (as returned by ``utils.action_major``), whose contiguous sub-arrays ``B_by_action[f][u]`` are used in place of
+        the strided slices ``B[f][..., u]`` if provided.
 
     Returns
     ----------
@@ -338,8 +342,10 @@ def update_posterior_policies(
     else:
         lnE = spm_log_single(E) 
 
+    qs_pi_all = []
     for idx, policy in enumerate(policies):
-        qs_pi = get_expected_states(qs, B, policy)
+        qs_pi = get_expected_states(qs, B, policy, B_by_action=B_by_action)
+        qs_pi_all.append(qs_pi)
         qo_pi = get_expected_obs(qs_pi, A)
 
         if use_utility:
@@ -353,9 +359,9 @@ def update_posterior_policies(
                 G[idx] += calc_pA_info_gain(pA, qo_pi, qs_pi).item()
             if pB is not None:
                 G[idx] += calc_pB_info_gain(pB, qs_pi, qs, policy).item()
-        
-        if I is not None:
-            G[idx] += calc_inductive_cost(qs, qs_pi, I)
+
+    if I is not None:
+        G += calc_inductive_cost_policies(qs, qs_pi_all, I)
 
     q_pi = softmax(G * gamma + lnE)    
 
@@ -376,7 +382,9 @@ def update_posterior_policies_factorized(
     pB=None,
     E=None,
     I=None,
-    gamma=16.0
+    gamma=16.0,
+    qs_pi_out=None,
+    B_by_action=None
 ):
     """
     Update posterior beliefs about policies by computing expected free energy of each policy and integrating that
@@ -426,6 +434,12 @@ def update_posterior_policies_factorized(
         of reaching the goal state backwards from state j after i steps.
     gamma: float, default 16.0
         Prior precision over policies, scales the contribution of the expected free energy to the posterior over policies
+    qs_pi_out: ``list``, optional
+        If provided, the predictive posterior over hidden states computed for each policy (as returned by ``get_expected_states_interactions``)
+        is appended to this list, in the order of ``policies``, so that it can be reused by the caller.
+    B_by_action: ``numpy.ndarray`` of dtype object, optional
+        Action-major copy of ``B`` (as returned by ``utils.action_major``), whose contiguous sub-arrays ``B_by_action[f][u]`` are used in place of
+        the strided slices ``B[f][..., u]`` if provided.
 
     Returns
     ----------
@@ -444,8 +458,12 @@ def update_posterior_policies_factorized(
     else:
         lnE = spm_log_single(E) 
 
+    qs_pi_all = []
     for idx, policy in enumerate(policies):
-        qs_pi = get_expected_states_interactions(qs, B, B_factor_list, policy)
+        qs_pi = get_expected_states_interactions(qs, B, B_factor_list, policy, B_by_action=B_by_action)
+        qs_pi_all.append(qs_pi)
+        if qs_pi_out is not None:
+            qs_pi_out.append(qs_pi)
         qo_pi = get_expected_obs_factorized(qs_pi, A, A_factor_list)
 
         if use_utility:
@@ -459,15 +477,15 @@ def update_posterior_policies_factorized(
                 G[idx] += calc_pA_info_gain_factorized(pA, qo_pi, qs_pi, A_factor_list).item()
             if pB is not None:
                 G[idx] += calc_pB_info_gain_interactions(pB, qs_pi, qs, B_factor_list, policy).item()
-        
-        if I is not None:
-            G[idx] += calc_inductive_cost(qs, qs_pi, I)
+
+    if I is not None:
+        G += calc_inductive_cost_policies(qs, qs_pi_all, I)
 
     q_pi = softmax(G * gamma + lnE)    
 
     return q_pi, G
 
-def get_expected_states(qs, B, policy):
+def get_expected_states(qs, B, policy, B_by_action=None):
     """
     Compute the expected states under a policy, also known as the posterior predictive density over states
 
@@ -482,6 +500,9 @@ def get_expected_states(qs, B, policy):
     policy: 2D ``numpy.ndarray``
         Array that stores actions entailed by a policy over time. Shape is ``(num_timesteps, num_factors)`` where ``num_timesteps`` is the temporal
         depth of the policy and ``num_factors`` is the number of control factors.
+    B_by_action: ``numpy.ndarray`` of dtype object, optional
+        Action-major copy of ``B`` (as returned by ``utils.action_major``), whose contiguous sub-arrays ``B_by_action[f][u]`` are used in place of
+        the strided slices ``B[f][..., u]`` if provided.
 
     Returns
     -------
@@ -498,11 +519,12 @@ def get_expected_states(qs, B, policy):
     # get expected states over time
     for t in range(n_steps):
         for control_factor, action in enumerate(policy[t,:]):
-            qs_pi[t+1][control_factor] = B[control_factor][:,:,int(action)].dot(qs_pi[t][control_factor])
+            B_u = B[control_factor][:,:,int(action)] if B_by_action is None else B_by_action[control_factor][int(action)]
+            qs_pi[t+1][control_factor] = B_u.dot(qs_pi[t][control_factor])
 
     return qs_pi[1:]
     
-def get_expected_states_interactions(qs, B, B_factor_list, policy):
+def get_expected_states_interactions(qs, B, B_factor_list, policy, B_by_action=None):
     """
     Compute the expected states under a policy, also known as the posterior predictive density over states
 
@@ -519,6 +541,9 @@ def get_expected_states_interactions(qs, B, B_factor_list, policy):
     policy: 2D ``numpy.ndarray``
         Array that stores actions entailed by a policy over time. Shape is ``(num_timesteps, num_factors)`` where ``num_timesteps`` is the temporal
         depth of the policy and ``num_factors`` is the number of control factors.
+    B_by_action: ``numpy.ndarray`` of dtype object, optional
+        Action-major copy of ``B`` (as returned by ``utils.action_major``), whose contiguous sub-arrays ``B_by_action[f][u]`` are used in place of
+        the strided slices ``B[f][..., u]`` if provided.
 
     Returns
     -------
@@ -536,7 +561,8 @@ def get_expected_states_interactions(qs, B, B_factor_list, policy):
     for t in range(n_steps):
         for control_factor, action in enumerate(policy[t,:]):
             factor_idx = B_factor_list[control_factor] # list of the hidden state factor indices that the dynamics of `qs[control_factor]` depend on
-            qs_pi[t+1][control_factor] = spm_dot(B[control_factor][...,int(action)], qs_pi[t][factor_idx])
+            B_u = B[control_factor][...,int(action)] if B_by_action is None else B_by_action[control_factor][int(action)]
+            qs_pi[t+1][control_factor] = spm_dot(B_u, qs_pi[t][factor_idx])
 
     return qs_pi[1:]
  
@@ -927,27 +953,50 @@ def calc_inductive_cost(qs, qs_pi, I, epsilon=1e-3):
     inductive_cost: float
         Cost of visited this state using backwards induction under the policy in question
     """
-    n_steps = len(qs_pi)
-    
-    # initialise inductive cost
-    inductive_cost = 0
 
-    # loop over time points and modalities
-    num_factors = len(I)
+    return calc_inductive_cost_policies(qs, [qs_pi], I, epsilon=epsilon)[0]
+
+def calc_inductive_cost_policies(qs, qs_pi_policies, I, epsilon=1e-3):
+    """
+    Computes the inductive cost of a state (see ``calc_inductive_cost``) under several policies at once. The per-factor costs of the states, which
+    only depend on the current beliefs ``qs``, are computed once, and are then contracted with the predictive beliefs of all the policies and timepoints.
+
+    Parameters
+    ----------
+    qs: ``numpy.ndarray`` of dtype object
+        Marginal posterior beliefs over hidden states at a given timepoint.
+    qs_pi_policies: ``list`` of ``list`` of ``numpy.ndarray`` of dtype object, or ``utils.PolicyBeliefArray``
+        Predictive posterior beliefs over hidden states expected under each policy, where ``qs_pi_policies[p][t]`` stores the beliefs about
+        states expected under policy ``p`` at time ``t``
+    I: ``numpy.ndarray`` of dtype object
+        For each state factor, contains a 2D ``numpy.ndarray`` whose element i,j yields the probability 
+        of reaching the goal state backwards from state j after i steps.
+
+    Returns
+    -------
+    inductive_cost: 1D ``numpy.ndarray``
+        Cost of visited this state using backwards induction under each policy
+    """
+
+    inductive_cost = np.zeros(len(qs_pi_policies))
+
+    for factor in range(len(I)):
+        # we also assume precise beliefs here?!
+        idx = np.argmax(qs[factor])
+        # m = arg max_n p_n < sup p
+        # i.e. find first I idx equals 1 and m is the index before
+        m = np.where(I[factor][:, idx] == 1)[0]
+        # we might find no path to goal (i.e. when no goal specified)
+        if len(m) > 0:
+            m = max(m[0]-1, 0)
+            I_m = (1-I[factor][m, :]) * np.log(epsilon)
+            # predictive beliefs about this factor, of shape (num_policies, num_timesteps, num_states[factor])
+            if isinstance(qs_pi_policies, utils.PolicyBeliefArray):
+                qs_pi_factor = qs_pi_policies.factor_arrays[factor]
+            else:
+                qs_pi_factor = np.array([[qs_pi_t[factor] for qs_pi_t in qs_pi] for qs_pi in qs_pi_policies])
+            inductive_cost += qs_pi_factor.dot(I_m).sum(axis=1)
 
-    for t in range(n_steps):
-        for factor in range(num_factors):
-            # we also assume precise beliefs here?!
-            idx = np.argmax(qs[factor])
-            # m = arg max_n p_n < sup p
-            # i.e. find first I idx equals 1 and m is the index before
-            m = np.where(I[factor][:, idx] == 1)[0]
-            # we might find no path to goal (i.e. when no goal specified)
-            if len(m) > 0:
-                m = max(m[0]-1, 0)
-                I_m = (1-I[factor][m, :]) * np.log(epsilon)
-                inductive_cost += I_m.dot(qs_pi[t][factor])
-                
     return inductive_cost
 
 def construct_policies(num_states, num_controls = None, policy_len=1, control_fac_idx=None):
@@ -1256,7 +1305,7 @@ def _select_highest_test(options_array, seed=None):
     return int(same_prob[0])
 
 
-def backwards_induction(H, B, B_factor_list, threshold, depth):
+def backwards_induction(H, B, B_factor_list, threshold, depth, sparse=False):
     """
     Runs backwards induction of reaching a goal state H given a transition model B.
     
@@ -1274,6 +1323,9 @@ def backwards_induction(H, B, B_factor_list, threshold, depth):
         The threshold for pruning transitions that are below a certain probability
     depth: ``int``
         The temporal depth of the backward induction
+    sparse: ``bool``, default ``False``
+        Whether to store the reachability matrices as ``scipy.sparse`` matrices (see ``get_reachability``), which is faster for factors with many states
+        and few possible transitions from each state (e.g. large grid worlds)
 
     Returns
     ----------
@@ -1286,32 +1338,71 @@ def backwards_induction(H, B, B_factor_list, threshold, depth):
     num_factors = len(H)
     I = utils.obj_array(num_factors)
     for factor in range(num_factors):
-        I[factor] = np.zeros((depth, H[factor].shape[0]))
-        I[factor][0, :] = H[factor]
+        b = get_reachability(B[_induction_factor(factor, B_factor_list)], threshold, sparse=sparse)
+        I[factor] = backwards_induction_factor(H[factor], b, depth)
 
-        bf = factor
-        if B_factor_list is not None:
-            if len(B_factor_list[factor]) > 1:
-                raise ValueError("Backwards induction with factorized transition model not yet implemented")
-            bf = B_factor_list[factor][0]
+    return I
 
-        num_states, _, _ = B[bf].shape
-        b = np.zeros((num_states, num_states))
-        
-        for state in range(num_states):
-            for next_state in range(num_states):
-                # If there exists an action that allows transitioning 
-                # from state to next_state, with probability larger than threshold
-                # set b[state, next_state] to 1
-                if np.any(B[bf][next_state, state, :] > threshold):
-                    b[next_state, state] = 1
-
-        for i in range(1, depth):
-            I[factor][i, :] = np.dot(b, I[factor][i-1, :])
-            I[factor][i, :] = np.where(I[factor][i, :] > 0.1, 1.0, 0.0)
-            # TODO stop when all 1s?
+def get_reachability(B_f, threshold, sparse=False):
+    """
+    Computes the reachability matrix of a transition model, whose entry ``b[next_state, state]`` is ``True`` if there exists an action that allows
+    transitioning from ``state`` to ``next_state`` with a probability larger than ``threshold``
 
-    return I
+    Parameters
+    ----------
+    B_f: 3D ``numpy.ndarray``
+        Transition model of a single hidden state factor, of shape ``(num_states, num_states, num_controls)``
+    threshold: ``float``
+        The threshold for pruning transitions that are below a certain probability
+    sparse: ``bool``, default ``False``
+        Whether to return the reachability matrix as a ``scipy.sparse.csr_matrix``, rather than a dense boolean array
+
+    Returns
+    ----------
+    b: 2D ``numpy.ndarray`` of ``bool`` or ``scipy.sparse.csr_matrix``
+        The reachability matrix, of shape ``(num_states, num_states)``
+    """
+
+    b = np.any(B_f > threshold, axis=-1)
+    if sparse:
+        from scipy import sparse as sp # only imported when sparse reachability matrices are requested
+        b = sp.csr_matrix(b)
+    return b
+
+def backwards_induction_factor(H_f, b, depth):
+    """
+    Runs backwards induction of reaching the goal state ``H_f`` of a single hidden state factor, given its reachability matrix ``b``
+    (see ``get_reachability``). The induction stops as soon as the set of states from which the goal can be reached no longer changes,
+    since all the remaining steps would be the same.
+
+    Returns
+    ----------
+    I_f: 2D ``numpy.ndarray``
+        Array of shape ``(depth, num_states)`` whose element i,j yields the probability of reaching the goal state backwards from state j after i steps.
+    """
+
+    I_f = np.zeros((depth, H_f.shape[0]))
+    I_f[0, :] = H_f
+
+    b = b.astype(np.float64)
+    for i in range(1, depth):
+        I_f[i, :] = np.where(b.dot(I_f[i-1, :]) > 0.1, 1.0, 0.0)
+        if i > 1 and np.array_equal(I_f[i, :], I_f[i-1, :]):
+            I_f[i + 1:, :] = I_f[i, :]
+            break
+
+    return I_f
+
+def _induction_factor(factor, B_factor_list):
+    """
+    Returns the index of the transition model that backwards induction uses for the hidden state factor ``factor``
+    """
+
+    if B_factor_list is None:
+        return factor
+    if len(B_factor_list[factor]) > 1:
+        raise ValueError("Backwards induction with factorized transition model not yet implemented")
+    return B_factor_list[factor][0]
 
 def calc_ambiguity_factorized(qs_pi, A, A_factor_list):
     """
@@ -1352,7 +1443,7 @@ def calc_ambiguity_factorized(qs_pi, A, A_factor_list):
 
 def sophisticated_inference_search(qs, policies, A, B, C, A_factor_list, B_factor_list, I=None, horizon=1,
                                    policy_prune_threshold=1/16, state_prune_threshold=1/16, prune_penalty=512, gamma=16,
-                                   inference_params = {"num_iter": 10, "dF": 1.0, "dF_tol": 0.001, "compute_vfe": False}, n=0):
+                                   inference_params = {"num_iter": 10, "dF": 1.0, "dF_tol": 0.001, "compute_vfe": False}, n=0, B_by_action=None):
     """
     Performs sophisticated inference to find the optimal policy for a given generative model and prior preferences.
 
@@ -1394,6 +1485,9 @@ def sophisticated_inference_search(qs, policies, A, B, C, A_factor_list, B_facto
         Prior precision over policies, scales the contribution of the expected free energy to the posterior over policies
     n: ``int``
         timestep in the future we are calculating
+    B_by_action: ``numpy.ndarray`` of dtype object, optional
+        Action-major copy of ``B`` (as returned by ``utils.action_major``), whose contiguous sub-arrays ``B_by_action[f][u]`` are used in place of
+        the strided slices ``B[f][..., u]`` if provided.
         
     Returns
     ----------
@@ -1411,14 +1505,14 @@ def sophisticated_inference_search(qs, policies, A, B, C, A_factor_list, B_facto
     qo_pi = utils.obj_array(n_policies)
 
     for idx, policy in enumerate(policies):
-        qs_pi[idx] = get_expected_states_interactions(qs, B, B_factor_list, policy)
+        qs_pi[idx] = get_expected_states_interactions(qs, B, B_factor_list, policy, B_by_action=B_by_action)
         qo_pi[idx] = get_expected_obs_factorized(qs_pi[idx], A, A_factor_list)
 
         G[idx] += calc_expected_utility(qo_pi[idx], C)
         G[idx] += calc_states_info_gain_factorized(A, qs_pi[idx], A_factor_list)
 
-        if I is not None:
-            G[idx] += calc_inductive_cost(qs, qs_pi[idx], I)
+    if I is not None:
+        G += calc_inductive_cost_policies(qs, qs_pi, I)
 
     q_pi = softmax(G * gamma)
 
@@ -1458,7 +1552,7 @@ def sophisticated_inference_search(qs, policies, A, B, C, A_factor_list, B_facto
                     qs_next = update_posterior_states_factorized(A, qo_one_hot, num_obs, num_states, mb_dict, qs_pi[idx][0], **inference_params)
                     q_pi_next, G_next = sophisticated_inference_search(qs_next, policies, A, B, C, A_factor_list, B_factor_list, I,
                                                                        horizon, policy_prune_threshold, state_prune_threshold,
-                                                                       prune_penalty, gamma, inference_params, n+1)
+                                                                       prune_penalty, gamma, inference_params, n+1, B_by_action=B_by_action)
                     G_weighted = np.dot(q_pi_next, G_next) * prob
                     G[idx] += G_weighted
 
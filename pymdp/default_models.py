@@ -69,47 +69,100 @@ def generate_epistemic_MAB_model():
 
     return A, B, C, control_fac_idx
 
-def generate_grid_world_transitions(action_labels, num_rows = 3, num_cols = 3):
+# displacement (row, column) of each of the grid world moves
+GRID_MOVES = {"UP": (-1, 0), "RIGHT": (0, 1), "DOWN": (1, 0), "LEFT": (0, -1), "STAY": (0, 0)}
+
+def generate_grid_world_transitions(action_labels, num_rows = 3, num_cols = 3, format = "dense"):
     """ 
     Wrapper code for creating the controllable transition matrix 
     that an agent can use to navigate in a 2-dimensional grid world
+
+    Parameters
+    ----------
+    action_labels: ``list`` of ``str``
+        Names of the actions, each of which must be one of the moves in ``GRID_MOVES`` ("UP", "RIGHT", "DOWN", "LEFT" or "STAY")
+    num_rows: ``int``
+        Number of rows of the grid
+    num_cols: ``int``
+        Number of columns of the grid
+    format: ``str``
+        Format of the transition model. With ``"dense"``, it is returned as a ``numpy.ndarray`` of shape ``(num_grid_locs, num_grid_locs, num_actions)``.
+        With ``"sparse"``, it is returned as a list of ``scipy.sparse.csr_matrix``, one ``(num_grid_locs, num_grid_locs)`` transition matrix per action.
+        With ``"factorized"``, it is returned as an object array storing the separate transition models of the row (``B[0]``) and the column (``B[1]``)
+        coordinates, both indexed by the same action. The dense transition model of an action ``a`` is then ``np.kron(B[0][:, :, a], B[1][:, :, a])``.
+
+    Returns
+    ----------
+    transition_matrix: ``numpy.ndarray``, ``list`` of ``scipy.sparse.csr_matrix`` or ``numpy.ndarray`` of dtype object
+        The transition model, in the requested format
     """
 
-    num_grid_locs = num_rows * num_cols
-
-    transition_matrix = np.zeros( (num_grid_locs, num_grid_locs, len(action_labels)) )
-
-    grid = np.arange(num_grid_locs).reshape(num_rows, num_cols)
-    it = np.nditer(grid, flags=["multi_index"])
-
-    loc_list = []
-    while not it.finished:
-        loc_list.append(it.multi_index)
-        it.iternext()
-
-    for action_id, action_label in enumerate(action_labels):
-
-        for curr_state, grid_location in enumerate(loc_list):
-
-            curr_row, curr_col = grid_location
-            
-            if action_label == "LEFT":
-                next_col = curr_col - 1 if curr_col > 0 else curr_col 
-                next_row = curr_row
-            elif action_label == "DOWN":
-                next_row = curr_row + 1 if curr_row < (num_rows-1) else curr_row 
-                next_col = curr_col
-            elif action_label == "RIGHT":
-                next_col = curr_col + 1 if curr_col < (num_cols-1) else curr_col 
-                next_row = curr_row
-            elif action_label == "UP":
-                next_row = curr_row - 1 if curr_row > 0 else curr_row 
-                next_col = curr_col
-            elif action_label == "STAY":
-                next_row, next_col = curr_row, curr_col
-
-            new_location = (next_row, next_col)
-            next_state = loc_list.index(new_location)
-            transition_matrix[next_state, curr_state, action_id] = 1.0
-    
-    return transition_matrix
+    if format not in ["dense", "sparse", "factorized"]:
+        raise ValueError(f"Unknown transition model format {format}: the format must be one of 'dense', 'sparse' or 'factorized'")
+
+    if format == "factorized":
+        transition_matrix = utils.obj_array(2)
+        for axis, num_positions in enumerate([num_rows, num_cols]):
+            # each coordinate moves as a one-dimensional grid world
+            table = grid_world_transition_table(action_labels, num_positions, 1, axis=axis)
+            transition_matrix[axis] = transition_table_to_B(table)
+        return transition_matrix
+
+    table = grid_world_transition_table(action_labels, num_rows, num_cols)
+    return transition_table_to_B(table, sparse=(format == "sparse"))
+
+def grid_world_transition_table(action_labels, num_rows = 3, num_cols = 3, axis = None):
+    """
+    Computes the deterministic transitions of a 2-dimensional grid world as an index array, where ``table[s, a]`` is the (linear) index of the
+    grid location that the action ``a`` leads to from location ``s``. Moves that would leave the grid keep the agent in place.
+
+    Parameters
+    ----------
+    action_labels: ``list`` of ``str``
+        Names of the actions, each of which must be one of the moves in ``GRID_MOVES``
+    num_rows: ``int``
+        Number of rows of the grid
+    num_cols: ``int``
+        Number of columns of the grid
+    axis: ``int`` or ``None``
+        If not ``None``, only the component of the moves along this axis (0 for rows, 1 for columns) is applied, and the grid is treated as a single column
+        of ``num_rows`` positions along that axis
+
+    Returns
+    ----------
+    table: 2D ``numpy.ndarray`` of ``int``
+        Index array of shape ``(num_rows * num_cols, len(action_labels))``
+    """
+
+    unknown = [label for label in action_labels if label not in GRID_MOVES]
+    if len(unknown) > 0:
+        raise ValueError(f"Unknown grid world actions {unknown}: actions must be one of {list(GRID_MOVES.keys())}")
+
+    moves = np.array([GRID_MOVES[label] for label in action_labels]) # shape (num_actions, 2)
+    if axis is not None:
+        moves = np.stack([moves[:, axis], np.zeros_like(moves[:, axis])], axis=1)
+
+    rows, cols = np.divmod(np.arange(num_rows * num_cols), num_cols)
+    next_rows = np.clip(rows[:, None] + moves[None, :, 0], 0, num_rows - 1)
+    next_cols = np.clip(cols[:, None] + moves[None, :, 1], 0, num_cols - 1)
+
+    return next_rows * num_cols + next_cols
+
+def transition_table_to_B(table, sparse = False):
+    """
+    Converts an index array of deterministic transitions ``table`` of shape ``(num_states, num_actions)`` (see ``grid_world_transition_table``)
+    into a transition model. If ``sparse`` is ``False``, the transition model is a dense ``numpy.ndarray`` of shape ``(num_states, num_states, num_actions)``,
+    and otherwise a list of ``scipy.sparse.csr_matrix``, with one ``(num_states, num_states)`` transition matrix per action.
+    """
+
+    num_states, num_actions = table.shape
+    states = np.arange(num_states)
+
+    if sparse:
+        from scipy import sparse as sp # only imported when a sparse model is requested
+        ones = np.ones(num_states)
+        return [sp.csr_matrix((ones, (table[:, a], states)), shape=(num_states, num_states)) for a in range(num_actions)]
+
+    B = np.zeros((num_states, num_states, num_actions))
+    B[table, states[:, None], np.arange(num_actions)[None, :]] = 1.0
+    return B
@@ -8,11 +8,10 @@ __author__: Conor Heins, Alexander Tschantz, Brennan Klein
 """
 
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 
 
 from pymdp.envs import Env
+from pymdp.default_models import generate_grid_world_transitions, grid_world_transition_table
 
 
 class GridWorldEnv(Env):
@@ -100,7 +99,7 @@ class GridWorldEnv(Env):
         state: ``int``
             The new, updated state of the environment, i.e. the location of the agent in grid world after the action has been made. Will be discrete index in the range ``(0, (shape[0] * shape[1])-1)``. It is thus a "linear index" of the location of the agent in grid world.
         """
-        state = self.P[self.state][action]
+        state = int(self.transition_table[self.state, action])
         self.state = state
         self.last_action = action
         return state
@@ -114,18 +113,8 @@ class GridWorldEnv(Env):
         title: ``str`` or ``None``
             Optional title for the heatmap.
         """
-        values = np.zeros(self.shape)
-        values[self.position] = 1.0
-        _, ax = plt.subplots(figsize=(3, 3))
-        if self.shape[0] == 1 or self.shape[1] == 1:
-            ax.imshow(values, cmap="OrRd")
-        else:
-            _ = sns.heatmap(values, cmap="OrRd", linewidth=2.5, cbar=False, ax=ax)
-        plt.xticks(range(self.shape[1]))
-        plt.yticks(range(self.shape[0]))
-        if title != None:
-            plt.title(title)
-        plt.show()
+        from pymdp.viz import plot_grid_position # the plotting libraries are only imported when rendering
+        plot_grid_position(self.shape, self.position, title=title)
 
     def set_init_state(self, init_state=None):
         if init_state != None:
@@ -139,30 +128,8 @@ class GridWorldEnv(Env):
         self.state = self.init_state
 
     def _build(self):
-        P = {}
-        grid = np.arange(self.n_states).reshape(self.shape)
-        it = np.nditer(grid, flags=["multi_index"])
-
-        while not it.finished:
-            s = it.iterindex
-            y, x = it.multi_index
-            P[s] = {a: [] for a in range(self.n_control)}
-
-            next_up = s if y == 0 else s - self.max_x
-            next_right = s if x == (self.max_x - 1) else s + 1
-            next_down = s if y == (self.max_y - 1) else s + self.max_x
-            next_left = s if x == 0 else s - 1
-            next_stay = s
-
-            P[s][self.UP] = next_up
-            P[s][self.RIGHT] = next_right
-            P[s][self.DOWN] = next_down
-            P[s][self.LEFT] = next_left
-            P[s][self.STAY] = next_stay
-
-            it.iternext()
-
-        self.P = P
+        # index array of the next state, for each (state, action) pair
+        self.transition_table = grid_world_transition_table(self.CONTROL_NAMES, self.max_y, self.max_x)
 
     def get_init_state_dist(self, init_state=None):
         init_state_dist = np.zeros(self.n_states)
@@ -171,13 +138,19 @@ class GridWorldEnv(Env):
         else:
             init_state_dist[init_state] = 1.0
 
-    def get_transition_dist(self):
-        B = np.zeros([self.n_states, self.n_states, self.n_control])
-        for s in range(self.n_states):
-            for a in range(self.n_control):
-                ns = int(self.P[s][a])
-                B[ns, s, a] = 1
-        return B
+    def get_transition_dist(self, format="dense"):
+        """
+        Returns the transition model of the grid world.
+
+        Parameters
+        ----------
+        format: ``str``
+            With ``"dense"``, the transition model is a ``numpy.ndarray`` of shape ``(n_states, n_states, n_control)``.
+            With ``"sparse"``, it is a list of ``scipy.sparse.csr_matrix``, one transition matrix per action.
+            With ``"factorized"``, it is an object array storing the transition models of the row (``B[0]``) and column (``B[1]``) coordinates, both indexed by the same action
+            (see ``default_models.generate_grid_world_transitions``).
+        """
+        return generate_grid_world_transitions(self.CONTROL_NAMES, self.max_y, self.max_x, format=format)
 
     def get_likelihood_dist(self):
         A = np.eye(self.n_observations, self.n_states)
@@ -186,6 +159,11 @@ class GridWorldEnv(Env):
     def sample_action(self):
         return np.random.randint(self.n_control)
 
+    @property
+    def P(self):
+        """ Transitions as a dictionary, where ``P[s][a]`` is the next state after action ``a`` in state ``s`` """
+        return {s: {a: int(ns) for a, ns in enumerate(row)} for s, row in enumerate(self.transition_table)}
+
     @property
     def position(self):
         """ @TODO might be wrong w.r.t (x & y) """
@@ -222,24 +200,14 @@ class DGridWorldEnv(object):
         return state
 
     def step(self, action):
-        state = self.P[self.state][action]
+        state = int(self.transition_table[self.state, action])
         self.state = state
         self.last_action = action
         return state
 
     def render(self, title=None):
-        values = np.zeros(self.shape)
-        values[self.position] = 1.0
-        _, ax = plt.subplots(figsize=(3, 3))
-        if self.shape[0] == 1 or self.shape[1] == 1:
-            ax.imshow(values, cmap="OrRd")
-        else:
-            _ = sns.heatmap(values, cmap="OrRd", linewidth=2.5, cbar=False, ax=ax)
-        plt.xticks(range(self.shape[1]))
-        plt.yticks(range(self.shape[0]))
-        if title != None:
-            plt.title(title)
-        plt.show()
+        from pymdp.viz import plot_grid_position # the plotting libraries are only imported when rendering
+        plot_grid_position(self.shape, self.position, title=title)
 
     def set_init_state(self, init_state=None):
         if init_state != None:
@@ -253,26 +221,8 @@ class DGridWorldEnv(object):
         self.state = self.init_state
 
     def _build(self):
-        P = {}
-        grid = np.arange(self.n_states).reshape(self.shape)
-        it = np.nditer(grid, flags=["multi_index"])
-
-        while not it.finished:
-            s = it.iterindex
-            y, x = it.multi_index
-            P[s] = {a: [] for a in range(self.n_control)}
-
-            next_right = s if x == (self.max_x - 1) else s + 1
-            next_left = s if x == 0 else s - 1
-            next_stay = s
-
-            P[s][self.LEFT] = next_left
-            P[s][self.STAY] = next_stay
-            P[s][self.RIGHT] = next_right
-
-            it.iternext()
-
-        self.P = P
+        # index array of the next state, for each (state, action) pair
+        self.transition_table = grid_world_transition_table(self.CONTROL_NAMES, self.max_y, self.max_x)
 
     def get_init_state_dist(self, init_state=None):
         init_state_dist = np.zeros(self.n_states)
@@ -281,13 +231,8 @@ class DGridWorldEnv(object):
         else:
             init_state_dist[init_state] = 1.0
 
-    def get_transition_dist(self):
-        B = np.zeros([self.n_states, self.n_states, self.n_control])
-        for s in range(self.n_states):
-            for a in range(self.n_control):
-                ns = int(self.P[s][a])
-                B[ns, s, a] = 1
-        return B
+    def get_transition_dist(self, format="dense"):
+        return generate_grid_world_transitions(self.CONTROL_NAMES, self.max_y, self.max_x, format=format)
 
     def get_likelihood_dist(self):
         A = np.eye(self.n_observations, self.n_states)
@@ -296,6 +241,10 @@ class DGridWorldEnv(object):
     def sample_action(self):
         return np.random.randint(self.n_control)
 
+    @property
+    def P(self):
+        return {s: {a: int(ns) for a, ns in enumerate(row)} for s, row in enumerate(self.transition_table)}
+
     @property
     def position(self):
         return self.state
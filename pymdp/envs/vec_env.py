@@ -0,0 +1,310 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Batched (vectorized) environments
+
+A ``VecEnv`` steps ``num_envs`` independent instances of a discrete environment at once. The hidden states of all the instances are stored in
+an integer array of shape ``(num_envs, num_factors)``, actions are integer arrays of shape ``(num_envs, num_factors)``, and observations are
+returned as integer arrays of shape ``(num_envs, num_modalities)``. Transitions and observations are sampled from array-backed tables, i.e.
+by gathering rows of cumulative distribution tables (or of index tables, for deterministic transitions and observations), instead of
+stepping each instance with Python-level state.
+
+Each instance draws its random numbers from its own ``numpy.random.Generator``, spawned from a single seed. The trajectory of an instance
+therefore only depends on the seed and on its index, and not on the number of instances that are stepped alongside it.
+
+__author__: Conor Heins, Alexander Tschantz, Brennan Klein
+
+"""
+
+import numpy as np
+
+from pymdp import utils
+from pymdp.envs.grid_worlds import GridWorldEnv, DGridWorldEnv
+from pymdp.envs.tmaze import TMazeEnv, TMazeEnvNullOutcome
+
+# number of random numbers that are drawn ahead per instance, each time the per-instance buffers run out
+UNIFORM_BUFFER_SIZE = 256
+
+class VecEnv(object):
+    """
+    Batch of ``num_envs`` instances of a discrete environment, whose dynamics are given by the transition model ``B`` (one array of shape
+    ``(num_states[f], num_states[f], num_controls[f])`` per hidden state factor) and whose observations are generated by the observation model
+    ``A`` (one array of shape ``(num_obs[m], *num_states)`` per modality).
+    """
+
+    def __init__(self, A, B, D=None, num_envs=1, seed=None):
+        """
+        Parameters
+        ----------
+        A: ``numpy.ndarray`` of dtype object
+            Observation model, where ``A[m]`` stores the probabilities of the observations of modality ``m``, given the states of all the hidden state factors
+        B: ``numpy.ndarray`` of dtype object
+            Transition model, where ``B[f]`` stores the probabilities of the next state of factor ``f``, given its current state and the action of factor ``f``
+        D: ``numpy.ndarray`` of dtype object or ``None``
+            Distributions of the initial hidden states, that are sampled from when the instances are reset without an initial state.
+            If ``None``, the initial states are sampled uniformly.
+        num_envs: ``int``
+            Number of instances in the batch
+        seed: ``int``, ``numpy.random.SeedSequence`` or ``None``
+            Seed from which the random number generators of the instances are spawned
+        """
+
+        A = utils.to_obj_array(A)
+        B = utils.to_obj_array(B)
+
+        self.num_envs = num_envs
+        self.num_states = [B_f.shape[0] for B_f in B]
+        self.num_controls = [B_f.shape[-1] for B_f in B]
+        self.num_obs = [A_m.shape[0] for A_m in A]
+        self.num_factors = len(self.num_states)
+        self.num_modalities = len(self.num_obs)
+
+        for f, B_f in enumerate(B):
+            if B_f.ndim != 3:
+                raise ValueError(f"B[{f}] must have shape (num_states, num_states, num_controls): interactions between hidden state factors are not supported")
+
+        if D is None:
+            D = utils.obj_array_uniform(self.num_states)
+
+        self._A = A
+        self._B = B
+        self._D = utils.to_obj_array(D)
+
+        # transition tables, indexed by (action, state)
+        self._transition_tables = [_build_table(B_f.transpose(2, 1, 0)) for B_f in B]
+        # observation tables, indexed by the linear index of the joint hidden state
+        self._likelihood_tables = [_build_table(A_m.reshape(A_m.shape[0], -1).T) for A_m in A]
+        # initial state tables, with a single row
+        self._init_tables = [_build_table(D_f[None, :]) for D_f in self._D]
+
+        seed_seq = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        self._rngs = [np.random.default_rng(child) for child in seed_seq.spawn(num_envs)]
+        self._uniforms = np.empty((num_envs, UNIFORM_BUFFER_SIZE))
+        self._cursors = np.full(num_envs, UNIFORM_BUFFER_SIZE) # position of the next unused random number in the buffer of each instance
+
+        self._states = np.zeros((num_envs, self.num_factors), dtype=int)
+
+    def reset(self, init_state=None, env_ids=None):
+        """
+        Resets (a subset of) the instances, and returns their initial observations
+
+        Parameters
+        ----------
+        init_state: ``numpy.ndarray`` of ``int`` or ``None``
+            Initial hidden state indices, of shape ``(num_factors,)`` (the same initial state for all the instances) or ``(len(env_ids), num_factors)``.
+            If ``None``, the initial states are sampled from ``D``.
+        env_ids: ``numpy.ndarray`` of ``int`` or ``None``
+            Indices of the instances to reset. If ``None``, all the instances are reset.
+
+        Returns
+        ----------
+        obs: 2D ``numpy.ndarray`` of ``int``
+            The initial observations of the reset instances, of shape ``(len(env_ids), num_modalities)``
+        """
+
+        env_ids = np.arange(self.num_envs) if env_ids is None else np.asarray(env_ids)
+
+        if init_state is None:
+            rows = np.zeros(len(env_ids), dtype=int)
+            init_state = np.stack(
+                [self._sample(table, rows, env_ids) for table in self._init_tables], axis=-1
+            )
+        self._states[env_ids] = init_state
+
+        return self._observe(env_ids)
+
+    def step(self, actions):
+        """
+        Steps all the instances forward, and returns their new observations
+
+        Parameters
+        ----------
+        actions: 2D ``numpy.ndarray`` of ``int``
+            Action indices, of shape ``(num_envs, num_factors)``
+
+        Returns
+        ----------
+        obs: 2D ``numpy.ndarray`` of ``int``
+            The observations of the instances, of shape ``(num_envs, num_modalities)``
+        """
+
+        actions = np.asarray(actions, dtype=int).reshape(self.num_envs, self.num_factors)
+        env_ids = np.arange(self.num_envs)
+
+        next_states = np.empty_like(self._states)
+        for f, table in enumerate(self._transition_tables):
+            next_states[:, f] = self._sample(table, (actions[:, f], self._states[:, f]), env_ids)
+        self._states = next_states
+
+        return self._observe(env_ids)
+
+    def sample_action(self):
+        """
+        Samples a random action for each instance, from its own random number generator
+
+        Returns
+        ----------
+        actions: 2D ``numpy.ndarray`` of ``int``
+            Action indices, of shape ``(num_envs, num_factors)``
+        """
+
+        u = self._draw(self.num_factors, np.arange(self.num_envs))
+        return (u * np.array(self.num_controls)).astype(int)
+
+    def render(self):
+        pass
+
+    def get_likelihood_dist(self):
+        return self._A
+
+    def get_transition_dist(self):
+        return self._B
+
+    @property
+    def states(self):
+        """ Hidden state indices of all the instances, of shape ``(num_envs, num_factors)`` """
+        return self._states
+
+    def _observe(self, env_ids):
+        """
+        Samples observations for the instances ``env_ids``, given their current hidden states
+        """
+
+        joint_states = np.ravel_multi_index(tuple(self._states[env_ids].T), self.num_states)
+        obs = np.empty((len(env_ids), self.num_modalities), dtype=int)
+        for m, table in enumerate(self._likelihood_tables):
+            obs[:, m] = self._sample(table, joint_states, env_ids)
+        return obs
+
+    def _sample(self, table, index, env_ids):
+        """
+        Samples the outcome of the categorical distributions ``table[index]`` (one per instance in ``env_ids``), by inverse transform sampling
+        """
+
+        outcomes, cdf = table
+        if outcomes is not None:
+            return outcomes[index]
+
+        cdf = cdf[index]
+        u = self._draw(1, env_ids)
+        return np.minimum((cdf <= u).sum(axis=-1), cdf.shape[-1] - 1)
+
+    def _draw(self, size, env_ids):
+        """
+        Returns uniform random numbers of shape ``(len(env_ids), size)``, from the random number generators of the instances ``env_ids``.
+        Only the buffers of the instances ``env_ids`` are consumed (and refilled when they run out), so that the stream of every instance only
+        depends on its own resets and steps
+        """
+
+        env_ids = np.asarray(env_ids)
+        for env_id in env_ids[self._cursors[env_ids] + size > UNIFORM_BUFFER_SIZE]:
+            self._rngs[env_id].random(out=self._uniforms[env_id])
+            self._cursors[env_id] = 0
+
+        cursors = self._cursors[env_ids]
+        u = self._uniforms[env_ids[:, None], cursors[:, None] + np.arange(size)]
+        self._cursors[env_ids] += size
+        return u
+
+
+class GridWorldVecEnv(VecEnv):
+    """ Batched counterpart of ``GridWorldEnv``, whose states, actions and observations are the 1-D arrays of the grid locations and moves of the instances """
+
+    def __init__(self, shape=[2, 2], num_envs=1, seed=None):
+        self._env = GridWorldEnv(shape=shape, init_state=0)
+        self.shape = shape
+        super().__init__(
+            utils.to_obj_array(self._env.get_likelihood_dist()), utils.to_obj_array(self._env.get_transition_dist()), num_envs=num_envs, seed=seed
+        )
+
+    def reset(self, init_state=None, env_ids=None):
+        if init_state is not None:
+            init_state = np.asarray(init_state)[..., None]
+        return super().reset(init_state, env_ids)[:, 0]
+
+    def step(self, actions):
+        return super().step(actions)[:, 0]
+
+    def sample_action(self):
+        return super().sample_action()[:, 0]
+
+    @property
+    def position(self):
+        return np.unravel_index(self._states[:, 0], self.shape)
+
+
+class DGridWorldVecEnv(GridWorldVecEnv):
+    """ Batched counterpart of ``DGridWorldEnv`` """
+
+    def __init__(self, shape=[2, 2], num_envs=1, seed=None):
+        self._env = DGridWorldEnv(shape=shape, init_state=0)
+        self.shape = shape
+        VecEnv.__init__(
+            self, utils.to_obj_array(self._env.get_likelihood_dist()), utils.to_obj_array(self._env.get_transition_dist()), num_envs=num_envs, seed=seed
+        )
+
+    @property
+    def position(self):
+        return self._states[:, 0]
+
+
+class TMazeVecEnv(VecEnv):
+    """ Batched counterpart of ``TMazeEnv``. Every instance starts in the centre location, in a reward condition that is sampled at random """
+
+    env_class = TMazeEnv
+
+    def __init__(self, reward_probs=None, num_envs=1, seed=None):
+        self._env = self.env_class(reward_probs=reward_probs)
+        D = utils.obj_array_from_list([utils.onehot(0, self._env.num_locations), utils.norm_dist(np.ones(self._env.num_reward_conditions))])
+        super().__init__(self._env.get_likelihood_dist(), self._env.get_transition_dist(), D=D, num_envs=num_envs, seed=seed)
+
+    @property
+    def reward_condition(self):
+        return self._states[:, 1]
+
+
+class TMazeNullOutcomeVecEnv(TMazeVecEnv):
+    """ Batched counterpart of ``TMazeEnvNullOutcome`` """
+
+    env_class = TMazeEnvNullOutcome
+
+
+class VisualForagingVecEnv(VecEnv):
+    """
+    Batched counterpart of ``VisualForagingEnv``. The first location is the fixation location, where no feature is observed,
+    and the remaining locations are the cells of the scenes. Every instance starts in the fixation location, in a scene that is sampled at random
+    """
+
+    def __init__(self, scenes=None, n_features=2, num_envs=1, seed=None):
+        self.scenes = np.array([[[2, 2], [2, 2]], [[1, 1], [1, 1]]]) if scenes is None else np.asarray(scenes)
+        self.n_scenes = len(self.scenes)
+        self.n_features = n_features + 1
+        self.n_locations = int(np.prod(self.scenes[0].shape)) + 1
+
+        B = utils.obj_array(2)
+        B[0] = np.tile(np.eye(self.n_locations)[:, None, :], (1, self.n_locations, 1))
+        B[1] = np.eye(self.n_scenes)[:, :, None]
+
+        # feature observed at each location of each scene, with the null feature (0) at the fixation location
+        features = np.concatenate([np.zeros((self.n_scenes, 1), dtype=int), self.scenes.reshape(self.n_scenes, -1)], axis=1).T
+        A = utils.obj_array(2)
+        A[0] = np.tile(np.eye(self.n_locations)[:, :, None], (1, 1, self.n_scenes))
+        A[1] = np.moveaxis(np.eye(self.n_features)[features], -1, 0)
+
+        D = utils.obj_array_from_list([utils.onehot(0, self.n_locations), utils.norm_dist(np.ones(self.n_scenes))])
+        super().__init__(A, B, D=D, num_envs=num_envs, seed=seed)
+
+    @property
+    def true_scene(self):
+        return self._states[:, 1]
+
+
+def _build_table(probs):
+    """
+    Converts the categorical distributions stored along the last axis of ``probs`` into a sampling table. If all the distributions are deterministic,
+    the table stores the index of their outcomes, and otherwise their cumulative distributions.
+    """
+
+    if np.allclose(probs.max(axis=-1), 1.0):
+        return probs.argmax(axis=-1), None
+    return None, np.cumsum(probs, axis=-1)
@@ -6,7 +6,7 @@ import numpy as np
 
 from pymdp import utils
 from pymdp.maths import get_joint_likelihood_seq, get_joint_likelihood_seq_by_modality
-from pymdp.algos import run_vanilla_fpi, run_vanilla_fpi_factorized, run_mmp, run_mmp_factorized, _run_mmp_testing
+from pymdp.algos import run_vanilla_fpi, run_vanilla_fpi_factorized, run_mmp, run_mmp_factorized, _run_mmp_testing, run_vmp_factorized, run_forward_backward
 
 VANILLA = "VANILLA"
 VMP = "VMP"
@@ -62,7 +62,8 @@ def update_posterior_states_full(
 
     num_obs, num_states, num_modalities, num_factors = utils.get_model_dimensions(A, B)
     
-    prev_obs = utils.process_observation_seq(prev_obs, num_modalities, num_obs)
+    obs_idx = utils.to_obs_indices_seq(prev_obs, num_modalities) # observation indices are used as is, rather than converted to one-hot vectors
+    prev_obs = obs_idx if obs_idx is not None else utils.process_observation_seq(prev_obs, num_modalities, num_obs)
    
     lh_seq = get_joint_likelihood_seq(A, prev_obs, num_states)
 
@@ -96,10 +97,12 @@ def update_posterior_states_full_factorized(
     prev_actions=None,
     prior=None,
     policy_sep_prior = True,
+    inference_algo = MMP,
+    B_by_action=None,
     **kwargs,
 ):
     """
-    Update posterior over hidden states using marginal message passing
+    Update posterior over hidden states using marginal message passing (or, if ``inference_algo == "VMP"``, variational message passing)
 
     Parameters
     ----------
@@ -126,34 +129,54 @@ def update_posterior_states_full_factorized(
         If ``None``, this defaults to a flat (uninformative) prior over hidden states.
     policy_sep_prior: ``Bool``, default ``True``
         Flag determining whether the prior beliefs from the past are unconditioned on policy, or separated by /conditioned on the policy variable.
+    inference_algo: ``str``, default "MMP"
+        Which message passing algorithm to use, either "MMP" (``algos.mmp.run_mmp_factorized``) or "VMP" (``algos.vmp.run_vmp_factorized``)
+    B_by_action: ``numpy.ndarray`` of dtype object, optional
+        Action-major copy of ``B`` (as returned by ``utils.action_major``), whose contiguous sub-arrays ``B_by_action[f][u]`` are used in place of
+        the strided slices ``B[f][..., u]``. If ``None``, it is computed from ``B`` (once for all policies).
     **kwargs: keyword arguments
-        Optional keyword arguments for the function ``algos.mmp.run_mmp``
+        Optional keyword arguments for the function ``algos.mmp.run_mmp_factorized`` or ``algos.vmp.run_vmp_factorized``
 
     Returns
     ---------
-    qs_seq_pi: ``numpy.ndarray`` of dtype object
-        Posterior beliefs over hidden states for each policy. Nesting structure is policies, timepoints, factors,
-        where e.g. ``qs_seq_pi[p][t][f]`` stores the marginal belief about factor ``f`` at timepoint ``t`` under policy ``p``.
+    qs_seq_pi: ``utils.PolicyBeliefArray``
+        Posterior beliefs over hidden states for each policy, stored as one array of shape ``(num_policies, infer_len, num_states[f])`` per factor.
+        Indexing follows the nesting structure policies, timepoints, factors, where e.g. ``qs_seq_pi[p][t][f]`` stores the marginal belief about factor ``f`` at timepoint ``t`` under policy ``p``.
     F: 1D ``numpy.ndarray``
         Vector of variational free energies for each policy
     """
 
     num_obs, num_states, num_modalities, num_factors = utils.get_model_dimensions(A, B)
     
-    prev_obs = utils.process_observation_seq(prev_obs, num_modalities, num_obs)
+    obs_idx = utils.to_obs_indices_seq(prev_obs, num_modalities) # observation indices are used as is, rather than converted to one-hot vectors
+    prev_obs = obs_idx if obs_idx is not None else utils.process_observation_seq(prev_obs, num_modalities, num_obs)
    
     lh_seq = get_joint_likelihood_seq_by_modality(A, prev_obs, num_states)
 
     if prev_actions is not None:
         prev_actions = np.stack(prev_actions,0)
 
-    qs_seq_pi = utils.obj_array(len(policies))
+    infer_len = len(prev_obs) + policies[0].shape[0]
+    if kwargs.get("last_timestep", False):
+        infer_len -= 1
+
+    if inference_algo == MMP:
+        run_message_passing = run_mmp_factorized
+    elif inference_algo == VMP:
+        run_message_passing = run_vmp_factorized
+    else:
+        raise ValueError(f"`inference_algo` must be either {MMP} or {VMP}")
+
+    if B_by_action is None:
+        B_by_action = utils.action_major(B)
+
+    qs_seq_pi = utils.PolicyBeliefArray.uniform(len(policies), infer_len, num_states)
     F = np.zeros(len(policies)) # variational free energy of policies
 
     for p_idx, policy in enumerate(policies):
 
-            # get sequence and the free energy for policy
-            qs_seq_pi[p_idx], F[p_idx] = run_mmp_factorized(
+            # get sequence and the free energy for policy, writing the beliefs directly into the rows of `qs_seq_pi` that belong to policy `p_idx`
+            _, F[p_idx] = run_message_passing(
                 lh_seq,
                 mb_dict,
                 B,
@@ -161,6 +184,8 @@ def update_posterior_states_full_factorized(
                 policy,
                 prev_actions=prev_actions,
                 prior= prior[p_idx] if policy_sep_prior else prior, 
+                out=[qs_f[p_idx] for qs_f in qs_seq_pi.factor_arrays],
+                B_by_action=B_by_action,
                 **kwargs
             )
 
@@ -218,7 +243,8 @@ def _update_posterior_states_full_test(
 
     num_obs, num_states, num_modalities, num_factors = utils.get_model_dimensions(A, B)
 
-    prev_obs = utils.process_observation_seq(prev_obs, num_modalities, num_obs)
+    obs_idx = utils.to_obs_indices_seq(prev_obs, num_modalities) # observation indices are used as is, rather than converted to one-hot vectors
+    prev_obs = obs_idx if obs_idx is not None else utils.process_observation_seq(prev_obs, num_modalities, num_obs)
     
     lh_seq = get_joint_likelihood_seq(A, prev_obs, num_states)
 
@@ -244,6 +270,55 @@ def _update_posterior_states_full_test(
 
     return qs_seq_pi, F, xn_seq_pi, vn_seq_pi
 
+def smooth_posterior_states(A, B, prev_obs, prev_actions=None, prior=None):
+    """
+    Exact posterior over hidden states, given a whole sequence of past observations and actions, using forward-backward smoothing.
+    Applies to models whose hidden state factors have independent dynamics (``B_factor_list[f] == [f]`` for all factors), including the single-factor case.
+
+    Parameters
+    ----------
+    A: ``numpy.ndarray`` of dtype object
+        Sensory likelihood mapping or 'observation model', mapping from hidden states to observations. Each element ``A[m]`` of
+        stores an ``numpy.ndarray`` multidimensional array for observation modality ``m``, whose entries ``A[m][i, j, k, ...]`` store 
+        the probability of observation level ``i`` given hidden state levels ``j, k, ...``
+    B: ``numpy.ndarray`` of dtype object
+        Dynamics likelihood mapping or 'transition model', mapping from hidden states at ``t`` to hidden states at ``t+1``, given some control state ``u``.
+        Each element ``B[f]`` of this object array stores a 3-D tensor for hidden state factor ``f``, whose entries ``B[f][s, v, u]`` store the probability
+        of hidden state level ``s`` at the current time, given hidden state level ``v`` and action ``u`` at the previous time.
+    prev_obs: ``list``
+        List of observations over time. Each observation in the list can be an ``int``, a ``list`` of ints, a ``tuple`` of ints, a one-hot vector or an object array of one-hot vectors.
+    prev_actions: ``list`` of 1D ``numpy.ndarray``, default ``None``
+        List of the actions taken between consecutive observations, i.e. of length ``len(prev_obs) - 1``
+    prior: ``numpy.ndarray`` of dtype object, default ``None``
+        If provided, this a ``numpy.ndarray`` of dtype object, with one sub-array per hidden state factor, that stores the prior beliefs about initial states. 
+        If ``None``, this defaults to a flat (uninformative) prior over hidden states.
+
+    Returns
+    ---------
+    qs_seq: ``numpy.ndarray`` of dtype object
+        Smoothed posterior beliefs over hidden states, where ``qs_seq[t][f]`` stores the marginal belief about factor ``f`` at timepoint ``t``
+    qss: ``numpy.ndarray`` of dtype object
+        Pairwise joint posteriors, one array of shape ``(len(prev_obs) - 1, num_states[f], num_states[f])`` per factor. The entries ``qss[f][t]``
+        can be passed (as ``qs_joint``) to ``learning.update_state_likelihood_dirichlet``
+    F: float
+        Negative log evidence of the observation sequence
+    """
+
+    num_obs, num_states, num_modalities, _ = utils.get_model_dimensions(A, B)
+
+    obs_idx = utils.to_obs_indices_seq(prev_obs, num_modalities) # observation indices are used as is, rather than converted to one-hot vectors
+    prev_obs = obs_idx if obs_idx is not None else utils.process_observation_seq(prev_obs, num_modalities, num_obs)
+
+    lh_seq = get_joint_likelihood_seq(A, prev_obs, num_states)
+
+    if prev_actions is not None and len(prev_actions) > 0:
+        prev_actions = np.stack(prev_actions,0)
+
+    if prior is not None:
+        prior = utils.to_obj_array(prior)
+
+    return run_forward_backward(lh_seq, B, actions=prev_actions, prior=prior)
+
 def average_states_over_policies(qs_pi, q_pi):
     """
     This function computes a expected posterior over hidden states with respect to the posterior over policies, 
@@ -251,9 +326,10 @@ def average_states_over_policies(qs_pi, q_pi):
 
     Parameters
     ----------
-    qs_pi: ``numpy.ndarray`` of dtype object
+    qs_pi: ``numpy.ndarray`` of dtype object or ``utils.PolicyBeliefArray``
         Posterior beliefs over hidden states for each policy. Nesting structure is policies, factors,
-        where e.g. ``qs_pi[p][f]`` stores the marginal belief about factor ``f`` under policy ``p``.
+        where e.g. ``qs_pi[p][f]`` stores the marginal belief about factor ``f`` under policy ``p``. If a ``utils.PolicyBeliefArray`` of shape ``(num_policies,)``
+        is passed, the average is computed with a single contraction per factor.
     q_pi: ``numpy.ndarray`` of dtype object
         Posterior beliefs about policies where ``len(q_pi) = num_policies``
 
@@ -264,6 +340,9 @@ def average_states_over_policies(qs_pi, q_pi):
         averaged across policies according to their posterior probability given by ``q_pi``
     """
 
+    if isinstance(qs_pi, utils.PolicyBeliefArray):
+        return utils.obj_array_from_list([np.asarray(q_pi).dot(qs_f) for qs_f in qs_pi.factor_arrays])
+
     num_factors = len(qs_pi[0]) # get the number of hidden state factors using the shape of the first-policy-conditioned posterior
     num_states = [qs_f.shape[0] for qs_f in qs_pi[0]] # get the dimensionalities of each hidden state factor 
 
@@ -314,7 +393,8 @@ def update_posterior_states(A, obs, prior=None, **kwargs):
 
     num_obs, num_states, num_modalities, _ = utils.get_model_dimensions(A = A)
     
-    obs = utils.process_observation(obs, num_modalities, num_obs)
+    obs_idx = utils.to_obs_indices(obs, num_modalities) # observation indices are used as is, rather than converted to one-hot vectors
+    obs = obs_idx if obs_idx is not None else utils.process_observation(obs, num_modalities, num_obs)
 
     if prior is not None:
         prior = utils.to_obj_array(prior)
@@ -363,7 +443,8 @@ def update_posterior_states_factorized(A, obs, num_obs, num_states, mb_dict, pri
     
     num_modalities = len(num_obs)
     
-    obs = utils.process_observation(obs, num_modalities, num_obs)
+    obs_idx = utils.to_obs_indices(obs, num_modalities) # observation indices are used as is, rather than converted to one-hot vectors
+    obs = obs_idx if obs_idx is not None else utils.process_observation(obs, num_modalities, num_obs)
 
     if prior is not None:
         prior = utils.to_obj_array(prior)
@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Saving and loading generative models
+
+A model is saved as a bundle: a directory with one raw ``.npy`` file per sub-array (e.g. ``A_0.npy``, ``B_1.npy``) and a JSON manifest
+(``manifest.json``), that records the format version, which arrays are stored, and the factor lists. Unlike pickled object arrays,
+the ``.npy`` files of a bundle can be memory-mapped when loading, so that even large likelihood tensors are available instantly,
+and their pages are shared between all the processes on a host that load the same bundle.
+
+__author__: Conor Heins, Alexander Tschantz, Daphne Demekas, Brennan Klein
+
+"""
+
+import os
+import json
+
+import numpy as np
+from pymdp import utils
+
+MANIFEST_NAME = "manifest.json"
+BUNDLE_FORMAT = "pymdp-model"
+BUNDLE_VERSION = 1
+
+# the object arrays that can be stored in a bundle, with one `.npy` file per sub-array
+OBJ_ARRAY_NAMES = ["A", "B", "C", "D", "pA", "pB", "pD"]
+
+def save_model(path, A, B, C=None, D=None, E=None, pA=None, pB=None, pD=None, A_factor_list=None, B_factor_list=None, policies=None):
+    """
+    Saves a generative model as a bundle in the directory ``path`` (which is created if necessary). Any arrays of a previous bundle in the same directory
+    are overwritten.
+
+    Parameters
+    ----------
+    path: ``str``
+        Directory to store the bundle in
+    A: ``numpy.ndarray`` of dtype object
+        Sensory likelihood mapping or 'observation model'
+    B: ``numpy.ndarray`` of dtype object
+        Dynamics likelihood mapping or 'transition model'
+    C: ``numpy.ndarray`` of dtype object, default ``None``
+        Prior preferences over observations
+    D: ``numpy.ndarray`` of dtype object, default ``None``
+        Prior beliefs about initial hidden states
+    E: 1D ``numpy.ndarray``, default ``None``
+        Prior over policies
+    pA: ``numpy.ndarray`` of dtype object, default ``None``
+        Dirichlet parameters over the observation model (same shape as ``A``)
+    pB: ``numpy.ndarray`` of dtype object, default ``None``
+        Dirichlet parameters over the transition model (same shape as ``B``)
+    pD: ``numpy.ndarray`` of dtype object, default ``None``
+        Dirichlet parameters over the initial hidden state prior (same shape as ``D``)
+    A_factor_list: ``list`` of ``list`` of ``int``, default ``None``
+        List of the hidden state factors that each observation modality depends on
+    B_factor_list: ``list`` of ``list`` of ``int``, default ``None``
+        List of the hidden state factors that the dynamics of each hidden state factor depend on
+    policies: ``list`` of 2D ``numpy.ndarray``, default ``None``
+        List of policies, each of shape ``(num_timesteps, num_factors)``
+    """
+
+    os.makedirs(path, exist_ok=True)
+
+    arrays = {"A": A, "B": B, "C": C, "D": D, "pA": pA, "pB": pB, "pD": pD}
+    manifest = {
+        "format": BUNDLE_FORMAT,
+        "version": BUNDLE_VERSION,
+        "arrays": {},
+        "A_factor_list": _to_json_list(A_factor_list),
+        "B_factor_list": _to_json_list(B_factor_list),
+    }
+
+    for name in OBJ_ARRAY_NAMES:
+        if arrays[name] is None:
+            continue
+        file_names = []
+        for i, arr in enumerate(utils.to_obj_array(arrays[name])):
+            file_names.append(f"{name}_{i}.npy")
+            np.save(os.path.join(path, file_names[-1]), np.asarray(arr), allow_pickle=False)
+        manifest["arrays"][name] = file_names
+
+    if E is not None:
+        np.save(os.path.join(path, "E.npy"), np.asarray(E), allow_pickle=False)
+        manifest["arrays"]["E"] = "E.npy"
+
+    if policies is not None:
+        np.save(os.path.join(path, "policies.npy"), np.stack(policies), allow_pickle=False)
+        manifest["arrays"]["policies"] = "policies.npy"
+
+    # the manifest is written last, so that a bundle with a manifest is complete
+    with open(os.path.join(path, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+def save_agent_model(path, agent):
+    """
+    Saves the generative model of an ``Agent`` (its arrays, Dirichlet parameters, factor lists and policies) as a bundle in the directory ``path``
+    (see ``save_model``)
+    """
+
+    save_model(
+        path, agent.A, agent.B, C=agent.C, D=agent.D, E=agent.E, pA=agent.pA, pB=agent.pB, pD=agent.pD,
+        A_factor_list=agent.A_factor_list, B_factor_list=agent.B_factor_list, policies=agent.policies
+    )
+
+def load_model(path, mmap_mode="r"):
+    """
+    Loads a generative model saved with ``save_model``. The result can be passed straight to the ``Agent`` constructor,
+    or to ``model.CompiledModel``, e.g. ``Agent(**load_model(path), lr_pA=0.5)``.
+
+    Parameters
+    ----------
+    path: ``str``
+        Directory the bundle is stored in
+    mmap_mode: ``str`` or ``None``, default ``"r"``
+        Memory-map mode of ``np.load``. With the default (read-only) mode, the arrays are not read into memory until they are accessed,
+        and are shared between all the processes that load the same bundle. The agents constructed from them only copy the sub-arrays they learn about
+        (see ``Agent._own_array``). If ``None``, the arrays are read into (private) memory.
+
+    Returns
+    ----------
+    model: ``dict``
+        Dictionary with the keys ``A``, ``B``, ``C``, ``D``, ``E``, ``pA``, ``pB``, ``pD``, ``A_factor_list``, ``B_factor_list`` and ``policies``,
+        whose values are ``None`` for the arrays or lists that were not saved
+    """
+
+    manifest_path = os.path.join(path, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        raise FileNotFoundError(f"No model bundle found in {path} (missing {MANIFEST_NAME})")
+
+    with open(manifest_path, "r") as f:
+        manifest = json.load(f)
+
+    if manifest.get("format") != BUNDLE_FORMAT:
+        raise ValueError(f"{path} does not contain a {BUNDLE_FORMAT} bundle")
+    if manifest.get("version", 0) > BUNDLE_VERSION:
+        raise ValueError(f"Model bundle version {manifest['version']} is not supported (the latest supported version is {BUNDLE_VERSION})")
+
+    load = lambda file_name: np.load(os.path.join(path, file_name), mmap_mode=mmap_mode, allow_pickle=False)
+
+    model = {name: None for name in OBJ_ARRAY_NAMES + ["E", "policies"]}
+    for name, file_names in manifest["arrays"].items():
+        if name in OBJ_ARRAY_NAMES:
+            model[name] = utils.obj_array_from_list([load(file_name) for file_name in file_names])
+        else:
+            model[name] = load(file_names)
+
+    if model["policies"] is not None:
+        model["policies"] = list(model["policies"])
+
+    model["A_factor_list"] = manifest["A_factor_list"]
+    model["B_factor_list"] = manifest["B_factor_list"]
+
+    return model
+
+def _to_json_list(factor_list):
+    """
+    Converts a factor list (whose entries may e.g. be numpy integers) to a list of lists of ``int``, for the manifest
+    """
+    return None if factor_list is None else [[int(i) for i in factors] for factors in factor_list]
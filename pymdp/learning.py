@@ -4,7 +4,6 @@
 
 import numpy as np
 from pymdp import utils, maths
-import copy
 
 def update_obs_likelihood_dirichlet(pA, A, obs, qs, lr=1.0, modalities="all"):
     """ 
@@ -48,7 +47,7 @@ def update_obs_likelihood_dirichlet(pA, A, obs, qs, lr=1.0, modalities="all"):
     if modalities == "all":
         modalities = list(range(num_modalities))
 
-    qA = copy.deepcopy(pA)
+    qA = utils.obj_array_from_list(list(pA)) # shallow copy: only the sub-arrays of the updated modalities are replaced
         
     for modality in modalities:
         dfda = maths.spm_cross(obs[modality], qs)
@@ -101,7 +100,7 @@ def update_obs_likelihood_dirichlet_factorized(pA, A, obs, qs, A_factor_list, lr
     if modalities == "all":
         modalities = list(range(num_modalities))
 
-    qA = copy.deepcopy(pA)
+    qA = utils.obj_array_from_list(list(pA)) # shallow copy: only the sub-arrays of the updated modalities are replaced
         
     for modality in modalities:
         dfda = maths.spm_cross(obs[modality], qs[A_factor_list[modality]])
@@ -110,8 +109,86 @@ def update_obs_likelihood_dirichlet_factorized(pA, A, obs, qs, A_factor_list, lr
 
     return qA
 
+def update_obs_likelihood_dirichlet_inplace(pA, A, obs, qs, A_factor_list, lr=1.0, modalities="all"):
+    """ 
+    Update Dirichlet parameters of the (factorized) observation likelihood distribution in-place, along with their expected value ``A``.
+    Equivalent to ``update_obs_likelihood_dirichlet_factorized`` followed by ``utils.norm_dist_obj_arr``, but exploits the sparsity of the observations:
+    only the rows ``pA[m][o, ...]`` of the observed outcomes ``o`` are incremented (rather than adding the full outer product of the observation and the
+    hidden states), and only the columns of ``A[m]`` whose Dirichlet parameters have changed are renormalized.
+
+    Since the sub-arrays of ``pA`` and ``A`` of the updated modalities are modified in-place, they must not be shared with any other owner (e.g. another agent,
+    or a ``model.SharedModel``).
+
+    Parameters
+    -----------
+    pA: ``numpy.ndarray`` of dtype object
+        Prior Dirichlet parameters over observation model (same shape as ``A``), updated in-place
+    A: ``numpy.ndarray`` of dtype object
+        Sensory likelihood mapping or 'observation model', whose sub-arrays are the expected values of ``pA``, updated in-place
+    obs: 1D ``numpy.ndarray``, ``numpy.ndarray`` of dtype object, ``int`` or ``tuple``
+        The observation (generated by the environment). If single modality, this can be a 1D ``numpy.ndarray``
+        (one-hot vector representation) or an ``int`` (observation index)
+        If multi-modality, this can be ``numpy.ndarray`` of dtype object whose entries are 1D one-hot vectors,
+        or a ``tuple`` (of ``int``) or integer ``numpy.ndarray`` of observation indices (see ``utils.to_obs_indices``)
+    qs: 1D ``numpy.ndarray`` or ``numpy.ndarray`` of dtype object, default None
+        Marginal posterior beliefs over hidden states at current timepoint.
+    A_factor_list: ``list`` of ``list`` of ``int``
+        List of lists, where each list with index `m` contains the indices of the hidden states that observation modality `m` depends on.
+    lr: float, default 1.0
+        Learning rate, scale of the Dirichlet pseudo-count update.
+    modalities: ``list``, default "all"
+        Indices (ranging from 0 to ``n_modalities - 1``) of the observation modalities to include 
+        in learning. Defaults to "all", meaning that modality-specific sub-arrays of ``pA``
+        are all updated using the corresponding observations.
+    
+    Returns
+    -----------
+    pA: ``numpy.ndarray`` of dtype object
+        Posterior Dirichlet parameters over observation model (the same object array as the input ``pA``), after having updated it with observations.
+    """
+
+    num_modalities = len(pA)
+
+    if modalities == "all":
+        modalities = list(range(num_modalities))
+
+    obs_idx = utils.to_obs_indices(obs, num_modalities)
+    if obs_idx is not None:
+        obs = obs_idx
+    elif not isinstance(obs, (list, tuple)):
+        obs = utils.to_obj_array(utils.process_observation(obs, num_modalities, [pA[m].shape[0] for m in range(num_modalities)]))
+
+    for modality in modalities:
+        if isinstance(obs[modality], (int, np.integer)):
+            rows, weights = [obs[modality]], [1.0]
+        else:
+            rows = np.flatnonzero(obs[modality])
+            weights = obs[modality][rows]
+
+        qs_joint = maths.spm_cross(qs[A_factor_list[modality]])
+        changed = np.zeros(qs_joint.shape, dtype=bool)
+        for row, weight in zip(rows, weights):
+            dfda = (lr * weight) * qs_joint * (A[modality][row] > 0)
+            pA[modality][row] += dfda
+            changed |= dfda != 0
+
+        _renormalize_columns(pA[modality], A[modality], changed)
+
+    return pA
+
+def _renormalize_columns(p, dist, changed):
+    """
+    Renormalizes, in-place, the columns ``dist[:, changed]`` of the categorical distributions ``dist`` (the expected value of the Dirichlet parameters ``p``),
+    whose parameters have changed
+    """
+    if changed.all():
+        np.divide(p, p.sum(axis=0), out=dist)
+    elif changed.any():
+        p_changed = p[:, changed]
+        dist[:, changed] = p_changed / p_changed.sum(axis=0)
+
 def update_state_likelihood_dirichlet(
-    pB, B, actions, qs, qs_prev, lr=1.0, factors="all"
+    pB, B, actions, qs, qs_prev, lr=1.0, factors="all", qs_joint=None
 ):
     """
     Update Dirichlet parameters of the transition distribution. 
@@ -137,6 +214,10 @@ def update_state_likelihood_dirichlet(
         Indices (ranging from 0 to ``n_factors - 1``) of the hidden state factors to include 
         in learning. Defaults to "all", meaning that factor-specific sub-arrays of ``pB``
         are all updated using the corresponding hidden state distributions and actions.
+    qs_joint: ``numpy.ndarray`` of dtype object, default ``None``
+        If provided, the pairwise joint posterior over each factor's current and previous hidden states, where ``qs_joint[f][s, v]`` is the
+        probability of level ``s`` at the current and level ``v`` at the previous timepoint (e.g. one timestep of the ``qss`` returned by
+        ``inference.smooth_posterior_states``). This is used in place of the outer product of ``qs`` and ``qs_prev``.
 
     Returns
     -----------
@@ -146,20 +227,24 @@ def update_state_likelihood_dirichlet(
 
     num_factors = len(pB)
 
-    qB = copy.deepcopy(pB)
+    qB = utils.obj_array_from_list(list(pB)) # shallow copy: only the sub-arrays of the updated factors are replaced
    
     if factors == "all":
         factors = list(range(num_factors))
 
     for factor in factors:
-        dfdb = maths.spm_cross(qs[factor], qs_prev[factor])
+        if qs_joint is not None:
+            dfdb = np.array(qs_joint[factor], dtype=float)
+        else:
+            dfdb = maths.spm_cross(qs[factor], qs_prev[factor])
         dfdb *= (B[factor][:, :, int(actions[factor])] > 0).astype("float")
+        qB[factor] = qB[factor].copy()
         qB[factor][:,:,int(actions[factor])] += (lr*dfdb)
 
     return qB
 
 def update_state_likelihood_dirichlet_interactions(
-    pB, B, actions, qs, qs_prev, B_factor_list, lr=1.0, factors="all"
+    pB, B, actions, qs, qs_prev, B_factor_list, lr=1.0, factors="all", qs_joint=None
 ):
     """
     Update Dirichlet parameters of the transition distribution, in the case when 'interacting' hidden state factors are present, i.e.
@@ -188,6 +273,11 @@ def update_state_likelihood_dirichlet_interactions(
         Indices (ranging from 0 to ``n_factors - 1``) of the hidden state factors to include 
         in learning. Defaults to "all", meaning that factor-specific sub-arrays of ``pB``
         are all updated using the corresponding hidden state distributions and actions.
+    qs_joint: ``numpy.ndarray`` of dtype object, default ``None``
+        If provided, the joint posterior over each factor's current hidden states and its parents' previous hidden states, where ``qs_joint[f]`` has
+        the shape of ``B[f][..., u]`` (e.g. ``qs_joint[f][s, v]`` is the probability of level ``s`` at the current and level ``v`` at the previous timepoint,
+        for a factor that only depends on itself, as in one timestep of the ``qss`` returned by ``inference.smooth_posterior_states``).
+        This is used in place of the outer product of ``qs`` and ``qs_prev``.
 
     Returns
     -----------
@@ -197,18 +287,266 @@ def update_state_likelihood_dirichlet_interactions(
 
     num_factors = len(pB)
 
-    qB = copy.deepcopy(pB)
+    qB = utils.obj_array_from_list(list(pB)) # shallow copy: only the sub-arrays of the updated factors are replaced
    
     if factors == "all":
         factors = list(range(num_factors))
 
     for factor in factors:
-        dfdb = maths.spm_cross(qs[factor], qs_prev[B_factor_list[factor]])
+        if qs_joint is not None:
+            dfdb = np.array(qs_joint[factor], dtype=float)
+        else:
+            dfdb = maths.spm_cross(qs[factor], qs_prev[B_factor_list[factor]])
         dfdb *= (B[factor][...,int(actions[factor])] > 0).astype("float")
+        qB[factor] = qB[factor].copy()
         qB[factor][...,int(actions[factor])] += (lr*dfdb)
 
     return qB
 
+def update_state_likelihood_dirichlet_inplace(
+    pB, B, actions, qs, qs_prev, B_factor_list, lr=1.0, factors="all", qs_joint=None
+):
+    """
+    Update Dirichlet parameters of the transition distribution in-place, along with their expected value ``B``.
+    Equivalent to ``update_state_likelihood_dirichlet_interactions`` followed by ``utils.norm_dist_obj_arr``, but only the slice ``pB[f][..., actions[f]]``
+    of the action that was taken is updated, and only the columns of ``B[f][..., actions[f]]`` whose Dirichlet parameters have changed are renormalized.
+
+    Since the sub-arrays of ``pB`` and ``B`` of the updated factors are modified in-place, they must not be shared with any other owner (e.g. another agent,
+    or a ``model.SharedModel``).
+
+    Parameters
+    -----------
+    pB: ``numpy.ndarray`` of dtype object
+        Prior Dirichlet parameters over transition model (same shape as ``B``), updated in-place
+    B: ``numpy.ndarray`` of dtype object
+        Dynamics likelihood mapping or 'transition model', whose sub-arrays are the expected values of ``pB``, updated in-place
+    actions: 1D ``numpy.ndarray``
+        A vector with length equal to the number of control factors, where each element contains the index of the action (for that control factor) performed at 
+        a given timestep.
+    qs: 1D ``numpy.ndarray`` or ``numpy.ndarray`` of dtype object
+        Marginal posterior beliefs over hidden states at current timepoint.
+    qs_prev: 1D ``numpy.ndarray`` or ``numpy.ndarray`` of dtype object
+        Marginal posterior beliefs over hidden states at previous timepoint.
+    B_factor_list: ``list`` of ``list`` of ``int``
+        A list of lists, where each element ``B_factor_list[f]`` is a list of indices of hidden state factors that that are needed to predict the dynamics of hidden state factor ``f``.
+    lr: float, default ``1.0``
+        Learning rate, scale of the Dirichlet pseudo-count update.
+    factors: ``list``, default "all"
+        Indices (ranging from 0 to ``n_factors - 1``) of the hidden state factors to include 
+        in learning. Defaults to "all", meaning that factor-specific sub-arrays of ``pB``
+        are all updated using the corresponding hidden state distributions and actions.
+    qs_joint: ``numpy.ndarray`` of dtype object, default ``None``
+        If provided, the joint posterior over each factor's current hidden states and its parents' previous hidden states, where ``qs_joint[f]`` has
+        the shape of ``B[f][..., u]`` (e.g. ``qs_joint[f][s, v]`` is the probability of level ``s`` at the current and level ``v`` at the previous timepoint,
+        for a factor that only depends on itself, as in one timestep of the ``qss`` returned by ``inference.smooth_posterior_states``).
+        This is used in place of the outer product of ``qs`` and ``qs_prev``.
+
+    Returns
+    -----------
+    pB: ``numpy.ndarray`` of dtype object
+        Posterior Dirichlet parameters over transition model (the same object array as the input ``pB``), after having updated it with state beliefs and actions.
+    """
+
+    if factors == "all":
+        factors = list(range(len(pB)))
+
+    for factor in factors:
+        action = int(actions[factor])
+        pB_u, B_u = pB[factor][..., action], B[factor][..., action] # views onto the slice of the action taken
+
+        if qs_joint is not None:
+            dfdb = np.array(qs_joint[factor], dtype=float)
+        else:
+            dfdb = maths.spm_cross(qs[factor], qs_prev[B_factor_list[factor]])
+        dfdb *= lr * (B_u > 0)
+        pB_u += dfdb
+        _renormalize_columns(pB_u, B_u, (dfdb != 0).any(axis=0))
+
+    return pB
+
+def update_state_likelihood_dirichlet_trajectory(
+    pB, B, actions, qs_seq, B_factor_list, lr=1.0, factors="all", qs_joint=None
+):
+    """
+    Update Dirichlet parameters of the transition distribution in-place (along with their expected value ``B``) using a whole trajectory of beliefs and actions,
+    with one vectorized accumulation over timesteps, rather than one update per timestep. This is equivalent to applying ``update_state_likelihood_dirichlet_inplace``
+    to each transition ``(qs_seq[t+1], qs_seq[t], actions[t])`` in turn.
+
+    Parameters
+    -----------
+    pB: ``numpy.ndarray`` of dtype object
+        Prior Dirichlet parameters over transition model (same shape as ``B``), updated in-place
+    B: ``numpy.ndarray`` of dtype object
+        Dynamics likelihood mapping or 'transition model', whose sub-arrays are the expected values of ``pB``, updated in-place
+    actions: 2D ``numpy.ndarray``
+        The actions taken at each transition of the trajectory, of shape ``(T - 1, num_factors)``, where ``actions[t]`` led from timestep ``t`` to ``t + 1``
+    qs_seq: ``list`` of ``numpy.ndarray`` of dtype object
+        Marginal posterior beliefs over hidden states at each of the ``T`` timesteps of the trajectory (e.g. the entries of ``Agent.qs_hist``)
+    B_factor_list: ``list`` of ``list`` of ``int``
+        A list of lists, where each element ``B_factor_list[f]`` is a list of indices of hidden state factors that that are needed to predict the dynamics of hidden state factor ``f``.
+    lr: float, default ``1.0``
+        Learning rate, scale of the Dirichlet pseudo-count update.
+    factors: ``list``, default "all"
+        Indices (ranging from 0 to ``n_factors - 1``) of the hidden state factors to include 
+        in learning. Defaults to "all", meaning that factor-specific sub-arrays of ``pB``
+        are all updated using the corresponding hidden state distributions and actions.
+    qs_joint: ``numpy.ndarray`` of dtype object, default ``None``
+        If provided, the joint posteriors over each factor's hidden states and its parents' previous hidden states at every transition of the trajectory,
+        where ``qs_joint[f]`` has shape ``(T - 1,) + B[f].shape[:-1]`` (e.g. the ``qss`` returned by ``inference.smooth_posterior_states``).
+        These are used in place of the outer products of consecutive entries of ``qs_seq``.
+
+    Returns
+    -----------
+    pB: ``numpy.ndarray`` of dtype object
+        Posterior Dirichlet parameters over transition model (the same object array as the input ``pB``), after having updated it with the trajectory.
+    """
+
+    if factors == "all":
+        factors = list(range(len(pB)))
+
+    actions = np.asarray(actions, dtype=int).reshape(len(qs_seq) - 1, -1)
+    if actions.shape[0] == 0:
+        return pB
+
+    for factor in factors:
+        # joint beliefs over the factor at `t + 1` and its parents at `t`, for all transitions at once: shape (T - 1, num_states[f], *parent_dims)
+        if qs_joint is not None:
+            dfdb = np.asarray(qs_joint[factor], dtype=float)
+        else:
+            dfdb = np.stack([qs[factor] for qs in qs_seq[1:]])
+            for parent in B_factor_list[factor]:
+                qs_parent = np.stack([qs[parent] for qs in qs_seq[:-1]])
+                dfdb = dfdb[..., None] * qs_parent.reshape((qs_parent.shape[0],) + (1,) * (dfdb.ndim - 1) + (qs_parent.shape[1],))
+
+        # accumulate the transitions into the slices of the actions taken
+        num_controls = pB[factor].shape[-1]
+        action_onehot = np.eye(num_controls)[actions[:, factor]]
+        counts = np.tensordot(dfdb, action_onehot, axes=(0, 0)) * lr
+        counts *= (B[factor] > 0)
+        pB[factor] += counts
+
+        for action in np.unique(actions[:, factor]):
+            _renormalize_columns(pB[factor][..., action], B[factor][..., action], (counts[..., action] != 0).any(axis=0))
+
+    return pB
+
+class DirichletAccumulator(object):
+    """
+    Deferred Dirichlet learning: collects the pseudo-count increments of the observation and transition models (the sufficient statistics of
+    ``update_obs_likelihood_dirichlet_inplace`` and ``update_state_likelihood_dirichlet_inplace``) in sparse buffers, rather than applying them at every timestep,
+    and adds them into ``pA`` and ``pB`` (renormalizing ``A`` and ``B`` once) when flushed.
+
+    The increments are buffered per observed outcome (one row of ``pA[m]``) and per action taken (one slice of ``pB[f]``), so that the buffers
+    only grow with the number of distinct outcomes and actions encountered, rather than with the size of the model.
+
+    >>> accumulator = DirichletAccumulator()
+    >>> for t in range(T):
+    >>>     accumulator.add_obs(obs[t], qs[t], A_factor_list, lr=lr_pA)
+    >>> accumulator.flush(pA, A)
+    """
+
+    def __init__(self):
+        self.A_rows = {} # modality -> {outcome: increments over the states of the modality's factors}
+        self.B_slices = {} # factor -> {action: increments over the states of the factor and its parents}
+        self.num_obs_updates = 0
+        self.num_transition_updates = 0
+
+    @property
+    def num_updates(self):
+        """ The number of timesteps whose increments have been buffered (since the last flush) """
+        return max(self.num_obs_updates, self.num_transition_updates)
+
+    def add_obs(self, obs, qs, A_factor_list, lr=1.0, modalities="all"):
+        """
+        Buffers the increments of the Dirichlet parameters of the observation model, given an observation and the posterior over hidden states.
+        Arguments are as in ``update_obs_likelihood_dirichlet_inplace``, except that ``obs`` is either a ``list``, ``tuple`` or integer ``numpy.ndarray`` of
+        observation indices, or a ``numpy.ndarray`` of dtype object of (one-hot or distributional) observation vectors.
+        """
+
+        obs_idx = utils.to_obs_indices(obs, len(A_factor_list))
+        if obs_idx is not None:
+            obs = obs_idx
+        elif isinstance(obs, (int, np.integer)) or (isinstance(obs, np.ndarray) and not utils.is_obj_array(obs)):
+            obs = [obs] # single modality
+
+        if modalities == "all":
+            modalities = list(range(len(obs)))
+
+        for modality in modalities:
+            if isinstance(obs[modality], (int, np.integer)):
+                rows, weights = [int(obs[modality])], [1.0]
+            else:
+                rows = np.flatnonzero(obs[modality])
+                weights = obs[modality][rows]
+
+            qs_joint = maths.spm_cross(qs[A_factor_list[modality]])
+            buffers = self.A_rows.setdefault(modality, {})
+            for row, weight in zip(rows, weights):
+                if row in buffers:
+                    buffers[row] += (lr * weight) * qs_joint
+                else:
+                    buffers[row] = (lr * weight) * qs_joint
+
+        self.num_obs_updates += 1
+
+    def add_transition(self, actions, qs, qs_prev, B_factor_list, lr=1.0, factors="all", qs_joint=None):
+        """
+        Buffers the increments of the Dirichlet parameters of the transition model, given the action taken and the posteriors over hidden states at the current
+        and previous timesteps. Arguments are as in ``update_state_likelihood_dirichlet_inplace``.
+        """
+
+        if factors == "all":
+            factors = list(range(len(qs)))
+
+        for factor in factors:
+            action = int(actions[factor])
+            if qs_joint is not None:
+                dfdb = lr * np.asarray(qs_joint[factor], dtype=float)
+            else:
+                dfdb = lr * maths.spm_cross(qs[factor], qs_prev[B_factor_list[factor]])
+            buffers = self.B_slices.setdefault(factor, {})
+            if action in buffers:
+                buffers[action] += dfdb
+            else:
+                buffers[action] = dfdb
+
+        self.num_transition_updates += 1
+
+    def flush(self, pA=None, A=None, pB=None, B=None):
+        """
+        Adds the buffered increments into the Dirichlet parameters ``pA`` and / or ``pB`` in-place, renormalizing the columns of ``A`` and / or ``B`` whose parameters changed,
+        and empties the corresponding buffers. As for ``update_obs_likelihood_dirichlet_inplace``, the updated sub-arrays must not be shared with any other owner.
+        Increments are only added to the entries of the Dirichlet parameters whose expected value (``A`` or ``B``) is non-zero.
+        """
+
+        if pA is not None:
+            for modality, buffers in self.A_rows.items():
+                rows = np.fromiter(buffers.keys(), dtype=int, count=len(buffers))
+                counts = np.stack(list(buffers.values())) * (A[modality][rows] > 0)
+                pA[modality][rows] += counts
+                _renormalize_columns(pA[modality], A[modality], (counts != 0).any(axis=0))
+            self.A_rows = {}
+            self.num_obs_updates = 0
+
+        if pB is not None:
+            for factor, buffers in self.B_slices.items():
+                actions = np.fromiter(buffers.keys(), dtype=int, count=len(buffers))
+                counts = np.stack(list(buffers.values()), axis=-1) * (B[factor][..., actions] > 0)
+                pB[factor][..., actions] += counts
+                for idx, action in enumerate(actions):
+                    _renormalize_columns(pB[factor][..., action], B[factor][..., action], (counts[..., idx] != 0).any(axis=0))
+            self.B_slices = {}
+            self.num_transition_updates = 0
+
+    def copy(self):
+        """ Returns a copy of the accumulator, with copies of its buffers """
+        accumulator = DirichletAccumulator()
+        accumulator.A_rows = {m: {row: arr.copy() for row, arr in buffers.items()} for m, buffers in self.A_rows.items()}
+        accumulator.B_slices = {f: {action: arr.copy() for action, arr in buffers.items()} for f, buffers in self.B_slices.items()}
+        accumulator.num_obs_updates = self.num_obs_updates
+        accumulator.num_transition_updates = self.num_transition_updates
+        return accumulator
+
 def update_state_prior_dirichlet(
     pD, qs, lr=1.0, factors="all"
 ):
@@ -237,17 +575,70 @@ def update_state_prior_dirichlet(
 
     num_factors = len(pD)
 
-    qD = copy.deepcopy(pD)
+    qD = utils.obj_array_from_list(list(pD)) # shallow copy: only the sub-arrays of the updated factors are replaced
    
     if factors == "all":
         factors = list(range(num_factors))
 
     for factor in factors:
         idx = pD[factor] > 0 # only update those state level indices that have some prior probability
+        qD[factor] = qD[factor].copy()
         qD[factor][idx] += (lr * qs[factor][idx])
        
     return qD
 
+def score_state_reductions(qB, pB, qD=None, pD=None, reduction=1/16):
+    """
+    Scores, using Bayesian model reduction, the reduced models that each lack one level of a hidden state factor. For each level ``s`` of factor ``f``,
+    the reduced prior shrinks the concentration parameters of transitioning into ``s`` (the rows ``pB[f][s, ...]``, and ``pD[f][s]`` if provided) by ``reduction``,
+    i.e. it encodes the belief that ``s`` is (almost) never visited. The change in log evidence of this reduced model, relative to the full one,
+    is computed from the prior and posterior Dirichlet parameters with ``maths.dirichlet_log_evidence``: levels that were not visited while learning
+    have a negative change in free energy (i.e. the reduced model has higher evidence) and can be removed, while levels that have been
+    visited have a positive one.
+
+    Parameters
+    -----------
+    qB: ``numpy.ndarray`` of dtype object
+        Posterior (learned) Dirichlet parameters over transition model
+    pB: ``numpy.ndarray`` of dtype object
+        Prior Dirichlet parameters over transition model, before learning (same shape as ``qB``)
+    qD: ``numpy.ndarray`` of dtype object, default ``None``
+        Posterior (learned) Dirichlet parameters over initial hidden state prior
+    pD: ``numpy.ndarray`` of dtype object, default ``None``
+        Prior Dirichlet parameters over initial hidden state prior, before learning (same shape as ``qD``)
+    reduction: ``float``, default ``1/16``
+        The factor by which the concentration parameters of a removed level are shrunk in the reduced prior
+
+    Returns
+    -----------
+    F: ``numpy.ndarray`` of dtype object
+        The change in free energy (negative log evidence) of removing each level of each hidden state factor, where ``F[f][s]`` is the score of removing level ``s`` of factor ``f``
+    occupancy: ``numpy.ndarray`` of dtype object
+        The posterior occupancy of each level, i.e. the total pseudo-counts that were added to the Dirichlet parameters of transitioning into it (and of starting in it)
+    """
+
+    num_factors = len(qB)
+    F = utils.obj_array(num_factors)
+    occupancy = utils.obj_array(num_factors)
+
+    for f in range(num_factors):
+        ns = qB[f].shape[0]
+        q_cols = [qB[f].reshape(ns, -1)]
+        p_cols = [pB[f].reshape(ns, -1)]
+        if qD is not None and pD is not None:
+            q_cols.append(qD[f].reshape(ns, 1))
+            p_cols.append(pD[f].reshape(ns, 1))
+        q_cols, p_cols = np.concatenate(q_cols, axis=1), np.concatenate(p_cols, axis=1)
+
+        F[f] = np.zeros(ns)
+        for s in range(ns):
+            r_cols = p_cols.copy()
+            r_cols[s] *= reduction
+            F[f][s] = maths.dirichlet_log_evidence(q_cols, p_cols, r_cols)[0].sum()
+        occupancy[f] = (q_cols - p_cols).sum(axis=1)
+
+    return F, occupancy
+
 def _prune_prior(prior, levels_to_remove, dirichlet = False):
     """
     Function for pruning a prior Categorical distribution (e.g. C, D)
@@ -261,6 +652,7 @@ def _prune_prior(prior, levels_to_remove, dirichlet = False):
         then this will be a ``list`` of ``list``, where each sub-list within ``levels_to_remove`` will contain the levels to prune for a particular hidden state factor or modality 
     dirichlet: ``Bool``, default ``False``
         A Boolean flag indicating whether the input vector(s) is/are a Dirichlet distribution, and therefore should not be normalized at the end. 
+        In that case, the concentration parameters of the remaining levels are kept as they are.
         @TODO: Instead, the dirichlet parameters from the pruned levels should somehow be re-distributed among the remaining levels
 
     Returns
@@ -281,7 +673,7 @@ def _prune_prior(prior, levels_to_remove, dirichlet = False):
         for f, s_i in enumerate(prior): # loop over factors (or modalities)
             
             ns = len(s_i)
-            levels_to_keep = list(set(range(ns)) - set(levels_to_remove[f]))
+            levels_to_keep = sorted(set(range(ns)) - set(levels_to_remove[f]))
             if len(levels_to_keep) == 0:
                 print(f'Warning... removing ALL levels of factor {f} - i.e. the whole hidden state factor is being removed\n')
                 factors_to_remove.append(f)
@@ -289,7 +681,7 @@ def _prune_prior(prior, levels_to_remove, dirichlet = False):
                 if not dirichlet:
                     reduced_prior[f] = utils.norm_dist(s_i[levels_to_keep])
                 else:
-                    raise(NotImplementedError("Need to figure out how to re-distribute concentration parameters from pruned levels, across remaining levels"))
+                    reduced_prior[f] = s_i[levels_to_keep]
 
 
         if len(factors_to_remove) > 0:
@@ -301,16 +693,16 @@ def _prune_prior(prior, levels_to_remove, dirichlet = False):
         assert all([type(level_i) == int for level_i in levels_to_remove])
 
         ns = len(prior)
-        levels_to_keep = list(set(range(ns)) - set(levels_to_remove))
+        levels_to_keep = sorted(set(range(ns)) - set(levels_to_remove))
 
         if not dirichlet:
             reduced_prior = utils.norm_dist(prior[levels_to_keep])
         else:
-            raise(NotImplementedError("Need to figure out how to re-distribute concentration parameters from pruned levels, across remaining levels"))
+            reduced_prior = prior[levels_to_keep]
 
     return reduced_prior
 
-def _prune_A(A, obs_levels_to_prune, state_levels_to_prune, dirichlet = False):
+def _prune_A(A, obs_levels_to_prune, state_levels_to_prune, dirichlet = False, A_factor_list = None):
     """
     Function for pruning a observation likelihood model (with potentially multiple hidden state factors)
     :meta private:
@@ -328,7 +720,11 @@ def _prune_A(A, obs_levels_to_prune, state_levels_to_prune, dirichlet = False):
         A ``list`` of the hidden state levels to remove (this will be the same across modalities)
     dirichlet: ``Bool``, default ``False``
         A Boolean flag indicating whether the input array(s) is/are a Dirichlet distribution, and therefore should not be normalized at the end. 
+        In that case, the concentration parameters of the remaining rows/columns are kept as they are.
         @TODO: Instead, the dirichlet parameters from the pruned columns should somehow be re-distributed among the remaining columns
+    A_factor_list: ``list`` of ``list`` of ``int``, default ``None``
+        In case of multiple observation modalities, the indices of the hidden state factors that each modality depends on. If ``None``, all
+        modalities are assumed to depend on all hidden state factors.
 
     Returns
     -----------
@@ -336,16 +732,16 @@ def _prune_A(A, obs_levels_to_prune, state_levels_to_prune, dirichlet = False):
         The observation model, after pruning, which lacks the observation or hidden state levels given by the arguments ``obs_levels_to_prune`` and ``state_levels_to_prune``
     """
 
-    columns_to_keep_list = []
     if utils.is_obj_array(A):
-        num_states = A[0].shape[1:]
-        for f, ns in enumerate(num_states):
-            indices_f = np.array( list(set(range(ns)) - set(state_levels_to_prune[f])), dtype = np.intp)
-            columns_to_keep_list.append(indices_f)
+        if A_factor_list is None:
+            A_factor_list = len(A) * [list(range(A[0].ndim - 1))]
+        num_states = {}
+        for m, A_m in enumerate(A):
+            num_states.update({f: ns for f, ns in zip(A_factor_list[m], A_m.shape[1:])})
+        columns_to_keep = {f: np.array(sorted(set(range(ns)) - set(state_levels_to_prune[f])), dtype = np.intp) for f, ns in num_states.items()}
     else:
         num_states = A.shape[1]
-        indices = np.array( list(set(range(num_states)) - set(state_levels_to_prune)), dtype = np.intp )
-        columns_to_keep_list.append(indices)
+        columns_to_keep_list = [np.array( sorted(set(range(num_states)) - set(state_levels_to_prune)), dtype = np.intp )]
 
     if utils.is_obj_array(A): # in case of multiple observation modality
 
@@ -358,30 +754,26 @@ def _prune_A(A, obs_levels_to_prune, state_levels_to_prune, dirichlet = False):
         for m, A_i in enumerate(A): # loop over modalities
             
             no = A_i.shape[0]
-            rows_to_keep = np.array(list(set(range(no)) - set(obs_levels_to_prune[m])), dtype = np.intp)
+            rows_to_keep = np.array(sorted(set(range(no)) - set(obs_levels_to_prune[m])), dtype = np.intp)
             
-            reduced_A[m] = A_i[np.ix_(rows_to_keep, *columns_to_keep_list)]
+            reduced_A[m] = A_i[np.ix_(rows_to_keep, *[columns_to_keep[f] for f in A_factor_list[m]])]
         if not dirichlet:    
             reduced_A = utils.norm_dist_obj_arr(reduced_A)
-        else:
-            raise(NotImplementedError("Need to figure out how to re-distribute concentration parameters from pruned rows/columns, across remaining rows/columns"))
     else: # in case of one observation modality
 
         assert all([type(o_levels_i) == int for o_levels_i in obs_levels_to_prune])
 
         no = A.shape[0]
-        rows_to_keep = np.array(list(set(range(no)) - set(obs_levels_to_prune)), dtype = np.intp)
+        rows_to_keep = np.array(sorted(set(range(no)) - set(obs_levels_to_prune)), dtype = np.intp)
             
         reduced_A = A[np.ix_(rows_to_keep, *columns_to_keep_list)]
 
         if not dirichlet:
             reduced_A = utils.norm_dist(reduced_A)
-        else:
-            raise(NotImplementedError("Need to figure out how to re-distribute concentration parameters from pruned rows/columns, across remaining rows/columns"))
 
     return reduced_A
 
-def _prune_B(B, state_levels_to_prune, action_levels_to_prune, dirichlet = False):
+def _prune_B(B, state_levels_to_prune, action_levels_to_prune, dirichlet = False, B_factor_list = None):
     """
     Function for pruning a transition likelihood model (with potentially multiple hidden state factors)
 
@@ -401,7 +793,11 @@ def _prune_B(B, state_levels_to_prune, action_levels_to_prune, dirichlet = False
         to remove for a particular control state factor 
     dirichlet: ``Bool``, default ``False``
         A Boolean flag indicating whether the input array(s) is/are a Dirichlet distribution, and therefore should not be normalized at the end. 
+        In that case, the concentration parameters of the remaining rows/columns are kept as they are.
         @TODO: Instead, the dirichlet parameters from the pruned rows/columns should somehow be re-distributed among the remaining rows/columns
+    B_factor_list: ``list`` of ``list`` of ``int``, default ``None``
+        In case of multiple hidden state factors, the indices of the hidden state factors that the dynamics of each factor depend on. If ``None``,
+        the dynamics of each factor are assumed to only depend on the factor itself.
 
     Returns
     -----------
@@ -413,47 +809,44 @@ def _prune_B(B, state_levels_to_prune, action_levels_to_prune, dirichlet = False
 
     if utils.is_obj_array(B):
 
-        num_controls = [B_arr.shape[2] for _, B_arr in enumerate(B)]
+        num_controls = [B_arr.shape[-1] for _, B_arr in enumerate(B)]
 
         for c, nc in enumerate(num_controls):
-            indices_c = np.array( list(set(range(nc)) - set(action_levels_to_prune[c])), dtype = np.intp)
+            indices_c = np.array( sorted(set(range(nc)) - set(action_levels_to_prune[c])), dtype = np.intp)
             slices_to_keep_list.append(indices_c)
     else:
         num_controls = B.shape[2]
-        slices_to_keep = np.array( list(set(range(num_controls)) - set(action_levels_to_prune)), dtype = np.intp )
+        slices_to_keep = np.array( sorted(set(range(num_controls)) - set(action_levels_to_prune)), dtype = np.intp )
 
     if utils.is_obj_array(B): # in case of multiple hidden state factors
 
         assert all([type(ns_f_levels) == list for ns_f_levels in state_levels_to_prune])
 
         num_factors = len(B)
+        if B_factor_list is None:
+            B_factor_list = [[f] for f in range(num_factors)]
+
+        states_to_keep = [np.array(sorted(set(range(B_f.shape[0])) - set(state_levels_to_prune[f])), dtype = np.intp) for f, B_f in enumerate(B)]
 
         reduced_B = utils.obj_array(num_factors)
         
         for f, B_f in enumerate(B): # loop over modalities
             
-            ns = B_f.shape[0]
-            states_to_keep = np.array(list(set(range(ns)) - set(state_levels_to_prune[f])), dtype = np.intp)
-            
-            reduced_B[f] = B_f[np.ix_(states_to_keep, states_to_keep, slices_to_keep_list[f])]
+            reduced_B[f] = B_f[np.ix_(states_to_keep[f], *[states_to_keep[parent] for parent in B_factor_list[f]], slices_to_keep_list[f])]
 
         if not dirichlet:    
             reduced_B = utils.norm_dist_obj_arr(reduced_B)
-        else:
-            raise(NotImplementedError("Need to figure out how to re-distribute concentration parameters from pruned rows/columns, across remaining rows/columns"))
 
     else: # in case of one hidden state factor
 
         assert all([type(state_level_i) == int for state_level_i in state_levels_to_prune])
 
         ns = B.shape[0]
-        states_to_keep = np.array(list(set(range(ns)) - set(state_levels_to_prune)), dtype = np.intp)
+        states_to_keep = np.array(sorted(set(range(ns)) - set(state_levels_to_prune)), dtype = np.intp)
             
         reduced_B = B[np.ix_(states_to_keep, states_to_keep, slices_to_keep)]
 
         if not dirichlet:
             reduced_B = utils.norm_dist(reduced_B)
-        else:
-            raise(NotImplementedError("Need to figure out how to re-distribute concentration parameters from pruned rows/columns, across remaining rows/columns"))
 
     return reduced_B
@@ -238,10 +238,14 @@ def spm_cross(x, y=None, *args):
 
 def dot_likelihood(A,obs):
 
-    s = np.ones(np.ndim(A), dtype = int)
-    s[0] = obs.shape[0]
-    X = A * obs.reshape(tuple(s))
-    X = np.sum(X, axis=0, keepdims=True)
+    if isinstance(obs, (int, np.integer)):
+        # an observation index selects the corresponding row of `A` (a view, no one-hot vector or product is needed)
+        X = A[obs]
+    else:
+        s = np.ones(np.ndim(A), dtype = int)
+        s[0] = obs.shape[0]
+        X = A * obs.reshape(tuple(s))
+        X = np.sum(X, axis=0, keepdims=True)
     LL = np.squeeze(X)
 
     # check to see if `LL` is a scalar
@@ -257,7 +261,8 @@ def get_joint_likelihood(A, obs, num_states):
     if type(num_states) is int:
         num_states = [num_states]
     A = utils.to_obj_array(A)
-    obs = utils.to_obj_array(obs)
+    obs_idx = utils.to_obs_indices(obs, len(A))
+    obs = obs_idx if obs_idx is not None else utils.to_obj_array(obs)
     ll = np.ones(tuple(num_states))
     for modality in range(len(A)):
         ll = ll * dot_likelihood(A[modality], obs[modality])
@@ -272,7 +277,8 @@ def get_joint_likelihood_seq(A, obs, num_states):
 
 def get_joint_likelihood_seq_by_modality(A, obs, num_states):
     """
-    Returns joint likelihoods for each modality separately
+    Returns joint likelihoods for each modality separately. The observations can either be a sequence of (processed) observation vectors,
+    or observation indices, e.g. an integer array of shape ``(T, num_modalities)`` (see ``utils.to_obs_indices_seq``)
     """
 
     ll_seq = utils.obj_array(len(obs))
@@ -280,7 +286,8 @@ def get_joint_likelihood_seq_by_modality(A, obs, num_states):
 
     for t, obs_t in enumerate(obs):
         likelihood = utils.obj_array(n_modalities)
-        obs_t_obj = utils.to_obj_array(obs_t)
+        obs_t_idx = utils.to_obs_indices(obs_t, n_modalities)
+        obs_t_obj = obs_t_idx if obs_t_idx is not None else utils.to_obj_array(obs_t)
         for (m, A_m) in enumerate(A):
             likelihood[m] = dot_likelihood(A_m, obs_t_obj[m])
         ll_seq[t] = likelihood
@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Generative model containers that can be shared between agents
+
+__author__: Conor Heins, Alexander Tschantz, Daphne Demekas, Brennan Klein
+
+"""
+
+import numpy as np
+from pymdp import utils
+
+def _read_only(obj_arr):
+    """
+    Returns an object array of read-only views onto the sub-arrays of ``obj_arr`` (no data is copied)
+    """
+    if obj_arr is None:
+        return None
+    views = utils.obj_array(len(obj_arr))
+    for i, arr in enumerate(utils.to_obj_array(obj_arr)):
+        views[i] = np.asarray(arr).view()
+        views[i].flags.writeable = False
+    return views
+
+def _shallow_copy(obj_arr):
+    """
+    Returns a new object array that references the same sub-arrays as ``obj_arr``
+    """
+    return None if obj_arr is None else utils.obj_array_from_list(list(obj_arr))
+
+class SharedModel(object):
+    """
+    A generative model (``A``, ``B``, ``C``, ``D``, ``E`` and the Dirichlet parameters ``pA``, ``pB``, ``pD``) that is referenced, read-only,
+    by many ``Agent`` instances, rather than each agent storing its own copy.
+
+    All sub-arrays are stored as read-only views, so they cannot be modified in-place by any agent. Instead, learning is copy-on-write:
+    when an agent updates e.g. its ``pA`` and ``A`` (``Agent.update_A``), only the sub-arrays of the modalities it actually learns about
+    are replaced by new arrays owned by that agent, while all other modalities (and all other agents) keep referencing the shared arrays.
+
+    If Dirichlet parameters are provided, the corresponding ``A``, ``B`` or ``D`` is stored as their expected value (as done in ``Agent.reset``),
+    so that agents constructed from the model can reference it rather than re-normalizing the Dirichlet parameters themselves.
+
+    >>> model = SharedModel(A, B, C=C, pA=pA)
+    >>> agents = [Agent.from_shared_model(model, lr_pA=0.5) for _ in range(1000)]
+    """
+
+    def __init__(self, A, B, C=None, D=None, E=None, pA=None, pB=None, pD=None):
+        """
+        Parameters
+        ----------
+        A: ``numpy.ndarray`` of dtype object
+            Sensory likelihood mapping or 'observation model'
+        B: ``numpy.ndarray`` of dtype object
+            Dynamics likelihood mapping or 'transition model'
+        C: ``numpy.ndarray`` of dtype object, default ``None``
+            Prior preferences over observations
+        D: ``numpy.ndarray`` of dtype object, default ``None``
+            Prior beliefs about initial hidden states
+        E: 1D ``numpy.ndarray``, default ``None``
+            Prior over policies
+        pA: ``numpy.ndarray`` of dtype object, default ``None``
+            Dirichlet parameters over the observation model (same shape as ``A``)
+        pB: ``numpy.ndarray`` of dtype object, default ``None``
+            Dirichlet parameters over the transition model (same shape as ``B``)
+        pD: ``numpy.ndarray`` of dtype object, default ``None``
+            Dirichlet parameters over the initial hidden state prior (same shape as ``D``)
+        """
+
+        self.pA = _read_only(pA)
+        self.pB = _read_only(pB)
+        self.pD = _read_only(pD)
+
+        self.A = _read_only(utils.norm_dist_obj_arr(self.pA) if self.pA is not None else A)
+        self.B = _read_only(utils.norm_dist_obj_arr(self.pB) if self.pB is not None else B)
+        self.C = _read_only(C)
+        self.D = _read_only(utils.norm_dist_obj_arr(self.pD) if (D is None and self.pD is not None) else D)
+
+        if E is not None:
+            self.E = np.asarray(E).view()
+            self.E.flags.writeable = False
+        else:
+            self.E = None
+
+    def agent_params(self):
+        """
+        Returns a dictionary with the model arrays, as keyword arguments for the ``Agent`` constructor. Each agent gets its own (shallow) object arrays,
+        whose sub-arrays are the shared, read-only ones.
+        """
+
+        params = {
+            "A": _shallow_copy(self.A),
+            "B": _shallow_copy(self.B),
+            "C": _shallow_copy(self.C),
+            "D": _shallow_copy(self.D),
+            "E": self.E,
+            "pA": _shallow_copy(self.pA),
+            "pB": _shallow_copy(self.pB),
+            "pD": _shallow_copy(self.pD),
+        }
+
+        return params
+
+    def shares_memory(self, agent):
+        """
+        Returns a dictionary that maps each of ``"A"``, ``"B"``, ``"pA"`` and ``"pB"`` to a list of booleans, one per modality / factor,
+        indicating whether the ``agent`` still references the shared sub-array (i.e. has not materialized its own copy by learning)
+        """
+
+        out = {}
+        for name in ["A", "B", "pA", "pB"]:
+            shared, own = getattr(self, name), getattr(agent, name)
+            if shared is not None and own is not None:
+                out[name] = [own_i is shared_i for own_i, shared_i in zip(own, shared)]
+
+        return out
+
+class CompiledModel(SharedModel):
+    """
+    A ``SharedModel`` that additionally validates the generative model and constructs everything that is derived from its structure
+    (the numbers of observations, states and controls, ``A_factor_list``, ``B_factor_list``, ``mb_dict``, ``control_fac_idx``, the policies and the
+    default priors) once, so that agents can be constructed from it without repeating that work (``Agent.from_compiled``).
+
+    Any arguments of the ``Agent`` constructor can be passed to the model; the per-agent ones (e.g. ``gamma`` or ``lr_pA``)
+    only set defaults, which can be overridden for individual agents in ``Agent.from_compiled``.
+
+    >>> model = CompiledModel(A, B, C=C, pA=pA, policy_len=2)
+    >>> agents = [Agent.from_compiled(model, lr_pA=lr) for lr in np.linspace(0.1, 1.0, 1000)]
+    """
+
+    # attributes that hold the state of an individual agent, rather than the (shared) structure of the model
+    _AGENT_STATE = {"qs", "curr_timestep", "latest_belief", "prev_obs", "prev_actions", "action", "qs_hist", "q_pi_hist", "_q_pi_hist_offset", "_owned_arrays"}
+
+    def __init__(self, A, B, C=None, D=None, E=None, pA=None, pB=None, pD=None, **agent_kwargs):
+        """
+        Parameters
+        ----------
+        A: ``numpy.ndarray`` of dtype object
+            Sensory likelihood mapping or 'observation model'
+        B: ``numpy.ndarray`` of dtype object
+            Dynamics likelihood mapping or 'transition model'
+        C: ``numpy.ndarray`` of dtype object, default ``None``
+            Prior preferences over observations
+        D: ``numpy.ndarray`` of dtype object, default ``None``
+            Prior beliefs about initial hidden states
+        E: 1D ``numpy.ndarray``, default ``None``
+            Prior over policies
+        pA: ``numpy.ndarray`` of dtype object, default ``None``
+            Dirichlet parameters over the observation model (same shape as ``A``)
+        pB: ``numpy.ndarray`` of dtype object, default ``None``
+            Dirichlet parameters over the transition model (same shape as ``B``)
+        pD: ``numpy.ndarray`` of dtype object, default ``None``
+            Dirichlet parameters over the initial hidden state prior (same shape as ``D``)
+        **agent_kwargs: keyword arguments
+            Any other arguments to the ``Agent`` constructor (e.g. ``A_factor_list``, ``policy_len``, ``inference_algo``)
+        """
+
+        from pymdp.agent import Agent
+
+        super().__init__(A, B, C=C, D=D, E=E, pA=pA, pB=pB, pD=pD)
+
+        self.belief_hist_params = {
+            "save_belief_hist": agent_kwargs.pop("save_belief_hist", False),
+            "belief_hist_len": agent_kwargs.pop("belief_hist_len", None),
+            "belief_hist_dir": agent_kwargs.pop("belief_hist_dir", None),
+        }
+
+        # the validation and construction is done by the `Agent` constructor, once
+        prototype = Agent(**self.agent_params(), **agent_kwargs)
+        prototype._get_B_by_action() # the action-major copy of the (shared) transition model is computed once, and shared as well
+
+        self._agent_state = {name: value for name, value in vars(prototype).items() if name not in self._AGENT_STATE}
+
+        # the (possibly default-constructed) priors are shared read-only as well
+        self.C = self._agent_state["C"] = _read_only(prototype.C)
+        self.D = self._agent_state["D"] = _read_only(prototype.D)
+        self.E = self._agent_state["E"] = np.asarray(prototype.E).view()
+        self.E.flags.writeable = False
+
+        self.num_obs = prototype.num_obs
+        self.num_states = prototype.num_states
+        self.num_controls = prototype.num_controls
+        self.A_factor_list = prototype.A_factor_list
+        self.B_factor_list = prototype.B_factor_list
+        self.mb_dict = prototype.mb_dict
+        self.control_fac_idx = prototype.control_fac_idx
+        self.policies = prototype.policies
+
+    def agent_state(self):
+        """
+        Returns a dictionary with the attributes of an ``Agent`` that are derived from the model. Each agent gets its own (shallow) object arrays
+        and parameter dictionaries, while the sub-arrays, policies and index structures are shared.
+        """
+
+        state = dict(self._agent_state)
+        for name in ["A", "B", "C", "D", "pA", "pB", "pD"]:
+            state[name] = _shallow_copy(state[name])
+        state["edge_handling_params"] = dict(state["edge_handling_params"])
+        state["inference_params"] = dict(state["inference_params"])
+        if state.get("_I_reachability") is not None:
+            state["_I_reachability"] = list(state["_I_reachability"])
+
+        return state
@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Sharing generative models between processes
+
+A ``SharedMemoryModel`` copies the arrays of a generative model, once, into a single block of shared memory (``multiprocessing.shared_memory``).
+Its ``handle`` is a lightweight, picklable ``ModelHandle`` that only stores the name of the block and the layout of the arrays in it, and can be
+sent to worker processes instead of the arrays themselves. In a worker, ``ModelHandle.attach`` (or ``Agent.from_shared_memory``) rebuilds read-only
+numpy views onto the shared block, without copying any data, so that the memory used by the model stays the same however many workers use it.
+As with ``model.SharedModel``, learning is copy-on-write: an agent only copies the sub-arrays it updates. A worker that is done with a model
+(e.g. in a long-lived pool that goes through many models) can release its mapping of the block with ``ModelHandle.detach``.
+
+>>> with SharedMemoryModel(A, B, C=C) as model:
+>>>     with multiprocessing.Pool(8) as pool:
+>>>         results = pool.map(run_agent, [model.handle] * 100) # where `run_agent` calls `Agent.from_shared_memory(handle)`
+
+__author__: Conor Heins, Alexander Tschantz, Daphne Demekas, Brennan Klein
+
+"""
+
+import gc
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
+from pymdp import utils
+from pymdp.io import OBJ_ARRAY_NAMES
+
+# offsets of the arrays in a shared block are aligned to this number of bytes
+ALIGNMENT = 64
+
+# shared memory blocks created by a `SharedMemoryModel` in this process, by name
+_OWNED = {}
+
+# shared memory blocks that this process attached to (or whose owner closed them while views onto them still existed), by name, which are
+# kept mapped until they are detached (see `ModelHandle.detach`)
+_ATTACHED = {}
+
+class ModelHandle(object):
+    """
+    Picklable reference to a generative model stored in shared memory by a ``SharedMemoryModel``
+    """
+
+    def __init__(self, name, layout, A_factor_list=None, B_factor_list=None):
+        """
+        Parameters
+        ----------
+        name: ``str``
+            Name of the shared memory block
+        layout: ``list`` of ``tuple``
+            One entry ``(array_name, index, offset, shape, dtype)`` per stored array, where ``index`` is the index of the sub-array in the object array ``array_name``
+            (or ``None`` for ``E`` and ``policies``)
+        A_factor_list: ``list`` of ``list`` of ``int``, default ``None``
+            List of the hidden state factors that each observation modality depends on
+        B_factor_list: ``list`` of ``list`` of ``int``, default ``None``
+            List of the hidden state factors that the dynamics of each hidden state factor depend on
+        """
+
+        self.name = name
+        self.layout = layout
+        self.A_factor_list = A_factor_list
+        self.B_factor_list = B_factor_list
+
+    def attach(self):
+        """
+        Rebuilds the generative model from shared memory, as read-only views onto the shared block (no data is copied). The result can be passed
+        straight to the ``Agent`` constructor, or to ``model.CompiledModel``, as the result of ``io.load_model``.
+
+        Returns
+        ----------
+        model: ``dict``
+            Dictionary with the keys ``A``, ``B``, ``C``, ``D``, ``E``, ``pA``, ``pB``, ``pD``, ``A_factor_list``, ``B_factor_list`` and ``policies``,
+            whose values are ``None`` for the arrays or lists that were not stored
+        """
+
+        shm = _attach(self.name)
+        # unlike arrays constructed with `np.ndarray(buffer=...)`, the views of `np.frombuffer` hold an export of the buffer, so that the block
+        # can't be closed (see `_close`) while any of them exists
+        block = np.frombuffer(shm.buf, dtype=np.uint8)
+
+        sub_arrays = {}
+        for array_name, index, offset, shape, dtype in self.layout:
+            dtype = np.dtype(dtype)
+            view = block[offset:offset + int(np.prod(shape)) * dtype.itemsize].view(dtype).reshape(shape)
+            view.flags.writeable = False
+            sub_arrays.setdefault(array_name, []).append(view)
+
+        model = {name: None for name in OBJ_ARRAY_NAMES + ["E", "policies"]}
+        for array_name, views in sub_arrays.items():
+            if array_name in OBJ_ARRAY_NAMES:
+                model[array_name] = utils.obj_array_from_list(views)
+            else:
+                model[array_name] = views[0]
+
+        if model["policies"] is not None:
+            model["policies"] = list(model["policies"])
+
+        model["A_factor_list"] = self.A_factor_list
+        model["B_factor_list"] = self.B_factor_list
+
+        return model
+
+    def detach(self):
+        """
+        Releases the mapping of the shared block in this process (e.g. in a worker process that is done with the model), so that its memory can be freed
+        once the block has been closed by its owner. The arrays returned by ``attach`` (and the agents that reference them) must have been deleted beforehand.
+        This has no effect in the process that owns the block, which releases it with ``SharedMemoryModel.close``.
+        """
+
+        if self.name not in _ATTACHED:
+            return
+        if not _close(_ATTACHED[self.name]):
+            raise BufferError("The shared model is still referenced by arrays in this process, which must be deleted before it is detached")
+        del _ATTACHED[self.name]
+
+    @property
+    def nbytes(self):
+        """ Total size of the stored arrays, in bytes """
+        return sum(int(np.prod(shape)) * np.dtype(dtype).itemsize for _, _, _, shape, dtype in self.layout)
+
+
+class SharedMemoryModel(object):
+    """
+    Owner of a block of shared memory that stores the arrays of a generative model. The block is released by ``close`` (or at the end of a ``with`` block),
+    after which the handles to it can no longer be attached.
+    """
+
+    def __init__(self, A, B, C=None, D=None, E=None, pA=None, pB=None, pD=None, A_factor_list=None, B_factor_list=None, policies=None):
+        """
+        Parameters
+        ----------
+        A: ``numpy.ndarray`` of dtype object
+            Sensory likelihood mapping or 'observation model'
+        B: ``numpy.ndarray`` of dtype object
+            Dynamics likelihood mapping or 'transition model'
+        C: ``numpy.ndarray`` of dtype object, default ``None``
+            Prior preferences over observations
+        D: ``numpy.ndarray`` of dtype object, default ``None``
+            Prior beliefs about initial hidden states
+        E: 1D ``numpy.ndarray``, default ``None``
+            Prior over policies
+        pA: ``numpy.ndarray`` of dtype object, default ``None``
+            Dirichlet parameters over the observation model (same shape as ``A``)
+        pB: ``numpy.ndarray`` of dtype object, default ``None``
+            Dirichlet parameters over the transition model (same shape as ``B``)
+        pD: ``numpy.ndarray`` of dtype object, default ``None``
+            Dirichlet parameters over the initial hidden state prior (same shape as ``D``)
+        A_factor_list: ``list`` of ``list`` of ``int``, default ``None``
+            List of the hidden state factors that each observation modality depends on
+        B_factor_list: ``list`` of ``list`` of ``int``, default ``None``
+            List of the hidden state factors that the dynamics of each hidden state factor depend on
+        policies: ``list`` of 2D ``numpy.ndarray``, default ``None``
+            List of policies, each of shape ``(num_timesteps, num_factors)``
+        """
+
+        obj_arrays = {"A": A, "B": B, "C": C, "D": D, "pA": pA, "pB": pB, "pD": pD}
+        arrays = []
+        for name in OBJ_ARRAY_NAMES:
+            if obj_arrays[name] is not None:
+                arrays += [(name, i, np.asarray(arr)) for i, arr in enumerate(utils.to_obj_array(obj_arrays[name]))]
+        if E is not None:
+            arrays.append(("E", None, np.asarray(E)))
+        if policies is not None:
+            arrays.append(("policies", None, np.stack(policies)))
+
+        layout, offset = [], 0
+        for name, index, arr in arrays:
+            layout.append((name, index, offset, arr.shape, arr.dtype.str))
+            offset += -(-arr.nbytes // ALIGNMENT) * ALIGNMENT
+
+        self._shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        _OWNED[self._shm.name] = self._shm
+
+        for (name, index, arr), (_, _, offset, shape, dtype) in zip(arrays, layout):
+            np.ndarray(shape, dtype=dtype, buffer=self._shm.buf, offset=offset)[...] = arr
+
+        self.handle = ModelHandle(
+            self._shm.name, layout,
+            A_factor_list=None if A_factor_list is None else [list(map(int, factors)) for factors in A_factor_list],
+            B_factor_list=None if B_factor_list is None else [list(map(int, factors)) for factors in B_factor_list],
+        )
+
+    @classmethod
+    def from_agent(cls, agent):
+        """
+        Stores the generative model of an ``Agent`` (its arrays, Dirichlet parameters, factor lists and policies) in shared memory
+        """
+
+        return cls(
+            agent.A, agent.B, C=agent.C, D=agent.D, E=agent.E, pA=agent.pA, pB=agent.pB, pD=agent.pD,
+            A_factor_list=agent.A_factor_list, B_factor_list=agent.B_factor_list, policies=agent.policies
+        )
+
+    def close(self):
+        """
+        Releases the shared memory block. The memory is freed once all the processes that attached to it have dropped their views onto it.
+        """
+
+        if self._shm is None:
+            return
+        _OWNED.pop(self._shm.name, None)
+        if not _close(self._shm):
+            _ATTACHED[self._shm.name] = self._shm # arrays in this process still reference the block, which stays mapped until it is detached
+        # worker processes share the resource tracker of this process, and unregister the block when they attach to it (see `_attach`),
+        # so it is registered again for `unlink` to unregister it
+        resource_tracker.register(self._shm._name, "shared_memory")
+        self._shm.unlink()
+        self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+def _close(shm):
+    """
+    Closes the mapping of the shared memory block ``shm`` in this process, unless arrays returned by ``ModelHandle.attach`` still reference it.
+    Returns whether the block was closed.
+    """
+
+    for _ in range(2):
+        try:
+            shm.close()
+            return True
+        except BufferError:
+            gc.collect() # the arrays may only be referenced by garbage reference cycles (e.g. of agents)
+    return False
+
+def _attach(name):
+    """
+    Returns the shared memory block ``name``, attaching to it if it is not open in this process yet
+    """
+
+    if name in _OWNED:
+        return _OWNED[name]
+
+    if name not in _ATTACHED:
+        try:
+            shm = shared_memory.SharedMemory(name=name, track=False) # the block is owned (and unlinked) by the `SharedMemoryModel` that created it
+        except TypeError:
+            # before Python 3.13, attaching registers the block with the resource tracker (which would unlink it when the process that started
+            # the tracker exits), so it is unregistered again
+            shm = shared_memory.SharedMemory(name=name)
+            resource_tracker.unregister(shm._name, "shared_memory")
+        _ATTACHED[name] = shm
+    return _ATTACHED[name]
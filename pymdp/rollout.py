@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Running many agent-environment episodes
+
+``run_episodes`` runs the perception-action loop (``infer_states -> infer_policies -> sample_action -> env.step``) of many independent episodes,
+each with a fresh agent and environment built by user-provided factories, optionally across a pool of worker processes. The trajectories are
+written into preallocated, columnar arrays (one array per recorded quantity, whose first two axes are the episode and the timestep), which can
+be stored as memory-mapped ``.npy`` files, so that they can be analysed without reassembling lists of object arrays.
+
+Every episode seeds the global ``numpy`` random state (which is used by the agents and the environments) with its own seed, spawned from a single
+``numpy.random.SeedSequence``. The trajectories therefore only depend on the seed, and not on the number of workers or on how the episodes are
+distributed among them.
+
+__author__: Conor Heins, Alexander Tschantz, Daphne Demekas, Brennan Klein
+
+"""
+
+import os
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from pymdp import inference
+
+MANIFEST_NAME = "manifest.json"
+ROLLOUT_FORMAT = "pymdp-rollouts"
+
+def run_episodes(agent_factory, env_factory, num_episodes, num_timesteps, seed=None, num_workers=1, out_dir=None, chunk_size=None, start_method="spawn"):
+    """
+    Runs ``num_episodes`` episodes of ``num_timesteps`` timesteps each, and records their observations, actions, beliefs about hidden states,
+    posteriors over policies and negative expected free energies.
+
+    Parameters
+    ----------
+    agent_factory: callable
+        Function without arguments that returns a new ``Agent``, called at the beginning of every episode. It must be picklable (e.g. a module-level
+        function or a ``functools.partial`` of one) if ``num_workers > 1``.
+    env_factory: callable
+        Function without arguments that returns a new ``Env``, called at the beginning of every episode (after ``agent_factory``). Its ``reset`` method
+        must return the initial observation, and its ``step`` method the next observation, as (lists of) observation indices.
+    num_episodes: ``int``
+        Number of episodes to run
+    num_timesteps: ``int``
+        Number of timesteps (i.e. of actions) of every episode
+    seed: ``int``, ``numpy.random.SeedSequence`` or ``None``
+        Seed from which the seeds of the episodes are spawned
+    num_workers: ``int``
+        Number of worker processes. If 1, the episodes are run in the calling process (whose global random state is restored afterwards).
+    out_dir: ``str`` or ``None``
+        If not ``None``, the trajectories are written to memory-mapped ``.npy`` files in this directory (one per recorded quantity, along with a manifest),
+        that the workers write into directly, and that can be loaded again with ``load_episodes``
+    chunk_size: ``int`` or ``None``
+        Number of episodes that are sent to a worker at once. By default, the episodes are split into about four chunks per worker.
+    start_method: ``str``
+        Start method of the worker processes (see ``multiprocessing.get_context``). Workers are spawned by default, since forking a process
+        in which ``jax`` has started its threads can deadlock.
+
+    Returns
+    ----------
+    trajectories: ``dict``
+        Dictionary of arrays, whose first two axes are the episode and the timestep:
+        ``obs`` (observation indices, of shape ``(num_episodes, num_timesteps, num_modalities)``), ``actions`` (of shape ``(num_episodes, num_timesteps, num_factors)``),
+        ``qs_{f}`` for each hidden state factor ``f`` (beliefs about the current hidden state, of shape ``(num_episodes, num_timesteps, num_states[f])``),
+        ``q_pi`` and ``G`` (of shape ``(num_episodes, num_timesteps, num_policies)``). With marginal message passing, ``qs_{f}`` stores the
+        Bayesian model average of the beliefs about the current timestep.
+    """
+
+    random_state = np.random.get_state()
+    fields = _get_fields(agent_factory(), num_timesteps)
+    np.random.set_state(random_state)
+
+    trajectories = _allocate(fields, num_episodes, out_dir)
+    episode_seeds = (seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)).spawn(num_episodes)
+
+    if chunk_size is None:
+        chunk_size = max(1, int(np.ceil(num_episodes / (4 * num_workers))))
+    starts = range(0, num_episodes, chunk_size)
+
+    if num_workers == 1:
+        random_state = np.random.get_state()
+        for start in starts:
+            _run_chunk(agent_factory, env_factory, num_timesteps, episode_seeds[start:start + chunk_size], fields, trajectories, start)
+        np.random.set_state(random_state)
+    else:
+        # with an output directory, the workers write into the memory-mapped files directly, rather than sending their trajectories back
+        with ProcessPoolExecutor(num_workers, mp_context=multiprocessing.get_context(start_method)) as pool:
+            futures = [
+                pool.submit(
+                    _run_chunk, agent_factory, env_factory, num_timesteps, episode_seeds[start:start + chunk_size], fields, out_dir, start
+                ) for start in starts
+            ]
+            for start, future in zip(starts, futures):
+                chunk = future.result()
+                if out_dir is None:
+                    for name, arr in chunk.items():
+                        trajectories[name][start:start + len(arr)] = arr
+
+    if out_dir is not None:
+        for arr in trajectories.values():
+            arr.flush()
+        # the manifest is written last, so that a directory with a manifest contains complete trajectories
+        with open(os.path.join(out_dir, MANIFEST_NAME), "w") as f:
+            json.dump({"format": ROLLOUT_FORMAT, "fields": list(fields.keys())}, f, indent=2)
+
+    return trajectories
+
+def load_episodes(path, mmap_mode="r"):
+    """
+    Loads the trajectories written by ``run_episodes`` to the directory ``path``, as a dictionary of (by default, memory-mapped) arrays
+    """
+
+    manifest_path = os.path.join(path, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        raise FileNotFoundError(f"No trajectories found in {path} (missing {MANIFEST_NAME})")
+
+    with open(manifest_path, "r") as f:
+        manifest = json.load(f)
+
+    if manifest.get("format") != ROLLOUT_FORMAT:
+        raise ValueError(f"{path} does not contain {ROLLOUT_FORMAT}")
+
+    return {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode) for name in manifest["fields"]}
+
+def _get_fields(agent, num_timesteps):
+    """
+    Returns the shapes (without the episode axis) and dtypes of the recorded quantities, for the agents built by an agent factory
+    """
+
+    num_policies = len(agent.policies)
+    fields = {
+        "obs": ((num_timesteps, agent.num_modalities), "int64"),
+        "actions": ((num_timesteps, agent.num_factors), "int64"),
+    }
+    for f, ns in enumerate(agent.num_states):
+        fields[f"qs_{f}"] = ((num_timesteps, ns), "float64")
+    fields["q_pi"] = ((num_timesteps, num_policies), "float64")
+    fields["G"] = ((num_timesteps, num_policies), "float64")
+    return fields
+
+def _allocate(fields, num_episodes, out_dir=None):
+    """
+    Allocates the arrays of the recorded quantities of ``num_episodes`` episodes, in memory or as ``.npy`` files in ``out_dir``
+    """
+
+    if out_dir is None:
+        return {name: np.zeros((num_episodes,) + shape, dtype=dtype) for name, (shape, dtype) in fields.items()}
+
+    os.makedirs(out_dir, exist_ok=True)
+    trajectories = {
+        name: np.lib.format.open_memmap(os.path.join(out_dir, f"{name}.npy"), mode="w+", dtype=dtype, shape=(num_episodes,) + shape)
+        for name, (shape, dtype) in fields.items()
+    }
+    return trajectories
+
+def _run_chunk(agent_factory, env_factory, num_timesteps, episode_seeds, fields, out, start):
+    """
+    Runs the episodes with seeds ``episode_seeds``, and writes their trajectories into ``out`` (a dictionary of arrays, or the directory of the
+    memory-mapped files of ``run_episodes``) from episode ``start`` onwards. If ``out`` is ``None``, the trajectories are returned instead, in
+    arrays that only contain this chunk of episodes.
+    """
+
+    return_chunk = out is None
+    if return_chunk:
+        out, start = _allocate(fields, len(episode_seeds)), 0
+    elif isinstance(out, str):
+        out = {name: np.load(os.path.join(out, f"{name}.npy"), mmap_mode="r+") for name in fields}
+
+    for i, episode_seed in enumerate(episode_seeds):
+        _run_episode(agent_factory, env_factory, num_timesteps, episode_seed, {name: arr[start + i] for name, arr in out.items()})
+
+    for arr in out.values():
+        if isinstance(arr, np.memmap):
+            arr.flush()
+
+    return out if return_chunk else None
+
+def _run_episode(agent_factory, env_factory, num_timesteps, episode_seed, record):
+    """
+    Runs a single episode, writing its trajectory into ``record``, a dictionary of arrays whose first axis is the timestep
+    """
+
+    np.random.seed(episode_seed.generate_state(4))
+
+    agent = agent_factory()
+    env = env_factory()
+    obs = env.reset()
+
+    for t in range(num_timesteps):
+        agent.infer_states(obs)
+        q_pi, G = agent.infer_policies()
+        action = agent.sample_action()
+
+        record["obs"][t] = np.asarray(obs).reshape(-1)
+        record["actions"][t] = action
+        for f, qs_f in enumerate(_current_beliefs(agent)):
+            record[f"qs_{f}"][t] = qs_f
+        record["q_pi"][t] = q_pi
+        record["G"][t] = G
+
+        obs = env.step(action)
+
+def _current_beliefs(agent):
+    """
+    Returns the beliefs of ``agent`` about the hidden states at the current timestep. With marginal message passing, these are averaged
+    over the posterior over policies.
+    """
+
+    if agent.inference_algo == "VANILLA":
+        return agent.qs
+    return inference.average_states_over_policies(agent.qs[:, -(agent.policy_len + 1)], agent.q_pi)
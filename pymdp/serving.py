@@ -0,0 +1,256 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Serving many agent sessions from an asyncio event loop
+
+An ``AgentServer`` holds a single generative model and any number of ``Session`` objects, each of which stores the beliefs of one agent (e.g. one
+per external simulator). ``await session.step(observation)`` queues a request to perform a full perception-action step (state inference, policy
+inference and action selection) for that session, and returns its action once the step has been run.
+
+Instead of running each step separately, the server collects the requests that arrive within a short delay of each other (up to a maximum batch
+size) and runs the requests of compatible sessions together, as a single batched call of a ``VectorAgent``. Sessions are compatible when they
+are at the same stage of their episode, i.e. either all of them start from the prior over initial states (``D``), or all of them have taken
+a previous action. The batched calls are run in an executor, so that they don't block the event loop.
+
+The basic usage is as follows:
+
+>>> async with AgentServer(A = A, B = B, C = C, max_batch_size = 64, max_delay = 0.002) as server:
+>>>     session = server.new_session()
+>>>     action = await session.step(observation)
+
+__author__: Conor Heins, Alexander Tschantz, Daphne Demekas, Brennan Klein
+
+"""
+
+import asyncio
+import itertools
+
+import numpy as np
+from pymdp import utils
+from pymdp.vector_agent import VectorAgent
+
+class Session(object):
+    """
+    The beliefs and latest action of one agent served by an ``AgentServer``, with the same attributes as the corresponding ``Agent``
+    (``qs``, ``q_pi``, ``G``, ``action`` and ``curr_timestep``)
+    """
+
+    def __init__(self, server, session_id):
+        self.server = server
+        self.session_id = session_id
+        self.reset()
+
+    def reset(self, init_qs=None):
+        """
+        Resets the beliefs about hidden states to uniform distributions (or to ``init_qs``), wipes the latest action, and resets time to the first timestep
+        """
+
+        self.qs = utils.obj_array_uniform(self.server.num_states) if init_qs is None else init_qs
+        self.q_pi = None
+        self.G = None
+        self.action = None
+        self.curr_timestep = 0
+
+        return self.qs
+
+    async def step(self, observation):
+        """
+        Queues a perception-action step of this session, given an ``observation`` (a list of observation indices, one per modality), and returns
+        the resulting action once the step has been run (see ``AgentServer.step``)
+        """
+        return await self.server.step(self, observation)
+
+
+class AgentServer(object):
+    """
+    Serves the perception-action steps of many sessions that share a generative model, by micro-batching their requests into calls of ``VectorAgent``.
+    """
+
+    def __init__(self, A, B, C=None, D=None, E=None, max_batch_size=32, max_delay=0.002, executor=None, **agent_kwargs):
+        """
+        Parameters
+        ----------
+        A, B, C, D, E: ``numpy.ndarray``
+            Generative model shared by all the sessions (see ``VectorAgent``)
+        max_batch_size: ``int``
+            Maximum number of requests that are run in a single batch
+        max_delay: ``float``
+            Maximum time (in seconds) that the first request of a batch waits for other requests to arrive before the batch is run
+        executor: ``concurrent.futures.Executor`` or ``None``
+            Executor in which the batches are run. If ``None``, the default executor of the event loop is used.
+        agent_kwargs:
+            Other parameters of ``VectorAgent`` (e.g. ``policy_len``, ``control_fac_idx``, ``gamma`` or ``action_selection``)
+        """
+
+        self.model = dict(A=A, B=B, C=C, D=D, E=E, **agent_kwargs)
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.executor = executor
+
+        # batched agents, keyed by batch size, that are built on first use
+        self._agents = {}
+        template = self._get_batch_agent(1)
+        self.num_states = template.num_states
+        self.num_factors = template.num_factors
+        self.num_modalities = template.num_modalities
+
+        self._session_ids = itertools.count()
+        self._queue = None
+        self._task = None
+
+        self.num_batches = 0
+        self.num_requests = 0
+
+    async def start(self):
+        """
+        Starts the task that collects and runs the batches of requests, in the running event loop
+        """
+
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.get_running_loop().create_task(self._serve())
+
+    async def close(self):
+        """
+        Stops serving requests. The requests that have not been run yet are cancelled.
+        """
+
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+        while not self._queue.empty():
+            _, _, future = self._queue.get_nowait()
+            future.cancel()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def new_session(self):
+        """
+        Returns a new ``Session`` with uniform beliefs about hidden states
+        """
+        return Session(self, next(self._session_ids))
+
+    async def step(self, session, observation):
+        """
+        Queues a perception-action step of ``session``, and waits until it has been run
+
+        Parameters
+        ----------
+        session: ``Session``
+            The session to step. Its beliefs, posterior over policies and action are updated once the step has been run.
+        observation: ``list`` or 1D ``numpy.ndarray`` of ``int``
+            The observation indices of the session, one per modality
+
+        Returns
+        ----------
+        action: 1D ``numpy.ndarray``
+            The action of the session, one index per hidden state factor
+        """
+
+        if self._task is None:
+            raise RuntimeError("The server must be started (with `await server.start()` or `async with server`) before it can serve requests")
+
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((session, np.asarray(observation, dtype=int).reshape(self.num_modalities), future))
+        return await future
+
+    async def _serve(self):
+        """
+        Collects batches of requests and runs them, until the server is closed. A request of a session that already has a request in the
+        current batch is deferred to the next one, so that the steps of each session are run in order.
+        """
+
+        loop = asyncio.get_running_loop()
+        requests, deferred = [], []
+
+        try:
+            while True:
+                requests = deferred if len(deferred) > 0 else [await self._queue.get()]
+                deadline = loop.time() + self.max_delay
+                while len(requests) < self.max_batch_size:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        requests.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+
+                # drop the requests whose callers stopped waiting for them
+                requests = [request for request in requests if not request[2].done()]
+
+                batch, deferred, sessions = [], [], set()
+                for request in requests:
+                    if id(request[0]) in sessions:
+                        deferred.append(request)
+                    else:
+                        sessions.add(id(request[0]))
+                        batch.append(request)
+
+                groups = {}
+                for request in batch:
+                    groups.setdefault(request[0].action is None, []).append(request)
+
+                for group in groups.values():
+                    try:
+                        actions = await loop.run_in_executor(self.executor, self._run_batch, group)
+                    except Exception as e:
+                        for _, _, future in group:
+                            if not future.done():
+                                future.set_exception(e)
+                        continue
+
+                    for (_, _, future), action in zip(group, actions):
+                        if not future.done():
+                            future.set_result(action)
+        finally:
+            # the requests that were taken from the queue but not run are cancelled when the server is closed
+            for _, _, future in requests + deferred:
+                future.cancel()
+
+    def _run_batch(self, requests):
+        """
+        Runs the perception-action steps of a batch of compatible requests with a ``VectorAgent``, and writes the results back into their sessions
+        """
+
+        sessions = [session for session, _, _ in requests]
+        agent = self._get_batch_agent(len(requests))
+
+        agent.qs = utils.obj_array_from_list([np.stack([session.qs[f] for session in sessions]) for f in range(self.num_factors)])
+        agent.action = None if sessions[0].action is None else np.stack([session.action for session in sessions])
+
+        qs = agent.infer_states(np.stack([observation for _, observation, _ in requests]))
+        q_pi, G = agent.infer_policies()
+        actions = agent.sample_action()
+
+        for i, session in enumerate(sessions):
+            session.qs = utils.obj_array_from_list([qs_f[i] for qs_f in qs])
+            session.q_pi = q_pi[i]
+            session.G = G[i]
+            session.action = actions[i]
+            session.curr_timestep += 1
+
+        self.num_batches += 1
+        self.num_requests += len(requests)
+
+        return list(actions)
+
+    def _get_batch_agent(self, batch_size):
+        """
+        Returns the ``VectorAgent`` that runs batches of ``batch_size`` requests
+        """
+
+        if batch_size not in self._agents:
+            self._agents[batch_size] = VectorAgent(num_agents=batch_size, **self.model)
+        return self._agents[batch_size]
@@ -7,10 +7,8 @@ __author__: Conor Heins, Alexander Tschantz, Brennan Klein
 """
 
 import numpy as np
-import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
 
+import os
 import warnings
 import itertools
 
@@ -255,15 +253,32 @@ def norm_dist(dist):
     """ Normalizes a Categorical probability distribution (or set of them) assuming sufficient statistics are stored in leading dimension"""
     return np.divide(dist, dist.sum(axis=0))
 
-def norm_dist_obj_arr(obj_arr):
+def norm_dist_obj_arr(obj_arr, like=None):
     """ Normalizes a multi-factor or -modality collection of Categorical probability distributions, assuming sufficient statistics of each conditional distribution
-    are stored in the leading dimension"""
+    are stored in the leading dimension. If ``like`` is provided, any sub-array of ``like`` that is identical to the corresponding normalized sub-array
+    is reused in the output in place of it, so that e.g. arrays shared between agents are not duplicated."""
     normed_obj_array = obj_array(len(obj_arr))
     for i, arr in enumerate(obj_arr):
         normed_obj_array[i] = norm_dist(arr)
+        if like is not None and like[i].shape == normed_obj_array[i].shape and np.array_equal(like[i], normed_obj_array[i]):
+            normed_obj_array[i] = like[i]
     
     return normed_obj_array
 
+def action_major(B, factors=None, out=None):
+    """
+    Returns an action-major copy of the transition model ``B``, i.e. an object array whose sub-array ``B_by_action[f]`` has shape ``(num_controls[f], num_states[f], ...)``
+    and is C-contiguous, so that ``B_by_action[f][u]`` is the same matrix as ``B[f][..., u]``, but stored in a contiguous block of memory rather than as a strided view.
+    If ``out`` (a previous output of this function) is provided, only the sub-arrays of the factors in ``factors`` (default: all) are recomputed, in-place of ``out``.
+    """
+    B = to_obj_array(B)
+    if out is None:
+        out = obj_array(len(B))
+    factors = range(len(B)) if factors is None else factors
+    for f in factors:
+        out[f] = np.ascontiguousarray(np.moveaxis(B[f], -1, 0))
+    return out
+
 def is_normalized(dist):
     """
     Utility function for checking whether a single distribution or set of conditional categorical distributions is normalized.
@@ -283,9 +298,11 @@ def is_normalized(dist):
     return out
 
 def is_obj_array(arr):
-    return arr.dtype == "object"
+    return isinstance(arr, Ragged) or arr.dtype == "object"
 
 def to_obj_array(arr):
+    if isinstance(arr, Ragged):
+        return arr.to_obj_array() # views onto the buffer of the `Ragged`
     if is_obj_array(arr):
         return arr
     obj_array_out = obj_array(1)
@@ -346,6 +363,38 @@ def process_observation(obs, num_modalities, num_observations):
 
     return obs
 
+def to_obs_indices(obs, num_modalities):
+    """
+    Converts an observation given as observation indices (an ``int`` for a single modality, or a ``list``, ``tuple`` or integer ``numpy.ndarray``
+    with one index per modality) into an integer ``numpy.ndarray`` of shape ``(num_modalities,)``, without constructing any one-hot vectors.
+    The likelihood and learning functions use the indices to select the rows of ``A`` directly.
+
+    Returns ``None`` if ``obs`` is instead given as (one-hot or distributional) observation vectors, which are formatted by ``process_observation``.
+    """
+
+    if isinstance(obs, (int, np.integer)):
+        return np.array([obs]) if num_modalities == 1 else None
+    if isinstance(obs, (list, tuple)):
+        if len(obs) == num_modalities and all(isinstance(o, (int, np.integer)) for o in obs):
+            return np.array(obs, dtype=int)
+        return None
+    if isinstance(obs, np.ndarray) and np.issubdtype(obs.dtype, np.integer) and obs.shape == (num_modalities,):
+        return obs
+    return None
+
+def to_obs_indices_seq(obs_seq, num_modalities):
+    """
+    Converts a sequence of observations given as observation indices (see ``to_obs_indices``) into an integer ``numpy.ndarray`` of shape ``(T, num_modalities)``.
+    Returns ``None`` if any of the observations is given as (one-hot or distributional) observation vectors.
+    """
+
+    if isinstance(obs_seq, np.ndarray) and np.issubdtype(obs_seq.dtype, np.integer) and obs_seq.ndim == 2 and obs_seq.shape[1] == num_modalities:
+        return obs_seq
+    obs_idx = [to_obs_indices(obs_t, num_modalities) for obs_t in obs_seq]
+    if len(obs_idx) == 0 or any(obs_t is None for obs_t in obs_idx):
+        return None
+    return np.stack(obs_idx)
+
 def convert_observation_array(obs, num_obs):
     """
     Converts from SPM-style observation array to infer-actively one-hot object arrays.
@@ -419,31 +468,100 @@ def reduce_a_matrix(A):
         that are maintained in the A matrix (and thus have an informative / non-degenerate relationship to observations
     """
 
-    o_dim, num_states = A.shape[0], A.shape[1:]
-    idx_vec_s = [slice(0, o_dim)]  + [slice(ns) for _, ns in enumerate(num_states)]
-
-    original_factor_idx = []
-    excluded_factor_idx = [] # the indices of the hidden state factors that are independent of the observation and thus marginalized away
-    for factor_i, ns in enumerate(num_states):
+    dependent = _dependent_axes(A, range(1, A.ndim))
 
-        level_counter = 0
-        break_flag = False
-        while level_counter < ns and break_flag is False:
-            idx_vec_i = idx_vec_s.copy()
-            idx_vec_i[factor_i+1] = slice(level_counter,level_counter+1,None)
-            if not np.isclose(A.mean(axis=factor_i+1), A[tuple(idx_vec_i)].squeeze()).all():
-                break_flag = True # this means they're not independent
-                original_factor_idx.append(factor_i)
-            else:
-                level_counter += 1
-        
-        if break_flag is False:
-            excluded_factor_idx.append(factor_i+1)
+    original_factor_idx = [factor_i for factor_i, dep in enumerate(dependent) if dep]
+    excluded_factor_idx = [factor_i+1 for factor_i, dep in enumerate(dependent) if not dep] # the indices of the hidden state factors that are independent of the observation and thus marginalized away
     
     A_reduced = A.mean(axis=tuple(excluded_factor_idx)).squeeze()
 
     return A_reduced, original_factor_idx
 
+def _dependent_axes(arr, axes):
+    """
+    Returns, for each of the ``axes`` of ``arr``, whether the entries of ``arr`` vary along it (i.e. whether the distribution that ``arr`` encodes depends on the
+    corresponding variable), by comparing the maximum and minimum along each axis at once, rather than each level in turn
+    """
+    return [not np.isclose(arr.max(axis=axis), arr.min(axis=axis)).all() for axis in axes]
+
+def sparsify_factor_lists(A, B, A_factor_list=None, B_factor_list=None, pA=None, pB=None):
+    """
+    Model analysis pass that finds the hidden state factors that each observation modality (``A[m]``) and the dynamics of each hidden state factor (``B[f]``)
+    actually depend on, and reduces the arrays to the minimal ``A_factor_list`` and ``B_factor_list``, by removing the lagging dimensions of factors
+    that they are independent of. All subsequent computations (inference, planning and learning) then operate on the smaller arrays.
+
+    The dynamics of each factor are always kept dependent on the factor itself, and each modality on at least one factor.
+    If Dirichlet parameters ``pA`` or ``pB`` are provided, a factor is only removed if both the distributions and their Dirichlet parameters are independent of it.
+
+    Parameters
+    ----------
+    A: ``numpy.ndarray`` of dtype object
+        Sensory likelihood mapping or 'observation model'
+    B: ``numpy.ndarray`` of dtype object
+        Dynamics likelihood mapping or 'transition model'
+    A_factor_list: ``list`` of ``list`` of ``int``, default ``None``
+        The hidden state factors that each modality of ``A`` is conditioned on. Defaults to all factors.
+    B_factor_list: ``list`` of ``list`` of ``int``, default ``None``
+        The hidden state factors that the dynamics of each factor in ``B`` are conditioned on. Defaults to the factor itself.
+    pA: ``numpy.ndarray`` of dtype object, default ``None``
+        Dirichlet parameters over the observation model (same shape as ``A``)
+    pB: ``numpy.ndarray`` of dtype object, default ``None``
+        Dirichlet parameters over the transition model (same shape as ``B``)
+
+    Returns
+    ----------
+    A_reduced: ``numpy.ndarray`` of dtype object
+        The observation model, conditioned on the factors in ``A_factor_list_reduced``
+    B_reduced: ``numpy.ndarray`` of dtype object
+        The transition model, conditioned on the factors in ``B_factor_list_reduced``
+    pA_reduced: ``numpy.ndarray`` of dtype object or ``None``
+        The reduced Dirichlet parameters over the observation model
+    pB_reduced: ``numpy.ndarray`` of dtype object or ``None``
+        The reduced Dirichlet parameters over the transition model
+    A_factor_list_reduced: ``list`` of ``list`` of ``int``
+        The minimal list of the factors that each modality depends on
+    B_factor_list_reduced: ``list`` of ``list`` of ``int``
+        The minimal list of the factors that the dynamics of each factor depend on
+    """
+
+    A, B = to_obj_array(A), to_obj_array(B)
+    num_factors = len(B)
+    if A_factor_list is None:
+        A_factor_list = len(A) * [list(range(num_factors))]
+    if B_factor_list is None:
+        B_factor_list = [[f] for f in range(num_factors)]
+
+    def reduce(arr, p_arr, factors, trailing, must_keep):
+        axes = list(range(1, arr.ndim - trailing))
+        dependent = _dependent_axes(arr, axes)
+        if p_arr is not None:
+            dependent = [dep or dep_p for dep, dep_p in zip(dependent, _dependent_axes(p_arr, axes))]
+        dependent = [dep or (factor in must_keep) for dep, factor in zip(dependent, factors)]
+        if not any(dependent):
+            dependent[0] = True
+
+        removed_axes = tuple(axis for axis, dep in zip(axes, dependent) if not dep)
+        reduced_factors = [factor for factor, dep in zip(factors, dependent) if dep]
+        arr_reduced = arr.mean(axis=removed_axes)
+        p_reduced = p_arr.mean(axis=removed_axes) if p_arr is not None else None
+        return arr_reduced, p_reduced, reduced_factors
+
+    A_reduced, pA_reduced, A_factor_list_reduced = obj_array(len(A)), obj_array(len(A)) if pA is not None else None, []
+    for m in range(len(A)):
+        A_reduced[m], pA_m, factors_m = reduce(A[m], pA[m] if pA is not None else None, A_factor_list[m], 0, [])
+        if pA is not None:
+            pA_reduced[m] = pA_m
+        A_factor_list_reduced.append(factors_m)
+
+    B_reduced, pB_reduced, B_factor_list_reduced = obj_array(num_factors), obj_array(num_factors) if pB is not None else None, []
+    for f in range(num_factors):
+        B_reduced[f], pB_f, factors_f = reduce(B[f], pB[f] if pB is not None else None, B_factor_list[f], 1, [f])
+        if pB is not None:
+            pB_reduced[f] = pB_f
+        B_factor_list_reduced.append(factors_f)
+
+    return A_reduced, B_reduced, pA_reduced, pB_reduced, A_factor_list_reduced, B_factor_list_reduced
+
 def construct_full_a(A_reduced, original_factor_idx, num_states):
     """
     Utility function for reconstruction a full A matrix from a reduced A matrix, using known factor indices
@@ -516,6 +634,377 @@ def construct_full_a(A_reduced, original_factor_idx, num_states):
     
 #     return belief_array
 
+class Ragged(object):
+    """
+    A collection of arrays of different shapes (e.g. the marginal beliefs about each hidden state factor, or the ``A`` array of each observation modality)
+    stored in a single contiguous, 1-D float buffer, where the ``i``-th array occupies the entries ``buffer[offsets[i]:offsets[i+1]]``.
+
+    ``ragged[i]`` returns a view of the ``i``-th array (no data is copied), so a ``Ragged`` can be used wherever an object array is expected:
+    ``utils.is_obj_array`` is true for it and ``utils.to_obj_array`` converts it into an object array of views onto the buffer. Unlike an object array,
+    operations such as ``normalize``, ``log`` and ``softmax`` are vectorized over the whole buffer, and pickling (e.g. to send beliefs or a model
+    to another process) only serializes the buffer and the shapes.
+
+    >>> qs = Ragged.uniform([3, 4])
+    >>> qs[1] # view of shape (4,)
+    """
+
+    def __init__(self, buffer, shapes):
+        """
+        Parameters
+        ----------
+        buffer: 1D ``numpy.ndarray``
+            Contiguous buffer that stores the (flattened) arrays one after the other
+        shapes: ``list`` of ``tuple`` of ``int``
+            Shape of each array
+        """
+        self.shapes = [tuple(int(d) for d in np.atleast_1d(shape)) for shape in shapes]
+        self.sizes = np.array([int(np.prod(shape)) for shape in self.shapes], dtype=np.intp)
+        self.offsets = np.concatenate(([0], np.cumsum(self.sizes))).astype(np.intp)
+
+        buffer = np.asarray(buffer)
+        if buffer.ndim != 1 or buffer.shape[0] != self.offsets[-1]:
+            raise ValueError(f"`buffer` must be a 1-D array with {self.offsets[-1]} entries (the total size of `shapes`)")
+        self.buffer = buffer
+
+        self._views = [buffer[start:stop].reshape(shape) for start, stop, shape in zip(self.offsets[:-1], self.offsets[1:], self.shapes)]
+
+    @classmethod
+    def from_arrays(cls, arrays, dtype=float):
+        """
+        Creates a ``Ragged`` from an object array (or list) of arrays, copying them into a new buffer
+        """
+        arrays = [np.asarray(arr) for arr in arrays]
+        buffer = np.concatenate([arr.ravel() for arr in arrays]).astype(dtype) if len(arrays) > 0 else np.zeros(0, dtype=dtype)
+        return cls(buffer, [arr.shape for arr in arrays])
+
+    @classmethod
+    def zeros(cls, shape_list):
+        """
+        Creates a ``Ragged`` of arrays filled with zeros, with shapes given by ``shape_list[i]``
+        """
+        shapes = [tuple(np.atleast_1d(shape)) for shape in shape_list]
+        return cls(np.zeros(sum(int(np.prod(shape)) for shape in shapes)), shapes)
+
+    @classmethod
+    def uniform(cls, shape_list):
+        """
+        Creates a ``Ragged`` of uniform Categorical distributions (normalized over the leading dimension), with shapes given by ``shape_list[i]``
+        """
+        ragged = cls.zeros(shape_list)
+        ragged.buffer[:] = np.repeat([1.0 / shape[0] for shape in ragged.shapes], ragged.sizes)
+        return ragged
+
+    def __len__(self):
+        return len(self.shapes)
+
+    def __iter__(self):
+        return iter(self._views)
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, np.integer)):
+            return self._views[key]
+        # slices and lists of indices select several arrays, as for object arrays
+        return self.to_obj_array()[key]
+
+    def __setitem__(self, key, value):
+        self._views[key][...] = value
+
+    def __reduce__(self):
+        return (Ragged, (self.buffer, self.shapes))
+
+    def copy(self):
+        return Ragged(self.buffer.copy(), self.shapes)
+
+    def to_obj_array(self):
+        """
+        Returns an object array of views onto the buffer (no data is copied)
+        """
+        return obj_array_from_list(self._views)
+
+    def _all_vectors(self):
+        return all(len(shape) == 1 for shape in self.shapes)
+
+    def _map_arrays(self, func):
+        """
+        Returns a new ``Ragged``, whose arrays are ``func`` applied to each of the arrays of this one
+        """
+        out = Ragged(np.empty(self.buffer.shape), self.shapes)
+        for arr, out_arr in zip(self._views, out._views):
+            out_arr[...] = func(arr)
+        return out
+
+    def normalize(self):
+        """
+        Returns a new ``Ragged`` in which each array is normalized over its leading dimension (see ``norm_dist``). If all the arrays are
+        vectors (e.g. beliefs), this is computed in one pass over the buffer.
+        """
+        if self._all_vectors():
+            sums = np.add.reduceat(self.buffer, self.offsets[:-1])
+            return Ragged(self.buffer / np.repeat(sums, self.sizes), self.shapes)
+        return self._map_arrays(norm_dist)
+
+    def log(self):
+        """
+        Returns a new ``Ragged`` with the natural logarithm of all arrays (with a small epsilon added, as in ``maths.spm_log_single``)
+        """
+        return Ragged(np.log(self.buffer + EPS_VAL), self.shapes)
+
+    def softmax(self):
+        """
+        Returns a new ``Ragged`` in which the softmax function is applied to each array, over its leading dimension (see ``maths.softmax``).
+        If all the arrays are vectors, this is computed in one pass over the buffer.
+        """
+        if self._all_vectors():
+            maxes = np.maximum.reduceat(self.buffer, self.offsets[:-1])
+            exp = np.exp(self.buffer - np.repeat(maxes, self.sizes))
+            return Ragged(exp, self.shapes).normalize()
+
+        def _softmax(arr):
+            exp = np.exp(arr - arr.max(axis=0))
+            return exp / exp.sum(axis=0)
+        return self._map_arrays(_softmax)
+
+class PolicyBeliefArray(object):
+    """
+    Dense storage for policy- and time-conditioned posterior beliefs over hidden states. Instead of nesting object arrays
+    as policy->timepoint->factor, the beliefs about each hidden state factor ``f`` are stored in a single contiguous ``numpy.ndarray``
+    of shape ``(num_policies, num_timesteps, num_states[f])``.
+
+    Indexing is compatible with the old nested layout, so ``beliefs[p_idx][t_idx][f_idx]`` still refers to the marginal belief about factor ``f_idx``
+    at timepoint ``t_idx`` under policy ``p_idx``. Indexing or slicing the leading (policy and time) dimensions returns another ``PolicyBeliefArray``
+    that is a view onto the same memory. Once all leading dimensions have been indexed away, an object array of per-factor views is returned.
+    """
+
+    def __init__(self, factor_arrays):
+        """
+        Parameters
+        ----------
+        factor_arrays: ``list`` of ``numpy.ndarray``
+            One array per hidden state factor. All arrays must share the same leading (batch) dimensions, and differ only in their last dimension,
+            which stores the hidden state levels of the corresponding factor.
+        """
+        self.factor_arrays = list(factor_arrays)
+
+    @classmethod
+    def uniform(cls, num_policies, num_timesteps, num_states):
+        """
+        Creates a ``PolicyBeliefArray`` of shape ``(num_policies, num_timesteps)`` filled with uniform Categorical distributions
+        """
+        return cls([np.full((num_policies, num_timesteps, ns), 1.0 / ns) for ns in num_states])
+
+    @classmethod
+    def tile(cls, qs, num_policies):
+        """
+        Creates a ``PolicyBeliefArray`` of shape ``(num_policies,)`` where every policy is assigned a copy of the marginal beliefs ``qs``
+        """
+        return cls([np.tile(qs_f, (num_policies, 1)) for qs_f in qs])
+
+    @classmethod
+    def from_obj_array(cls, qs_seq_pi):
+        """
+        Converts nested object arrays with indexing structure policy->timepoint->factor into a ``PolicyBeliefArray``
+        """
+        num_factors = len(qs_seq_pi[0][0])
+        return cls([np.array([[qs_t[f] for qs_t in qs_p] for qs_p in qs_seq_pi]) for f in range(num_factors)])
+
+    @property
+    def num_factors(self):
+        return len(self.factor_arrays)
+
+    @property
+    def num_states(self):
+        return [arr.shape[-1] for arr in self.factor_arrays]
+
+    @property
+    def shape(self):
+        """ The leading (batch) dimensions shared by all factors, e.g. ``(num_policies, num_timesteps)`` """
+        return self.factor_arrays[0].shape[:-1]
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
+
+    def __getitem__(self, key):
+        indexed = [arr[key] for arr in self.factor_arrays]
+        if indexed[0].ndim == 1:
+            return obj_array_from_list(indexed)
+        return PolicyBeliefArray(indexed)
+
+    def copy(self):
+        return PolicyBeliefArray([arr.copy() for arr in self.factor_arrays])
+
+    def to_obj_array(self):
+        """
+        Converts back to the nested object array layout (with one level of nesting per leading dimension), copying the underlying data.
+        """
+        out = obj_array(len(self))
+        for idx in range(len(self)):
+            sub = self[idx]
+            out[idx] = sub.to_obj_array() if isinstance(sub, PolicyBeliefArray) else obj_array_from_list([arr.copy() for arr in sub])
+        return out
+
+class BeliefHistory(object):
+    """
+    Fixed-size store of a history of posterior beliefs over hidden states, e.g. the ``qs`` returned by ``Agent.infer_states`` at each timestep.
+    Rather than keeping a growing list of object arrays, the beliefs about each hidden state factor ``f`` are written into a preallocated
+    ``numpy.ndarray`` of shape ``(maxlen,) + max_shapes[f]``, which is used as a ring buffer, so that only the latest ``maxlen`` entries are retained.
+    Entries may be smaller than ``max_shapes`` (e.g. the policy-conditioned beliefs of MMP, whose temporal window grows until the inference horizon is reached),
+    in which case the shape of each entry is recorded and restored on access.
+
+    Optionally, the buffers can be backed by memory-mapped ``.npy`` files in a directory, so that e.g. a whole episode can be recorded without growing memory use.
+
+    Indexing follows a list of the retained entries, so ``history[0]`` is the oldest retained entry and ``history[-1]`` the latest one.
+    Entries are returned as copies, in the format they were appended in (``numpy.ndarray`` of dtype object or ``PolicyBeliefArray``).
+    """
+
+    def __init__(self, max_shapes, maxlen=None, memmap_dir=None):
+        """
+        Parameters
+        ----------
+        max_shapes: ``list`` of ``tuple``
+            The (maximum) shape of the beliefs about each hidden state factor, e.g. ``[(num_states[f],) for f in range(num_factors)]`` for marginal beliefs,
+            or ``(num_policies, num_timesteps, num_states[f])`` for policy-conditioned beliefs
+        maxlen: ``int``, default ``None``
+            Retention length, i.e. the number of (latest) entries to keep. If ``None``, the history is unbounded, and the buffers are grown
+            (by doubling their size) as needed.
+        memmap_dir: ``str``, default ``None``
+            If provided, a directory in which one memory-mapped ``.npy`` file per hidden state factor is created to back the buffers. Requires ``maxlen``.
+        """
+
+        if memmap_dir is not None and maxlen is None:
+            raise ValueError("A retention length `maxlen` must be provided to back the belief history with memory-mapped files")
+
+        self.max_shapes = [tuple(shape) for shape in max_shapes]
+        self.maxlen = maxlen
+        self.memmap_dir = memmap_dir
+
+        self._start = 0
+        self._count = 0
+        self._kind = None
+        self.num_discarded = 0 # number of (oldest) entries that have been overwritten since the history was created or cleared
+        self._allocate(maxlen if maxlen is not None else 16)
+
+    def _allocate(self, capacity):
+        if self.memmap_dir is not None:
+            os.makedirs(self.memmap_dir, exist_ok=True)
+            self._buffers = [
+                np.lib.format.open_memmap(os.path.join(self.memmap_dir, f"factor_{f}.npy"), mode="w+", dtype=float, shape=(capacity,) + shape)
+                for f, shape in enumerate(self.max_shapes)
+            ]
+            self._shapes = np.lib.format.open_memmap(
+                os.path.join(self.memmap_dir, "shapes.npy"), mode="w+", dtype=np.int64, shape=(capacity, len(self.max_shapes), max(len(s) for s in self.max_shapes))
+            )
+        else:
+            self._buffers = [np.zeros((capacity,) + shape) for shape in self.max_shapes]
+            self._shapes = np.zeros((capacity, len(self.max_shapes), max(len(s) for s in self.max_shapes)), dtype=np.int64)
+
+    def _grow(self):
+        """ Doubles the capacity of an unbounded history, moving the retained entries to the front of the new buffers """
+        order = self._physical(np.arange(self._count))
+        old_buffers, old_shapes = self._buffers, self._shapes
+        self._allocate(2 * self.capacity)
+        for buf, old_buf in zip(self._buffers, old_buffers):
+            buf[:self._count] = old_buf[order]
+        self._shapes[:self._count] = old_shapes[order]
+        self._start = 0
+
+    @property
+    def capacity(self):
+        return self._shapes.shape[0]
+
+    def _physical(self, idx):
+        return (self._start + idx) % self.capacity
+
+    def append(self, qs):
+        """
+        Appends the beliefs ``qs`` (a ``numpy.ndarray`` of dtype object with one sub-array per factor, or a ``PolicyBeliefArray``) to the history,
+        overwriting the oldest entry if the retention length has been reached
+        """
+
+        if isinstance(qs, PolicyBeliefArray):
+            kind, factor_arrays = "policy", qs.factor_arrays
+        else:
+            kind, factor_arrays = "obj", [np.asarray(qs_f) for qs_f in to_obj_array(qs)]
+        if self._kind is None:
+            self._kind = kind
+
+        if self._count == self.capacity:
+            if self.maxlen is None:
+                self._grow()
+            else:
+                self._start = self._physical(1)
+                self._count -= 1
+                self.num_discarded += 1
+
+        row = self._physical(self._count)
+        for f, qs_f in enumerate(factor_arrays):
+            self._buffers[f][(row,) + tuple(slice(0, d) for d in qs_f.shape)] = qs_f
+            self._shapes[row, f, :qs_f.ndim] = qs_f.shape
+        self._count += 1
+
+    def __len__(self):
+        return self._count
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self[idx]
+
+    def __getitem__(self, idx):
+        if idx < 0:
+            idx += self._count
+        if not 0 <= idx < self._count:
+            raise IndexError("belief history index out of range")
+
+        row = self._physical(idx)
+        factor_arrays = []
+        for f, shape in enumerate(self.max_shapes):
+            entry_shape = self._shapes[row, f, :len(shape)]
+            factor_arrays.append(np.array(self._buffers[f][(row,) + tuple(slice(0, d) for d in entry_shape)]))
+
+        if self._kind == "policy":
+            return PolicyBeliefArray(factor_arrays)
+        return obj_array_from_list(factor_arrays)
+
+    def clear(self):
+        """ Removes all entries (the buffers are kept, and overwritten by subsequent entries) """
+        self._start = 0
+        self._count = 0
+        self.num_discarded = 0
+
+    def snapshot(self):
+        """
+        Returns a copy of the retained entries (in order, as one contiguous array per hidden state factor), from which the history can be restored with ``restore``
+        """
+        order = self._physical(np.arange(self._count))
+        return {
+            "buffers": [buf[order] for buf in self._buffers],
+            "shapes": self._shapes[order],
+            "kind": self._kind,
+            "num_discarded": self.num_discarded,
+        }
+
+    def restore(self, snapshot):
+        """
+        Restores the retained entries from a ``snapshot``, writing them into the existing buffers (growing them, if the history is unbounded and they are too small)
+        """
+        count = snapshot["shapes"].shape[0]
+        if self.maxlen is None:
+            while self.capacity < count:
+                self._allocate(2 * self.capacity)
+        elif count > self.capacity:
+            raise ValueError("The snapshot holds more entries than the retention length of the belief history")
+
+        for buf, snap_buf in zip(self._buffers, snapshot["buffers"]):
+            buf[:count] = snap_buf
+        self._shapes[:count] = snapshot["shapes"]
+        self._start = 0
+        self._count = count
+        self.num_discarded = snapshot.get("num_discarded", 0)
+        self._kind = snapshot["kind"]
+
 def build_xn_vn_array(xn):
 
     """
@@ -548,30 +1037,16 @@ def build_xn_vn_array(xn):
 
 def plot_beliefs(belief_dist, title=""):
     """
-    Utility function that plots a bar chart of a categorical probability distribution,
-    with each bar height corresponding to the probability of one of the elements of the categorical
-    probability vector.
+    Utility function that plots a bar chart of a categorical probability distribution (see ``viz.plot_beliefs``). 
+    The plotting libraries are only imported when this function is called.
     """
+    from pymdp import viz
+    viz.plot_beliefs(belief_dist, title=title)
 
-    plt.grid(zorder=0)
-    plt.bar(range(belief_dist.shape[0]), belief_dist, color='r', zorder=3)
-    plt.xticks(range(belief_dist.shape[0]))
-    plt.title(title)
-    plt.show()
-    
 def plot_likelihood(A, title=""):
     """
-    Utility function that shows a heatmap of a 2-D likelihood (hidden causes in the columns, observations in the rows),
-    with hotter colors indicating higher probability.
+    Utility function that shows a heatmap of a 2-D likelihood (see ``viz.plot_likelihood``).
+    The plotting libraries are only imported when this function is called.
     """
-
-    ax = sns.heatmap(A, cmap="OrRd", linewidth=2.5)
-    plt.xticks(range(A.shape[1]+1))
-    plt.yticks(range(A.shape[0]+1))
-    plt.title(title)
-    plt.show()
-
-
-    
-   
-
+    from pymdp import viz
+    viz.plot_likelihood(A, title=title)
@@ -0,0 +1,450 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Vectorized Agent Class
+
+__author__: Conor Heins, Alexander Tschantz, Daphne Demekas, Brennan Klein
+
+"""
+
+import numpy as np
+from pymdp import control, utils
+from pymdp.maths import spm_log_single
+
+_STATE_LABELS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+def _labels(factor_idx):
+    """ Returns the einsum subscripts of the hidden state factors in ``factor_idx`` """
+    return "".join(_STATE_LABELS[f] for f in factor_idx)
+
+def _softmax_rows(X, axis=-1):
+    """ Softmax along ``axis`` (the last one by default), computed separately for every other index """
+    X = X - X.max(axis=axis, keepdims=True)
+    X = np.exp(X)
+    return X / X.sum(axis=axis, keepdims=True)
+
+def _select_highest_rows(X):
+    """
+    Batched version of ``control.select_highest``: returns the index of the highest value in each row of ``X``, choosing
+    uniformly at random among the entries that are within ``1e-8`` of the maximum
+    """
+    is_max = np.abs(X - X.max(axis=1, keepdims=True)) <= 1e-8
+    num_max = is_max.sum(axis=1)
+    choice = np.where(num_max > 1, np.floor(np.random.rand(X.shape[0]) * num_max), 0).astype(int)
+    return (np.cumsum(is_max, axis=1) <= choice[:, None]).sum(axis=1)
+
+def _sample_rows(P):
+    """ Batched version of ``utils.sample``: draws one sample from each row of ``P`` """
+    u = np.random.rand(P.shape[0], 1)
+    return np.minimum((u > np.cumsum(P, axis=1)).sum(axis=1), P.shape[1] - 1)
+
+class VectorAgent(object):
+    """
+    A population of ``num_agents`` agents that share the dimensions of their generative model, and are updated together in vectorized
+    operations. Beliefs about each hidden state factor ``f`` are stored as a single array of shape ``(num_agents, num_states[f])``.
+
+    The ``A``, ``B`` and ``C`` arrays can be shared across agents (with the same shapes as for ``Agent``), or given per agent, with an additional
+    leading dimension of size ``num_agents`` (e.g. ``A[m]`` of shape ``(num_agents, num_obs[m], ...)``). This is decided separately for each sub-array.
+    Likewise, ``D[f]`` can be of shape ``(num_states[f],)`` or ``(num_agents, num_states[f])``, and ``E`` of shape ``(num_policies,)`` or ``(num_agents, num_policies)``.
+
+    The semantics of ``infer_states``, ``infer_policies`` and ``sample_action`` are those of ``num_agents`` independent ``Agent`` instances with
+    ``inference_algo = "VANILLA"``, i.e. fixed-point iteration for state inference and expected free energy (expected utility and state information gain)
+    for policy inference. Learning, parameter information gain, inductive and sophisticated inference are not supported.
+
+    The basic usage is as follows:
+
+    >>> agents = VectorAgent(A = A, B = B, num_agents = 100, <more_params>)
+    >>> observations = env.step(initial_actions) # array of shape (num_agents, num_modalities)
+    >>> qs = agents.infer_states(observations)
+    >>> q_pi, G = agents.infer_policies()
+    >>> next_actions = agents.sample_action() # array of shape (num_agents, num_factors)
+    """
+
+    def __init__(
+        self,
+        A,
+        B,
+        num_agents,
+        C=None,
+        D=None,
+        E=None,
+        policy_len=1,
+        control_fac_idx=None,
+        policies=None,
+        gamma=16.0,
+        alpha=16.0,
+        use_utility=True,
+        use_states_info_gain=True,
+        action_selection="deterministic",
+        sampling_mode="marginal",
+        inference_params=None,
+        A_factor_list=None,
+        B_factor_list=None,
+    ):
+
+        self.num_agents = num_agents
+        self.policy_len = policy_len
+        self.gamma = gamma
+        self.alpha = alpha
+        self.use_utility = use_utility
+        self.use_states_info_gain = use_states_info_gain
+        self.action_selection = action_selection
+        self.sampling_mode = sampling_mode
+
+        if not isinstance(A, np.ndarray) or not isinstance(B, np.ndarray):
+            raise TypeError(
+                'A and B matrices must be numpy arrays'
+            )
+
+        self.A = utils.to_obj_array(A)
+        self.B = utils.to_obj_array(B)
+        self.num_modalities = len(self.A)
+        self.num_factors = len(self.B)
+
+        # transition model: `B[f]` is per-agent if it has one more dimension than its dependencies (and the control states) require
+        self.B_factor_list = [[f] for f in range(self.num_factors)] if B_factor_list is None else B_factor_list
+        self.B_batched = [B_f.ndim == len(self.B_factor_list[f]) + 3 for f, B_f in enumerate(self.B)]
+        self.num_states = [B_f.shape[int(batched)] for B_f, batched in zip(self.B, self.B_batched)]
+        self.num_controls = [B_f.shape[-1] for B_f in self.B]
+
+        for f, B_f in enumerate(self.B):
+            factor_dims = tuple([self.num_states[g] for g in self.B_factor_list[f]])
+            assert B_f.shape[(1 + int(self.B_batched[f])):-1] == factor_dims, f"Check factor {f} of B_factor_list. It must coincide with all-but-final lagging dimensions of B{f}..."
+            assert not self.B_batched[f] or B_f.shape[0] == num_agents, f"Leading dimension of per-agent B{f} must be equal to `num_agents`"
+            assert np.allclose(B_f.sum(axis=int(self.B_batched[f])), 1.0), "B matrix is not normalized (i.e. B[f].sum(axis = 0) must all equal 1.0 for all factors)"
+
+        # observation model: `A[m]` is per-agent if it has one more dimension than its dependencies require
+        self.A_factor_list = self.num_modalities * [list(range(self.num_factors))] if A_factor_list is None else A_factor_list
+        self.A_batched = [A_m.ndim == len(self.A_factor_list[m]) + 2 for m, A_m in enumerate(self.A)]
+        self.num_obs = [A_m.shape[int(batched)] for A_m, batched in zip(self.A, self.A_batched)]
+
+        for m, A_m in enumerate(self.A):
+            factor_dims = tuple([self.num_states[f] for f in self.A_factor_list[m]])
+            assert A_m.shape[(1 + int(self.A_batched[m])):] == factor_dims, f"Check modality {m} of A_factor_list. It must coincide with lagging dimensions of A{m}..."
+            assert not self.A_batched[m] or A_m.shape[0] == num_agents, f"Leading dimension of per-agent A{m} must be equal to `num_agents`"
+            assert np.allclose(A_m.sum(axis=int(self.A_batched[m])), 1.0), "A matrix is not normalized (i.e. A[m].sum(axis = 0) must all equal 1.0 for all modalities)"
+
+        self.A_modality_list = [[m for m in range(self.num_modalities) if f in self.A_factor_list[m]] for f in range(self.num_factors)]
+
+        if control_fac_idx is None:
+            self.control_fac_idx = [f for f in range(self.num_factors) if self.num_controls[f] > 1]
+        else:
+            self.control_fac_idx = control_fac_idx
+
+        if policies is None:
+            policies = control.construct_policies(self.num_states, self.num_controls, self.policy_len, self.control_fac_idx)
+        self.policies = policies
+        self.policy_array = np.stack(self.policies).astype(int) # (num_policies, policy_len, num_factors)
+
+        assert self.policy_array.shape[2] == self.num_factors, "Number of control states is not consistent with policy dimensionalities"
+
+        # prior preferences, per modality either shared (num_obs[m],) or per-agent (num_agents, num_obs[m])
+        if C is not None:
+            self.C = utils.to_obj_array(C)
+            assert len(self.C) == self.num_modalities, f"Check C vector: number of sub-arrays must be equal to number of observation modalities: {self.num_modalities}"
+        else:
+            self.C = utils.obj_array_zeros(self.num_obs)
+
+        # prior over initial hidden states, stored per agent
+        if D is not None:
+            D = utils.to_obj_array(D)
+            self.D = utils.obj_array_from_list([np.broadcast_to(D_f, (num_agents, ns)).copy() for D_f, ns in zip(D, self.num_states)])
+        else:
+            self.D = utils.obj_array_from_list([np.full((num_agents, ns), 1.0 / ns) for ns in self.num_states])
+
+        assert all([np.allclose(D_f.sum(axis=1), 1.0) for D_f in self.D]), "D vector is not normalized (i.e. D[f].sum() must all equal 1.0 for all factors)"
+
+        # prior over policies, stored per agent
+        num_policies = len(self.policies)
+        self.E = np.broadcast_to(E, (num_agents, num_policies)).copy() if E is not None else np.full((num_agents, num_policies), 1.0 / num_policies)
+
+        if inference_params is None:
+            self.inference_params = {"num_iter": 10, "dF": 1.0, "dF_tol": 0.001, "compute_vfe": True}
+        else:
+            self.inference_params = inference_params
+
+        self._cache_model_terms()
+
+        self.reset()
+        self.action = None
+
+    def _cache_model_terms(self):
+        """
+        Precomputes the terms of the expected free energy that only depend on the generative model: the log preferences ``lnC``
+        and, for each modality, the negative conditional entropy ``sum_o A[o, ...] ln A[o, ...]`` used in the state information gain
+        """
+
+        self.lnC = utils.obj_array(self.num_modalities)
+        for m, C_m in enumerate(self.C):
+            self.lnC[m] = spm_log_single(_softmax_rows(C_m))
+
+        self.A_negH = utils.obj_array(self.num_modalities)
+        for m, A_m in enumerate(self.A):
+            self.A_negH[m] = (A_m * np.log(A_m + np.exp(-16))).sum(axis=int(self.A_batched[m]))
+
+    def reset(self, init_qs=None):
+        """
+        Resets the posterior beliefs about hidden states of all agents to uniform distributions, and resets time to the first timestep.
+
+        Returns
+        ---------
+        qs: ``numpy.ndarray`` of dtype object
+            Initialized posterior over hidden states, one array of shape ``(num_agents, num_states[f])`` per factor
+        """
+
+        self.curr_timestep = 0
+
+        if init_qs is None:
+            self.qs = utils.obj_array_from_list([np.full((self.num_agents, ns), 1.0 / ns) for ns in self.num_states])
+        else:
+            self.qs = init_qs
+
+        return self.qs
+
+    def step_time(self):
+        """
+        Advances time by one step
+        """
+
+        self.curr_timestep += 1
+
+        return self.curr_timestep
+
+    def get_expected_states(self, qs, actions):
+        """
+        Batched version of ``control.get_expected_states_interactions`` (for a single timestep), where each agent takes its own action.
+
+        Parameters
+        ----------
+        qs: ``numpy.ndarray`` of dtype object
+            Beliefs over hidden states, one array of shape ``(num_agents, num_states[f])`` per factor
+        actions: 2D ``numpy.ndarray``
+            Actions of each agent, of shape ``(num_agents, num_factors)``
+
+        Returns
+        ----------
+        qs_next: ``numpy.ndarray`` of dtype object
+            Predicted beliefs over hidden states at the next timestep, one array of shape ``(num_agents, num_states[f])`` per factor
+        """
+
+        actions = actions.astype(int)
+        agent_idx = np.arange(self.num_agents)
+
+        qs_next = utils.obj_array(self.num_factors)
+        for f, B_f in enumerate(self.B):
+            parents = self.B_factor_list[f]
+            if self.B_batched[f]:
+                B_u = B_f[agent_idx, ..., actions[:, f]] # (num_agents, num_states[f], parents...)
+            else:
+                B_u = np.moveaxis(B_f[..., actions[:, f]], -1, 0)
+            subscripts = "nz" + _labels(parents) + "," + ",".join("n" + _labels([g]) for g in parents) + "->nz"
+            qs_next[f] = np.einsum(subscripts, B_u, *[qs[g] for g in parents])
+
+        return qs_next
+
+    def infer_states(self, observations, distr_obs=False):
+        """
+        Update the approximate posteriors over hidden states of all agents, given one observation per agent,
+        using fixed-point iteration (as ``algos.fpi.run_vanilla_fpi_factorized``, separately for each agent)
+
+        Parameters
+        ----------
+        observations: 2D ``numpy.ndarray`` or ``list``
+            The observations of each agent, of shape ``(num_agents, num_modalities)``, where ``observations[n, m]`` stores the index of the discrete
+            observation of agent ``n`` for modality ``m``. If ``distr_obs`` is True, this should instead be a ``list`` with one array of shape
+            ``(num_agents, num_obs[m])`` per modality, storing distributions over observations.
+        distr_obs: ``bool``
+            Whether the observations are distributions over possible observations, rather than single observations.
+
+        Returns
+        ---------
+        qs: ``numpy.ndarray`` of dtype object
+            Posterior beliefs over hidden states, one array of shape ``(num_agents, num_states[f])`` per factor
+        """
+
+        if self.action is not None:
+            empirical_prior = self.get_expected_states(self.qs, self.action)
+        else:
+            empirical_prior = self.D
+
+        # log likelihood of each agent's observation, for each modality: arrays of shape (num_agents, *num_states[A_factor_list[m]])
+        agent_idx = np.arange(self.num_agents)
+        log_likelihood = utils.obj_array(self.num_modalities)
+        if not distr_obs:
+            observations = np.asarray(observations, dtype=int).reshape(self.num_agents, self.num_modalities)
+        for m, A_m in enumerate(self.A):
+            if distr_obs:
+                obs_m = np.asarray(observations[m])
+                subscripts = "o..." if not self.A_batched[m] else "no..."
+                lh_m = np.einsum(subscripts + ",no->n...", A_m, obs_m)
+            elif self.A_batched[m]:
+                lh_m = A_m[agent_idx, observations[:, m]]
+            else:
+                lh_m = A_m[observations[:, m]]
+            log_likelihood[m] = spm_log_single(lh_m)
+
+        log_prior = utils.obj_array_from_list([spm_log_single(prior_f) for prior_f in empirical_prior])
+
+        if self.num_factors == 1:
+            qL = sum(log_likelihood[m] for m in range(self.num_modalities))
+            qs = utils.obj_array_from_list([_softmax_rows(qL + log_prior[0])])
+        else:
+            qs = self._run_fpi(log_likelihood, log_prior, **self.inference_params)
+
+        self.qs = qs
+
+        return qs
+
+    def _run_fpi(self, log_likelihood, log_prior, num_iter=10, dF=1.0, dF_tol=0.001, compute_vfe=True):
+        """
+        Fixed-point iteration for all agents at once. Agents whose free energy has converged stop being updated, as in ``algos.fpi.run_vanilla_fpi_factorized``.
+        """
+
+        N = self.num_agents
+        qs = [np.full((N, ns), 1.0 / ns) for ns in self.num_states]
+
+        # joint log likelihood over all hidden state factors, used to compute the accuracy term of the free energy
+        all_labels = _labels(range(self.num_factors))
+        joint_loglikelihood = np.zeros((N,) + tuple(self.num_states))
+        for m in range(self.num_modalities):
+            reshape_dims = [N] + self.num_factors * [1]
+            for f in self.A_factor_list[m]:
+                reshape_dims[1 + f] = self.num_states[f]
+            joint_loglikelihood += log_likelihood[m].reshape(reshape_dims)
+
+        def free_energy(qs_active, active, with_accuracy):
+            vfe = np.zeros(len(active))
+            for f in range(self.num_factors):
+                vfe += (qs_active[f] * np.log(qs_active[f] + 1e-16)).sum(axis=1) - (qs_active[f] * log_prior[f][active]).sum(axis=1)
+            if with_accuracy:
+                subscripts = "n" + all_labels + "," + ",".join("n" + _labels([f]) for f in range(self.num_factors)) + "->n"
+                vfe -= np.einsum(subscripts, joint_loglikelihood[active], *qs_active)
+            return vfe
+
+        all_agents = np.arange(N)
+        prev_vfe = free_energy(qs, all_agents, False)
+        dF = np.full(N, dF)
+        curr_iter = 0
+
+        active = all_agents
+        while curr_iter < num_iter:
+            if compute_vfe:
+                active = all_agents[dF >= dF_tol]
+                if len(active) == 0:
+                    break
+
+            qs_active = [qs_f[active] for qs_f in qs]
+            qs_new = []
+            for f in range(self.num_factors):
+                qL = np.zeros((len(active), self.num_states[f]))
+                for m in self.A_modality_list[f]:
+                    factors_m = self.A_factor_list[m]
+                    others = [g for g in factors_m if g != f]
+                    subscripts = "n" + _labels(factors_m) + "".join("," + "n" + _labels([g]) for g in others) + "->n" + _labels([f])
+                    qL += np.einsum(subscripts, log_likelihood[m][active], *[qs_active[g] for g in others])
+                qs_new.append(_softmax_rows(qL + log_prior[f][active]))
+
+            for f in range(self.num_factors):
+                qs[f][active] = qs_new[f]
+
+            if compute_vfe:
+                vfe = free_energy(qs_new, active, True)
+                dF[active] = np.abs(prev_vfe[active] - vfe)
+                prev_vfe[active] = vfe
+
+            curr_iter += 1
+
+        return utils.obj_array_from_list(qs)
+
+    def infer_policies(self):
+        """
+        Perform policy inference for all agents, by computing the (negative) expected free energy of each policy under the current beliefs
+        of each agent, as in ``control.update_posterior_policies_factorized``
+
+        Returns
+        ----------
+        q_pi: 2D ``numpy.ndarray``
+            Posterior beliefs over policies of each agent, of shape ``(num_agents, num_policies)``.
+        G: 2D ``numpy.ndarray``
+            Negative expected free energies of each policy for each agent, of shape ``(num_agents, num_policies)``.
+        """
+
+        N, P = self.num_agents, len(self.policies)
+
+        # predictive beliefs over hidden states for all agents and policies: arrays of shape (num_agents, num_policies, num_states[f])
+        qs_pi_t = [np.broadcast_to(qs_f[:, None, :], (N, P, qs_f.shape[1])) for qs_f in self.qs]
+
+        G = np.zeros((N, P))
+        for t in range(self.policy_len):
+
+            qs_next = []
+            for f, B_f in enumerate(self.B):
+                parents = self.B_factor_list[f]
+                B_u = B_f[..., self.policy_array[:, t, f]] # (..., num_policies)
+                prefix = "n" if self.B_batched[f] else ""
+                subscripts = prefix + "z" + _labels(parents) + "p," + ",".join("np" + _labels([g]) for g in parents) + "->npz"
+                qs_next.append(np.einsum(subscripts, B_u, *[qs_pi_t[g] for g in parents]))
+            qs_pi_t = qs_next
+
+            for m, A_m in enumerate(self.A):
+                factors_m = self.A_factor_list[m]
+                prefix = "n" if self.A_batched[m] else ""
+                q_subscripts = ",".join("np" + _labels([f]) for f in factors_m)
+                q_factors = [qs_pi_t[f] for f in factors_m]
+
+                if self.use_utility:
+                    qo = np.einsum(prefix + "o" + _labels(factors_m) + "," + q_subscripts + "->npo", A_m, *q_factors)
+                    lnC = self.lnC[m] if self.lnC[m].ndim == 1 else self.lnC[m][:, None, :]
+                    G += (qo * lnC).sum(axis=-1)
+
+                if self.use_states_info_gain:
+                    # states whose predictive probability is below exp(-16) are ignored, as in `maths.spm_MDP_G`
+                    qx = np.einsum(q_subscripts + "->np" + _labels(factors_m), *q_factors)
+                    qx = qx * (qx > np.exp(-16))
+                    G += np.einsum(prefix + _labels(factors_m) + ",np" + _labels(factors_m) + "->np", self.A_negH[m], qx)
+                    qo = np.einsum(prefix + "o" + _labels(factors_m) + ",np" + _labels(factors_m) + "->npo", A_m, qx)
+                    G -= (qo * spm_log_single(qo)).sum(axis=-1)
+
+        q_pi = _softmax_rows(G * self.gamma + spm_log_single(self.E))
+
+        self.q_pi = q_pi
+        self.G = G
+        return q_pi, G
+
+    def sample_action(self):
+        """
+        Sample or select a discrete action for each agent from its posterior over control states, and advance time by one step.
+
+        Returns
+        ----------
+        action: 2D ``numpy.ndarray``
+            Matrix of shape ``(num_agents, num_factors)`` containing the indices of the actions of each agent, for each control factor
+        """
+
+        N = self.num_agents
+        action = np.zeros((N, self.num_factors))
+
+        if self.sampling_mode == "marginal":
+            for f in range(self.num_factors):
+                # marginal posterior over the actions of control factor `f`, obtained by summing the probabilities of the policies that start with each action
+                policy_to_action = np.zeros((len(self.policies), self.num_controls[f]))
+                policy_to_action[np.arange(len(self.policies)), self.policy_array[:, 0, f]] = 1.0
+                action_marginals = self.q_pi.dot(policy_to_action)
+                action_marginals = action_marginals / action_marginals.sum(axis=1, keepdims=True)
+
+                if self.action_selection == "deterministic":
+                    action[:, f] = _select_highest_rows(action_marginals)
+                elif self.action_selection == "stochastic":
+                    action[:, f] = _sample_rows(_softmax_rows(spm_log_single(action_marginals) * self.alpha))
+        elif self.sampling_mode == "full":
+            if self.action_selection == "deterministic":
+                policy_idx = _select_highest_rows(self.q_pi)
+            elif self.action_selection == "stochastic":
+                policy_idx = _sample_rows(_softmax_rows(spm_log_single(self.q_pi) * self.alpha))
+            action[:] = self.policy_array[policy_idx, 0, :]
+
+        self.action = action
+
+        self.step_time()
+
+        return action
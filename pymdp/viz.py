@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Plotting functions for beliefs, likelihoods and environments
+
+Unlike the rest of the package, this module depends on ``matplotlib`` and ``seaborn``. It is not imported by ``import pymdp``, so that the
+(slow) import of the plotting libraries is only paid for by code that actually plots something, e.g. through ``pymdp.viz.plot_beliefs``.
+
+__author__: Conor Heins, Alexander Tschantz, Daphne Demekas, Brennan Klein
+
+"""
+
+import numpy as np
+import matplotlib.pyplot as plt
+import seaborn as sns
+
+def plot_beliefs(belief_dist, title=""):
+    """
+    Utility function that plots a bar chart of a categorical probability distribution,
+    with each bar height corresponding to the probability of one of the elements of the categorical
+    probability vector.
+    """
+
+    plt.grid(zorder=0)
+    plt.bar(range(belief_dist.shape[0]), belief_dist, color='r', zorder=3)
+    plt.xticks(range(belief_dist.shape[0]))
+    plt.title(title)
+    plt.show()
+
+def plot_likelihood(A, title=""):
+    """
+    Utility function that shows a heatmap of a 2-D likelihood (hidden causes in the columns, observations in the rows),
+    with hotter colors indicating higher probability.
+    """
+
+    ax = sns.heatmap(A, cmap="OrRd", linewidth=2.5)
+    plt.xticks(range(A.shape[1]+1))
+    plt.yticks(range(A.shape[0]+1))
+    plt.title(title)
+    plt.show()
+
+def plot_grid_position(shape, position, title=None):
+    """
+    Utility function that shows a heatmap of a 2-D grid of shape ``shape``, in which only the cell at ``position`` is highlighted
+    (used by the ``render`` methods of the grid world environments).
+    """
+
+    values = np.zeros(shape)
+    values[position] = 1.0
+    _, ax = plt.subplots(figsize=(3, 3))
+    if shape[0] == 1 or shape[1] == 1:
+        ax.imshow(values, cmap="OrRd")
+    else:
+        _ = sns.heatmap(values, cmap="OrRd", linewidth=2.5, cbar=False, ax=ax)
+    plt.xticks(range(shape[1]))
+    plt.yticks(range(shape[0]))
+    if title != None:
+        plt.title(title)
+    plt.show()
@@ -198,8 +198,419 @@ class TestAgent(unittest.TestCase):
             agent.infer_policies()
             action = agent.sample_action()
         
-        self.assertEqual(len(agent.prev_obs), T)
-        self.assertEqual(len(agent.prev_actions), T)
+        # only the observations and actions within the inference horizon are kept
+        self.assertEqual(len(agent.prev_obs), agent.inference_horizon)
+        self.assertEqual(len(agent.prev_actions), agent.inference_horizon)
+
+    def test_vmp_active_inference(self):
+        """
+        Tests to make sure whole active inference loop works when using variational message passing (``inference_algo = "VMP"``)
+        """
+
+        num_obs = [3, 2]
+        num_states = [4, 3]
+        num_controls = [1, 3]
+        A = utils.random_A_matrix(num_obs, num_states)
+        B = utils.random_B_matrix(num_states, num_controls)
+
+        C = utils.obj_array_zeros(num_obs)
+        C[1][0] = 1.0  
+        C[1][1] = -2.0  
+
+        agent = Agent(A=A, B=B, C=C, control_fac_idx=[1], inference_algo="VMP", policy_len=2, inference_horizon=3)
+
+        T = 10
+
+        for t in range(T):
+
+            o = [np.random.randint(num_ob) for num_ob in num_obs] # just randomly generate observations at each timestep, no generative process
+            qx = agent.infer_states(o)
+            q_pi, _ = agent.infer_policies()
+            action = agent.sample_action()
+
+            self.assertTrue(np.allclose(q_pi.sum(), 1.0))
+            for f in range(len(num_states)):
+                self.assertTrue(np.allclose(agent.latest_belief[f].sum(), 1.0))
+        
+        # only the observations and actions within the inference horizon are kept
+        self.assertEqual(len(agent.prev_obs), agent.inference_horizon)
+        self.assertEqual(len(agent.prev_actions), agent.inference_horizon)
+
+    def test_agent_step(self):
+        """
+        Tests that the fused ``Agent.step`` method gives the same beliefs and actions as calling ``infer_states``, ``infer_policies``
+        and ``sample_action`` in sequence, both when the predictive beliefs are reused (VANILLA) and when they are not (MMP)
+        """
+
+        num_obs = [3, 4]
+        num_states = [3, 2, 3]
+        num_controls = [2, 1, 3]
+        A_factor_list = [[0, 1], [1, 2]]
+        B_factor_list = [[0, 2], [1], [2]]
+
+        A = utils.random_A_matrix(num_obs, num_states, A_factor_list=A_factor_list)
+        B = utils.random_B_matrix(num_states, num_controls, B_factor_list=B_factor_list)
+        C = utils.obj_array_zeros(num_obs)
+        C[1][0] = 1.0
+
+        for inference_algo, policy_len in [("VANILLA", 2), ("MMP", 1)]:
+
+            agent_kwargs = dict(A=A, B=B, C=C, A_factor_list=A_factor_list, B_factor_list=B_factor_list, policy_len=policy_len,
+                                inference_algo=inference_algo, action_selection="deterministic", save_belief_hist=True)
+            agent_step = Agent(**agent_kwargs)
+            agent_loop = Agent(**agent_kwargs)
+
+            T = 6
+            for t in range(T):
+                o = [np.random.randint(num_ob) for num_ob in num_obs]
+
+                np.random.seed(t) # ties between actions are broken at random
+                action_step = agent_step.step(o)
+
+                np.random.seed(t)
+                agent_loop.infer_states(o)
+                agent_loop.infer_policies()
+                action_loop = agent_loop.sample_action()
+
+                self.assertTrue(np.array_equal(action_step, action_loop))
+                self.assertTrue(np.allclose(agent_step.q_pi, agent_loop.q_pi))
+                if inference_algo == "VANILLA":
+                    for f in range(len(num_states)):
+                        self.assertTrue(np.allclose(agent_step.qs[f], agent_loop.qs[f]))
+
+            self.assertEqual(len(agent_step.qs_hist), T)
+            self.assertEqual(agent_step.curr_timestep, agent_loop.curr_timestep)
+
+    def test_agent_bounded_belief_hist(self):
+        """
+        Tests that the belief history of the agent only retains the latest ``belief_hist_len`` timesteps
+        """
+
+        num_obs = [3, 2]
+        num_states = [4, 3]
+        num_controls = [1, 3]
+        A = utils.random_A_matrix(num_obs, num_states)
+        B = utils.random_B_matrix(num_states, num_controls)
+
+        for inference_algo, inference_horizon in [("VANILLA", 1), ("MMP", 3)]:
+            agent = Agent(A=A, B=B, control_fac_idx=[1], inference_algo=inference_algo, policy_len=2, inference_horizon=inference_horizon,
+                          save_belief_hist=True, belief_hist_len=4)
+
+            T = 10
+            for t in range(T):
+                o = [np.random.randint(num_ob) for num_ob in num_obs]
+                qs = agent.infer_states(o)
+                agent.infer_policies()
+                agent.sample_action()
+
+                self.assertEqual(len(agent.qs_hist), min(t + 1, 4))
+                for f in range(len(num_states)):
+                    latest = agent.qs_hist[-1]
+                    latest_f = latest[f] if inference_algo == "VANILLA" else latest.factor_arrays[f]
+                    qs_f = qs[f] if inference_algo == "VANILLA" else qs.factor_arrays[f]
+                    self.assertTrue(np.allclose(latest_f, qs_f))
+
+                # the posteriors over policies are bounded in the same way, but those within the inference horizon are always kept
+                self.assertEqual(len(agent.q_pi_hist), min(t + 1, max(4, inference_horizon + 1)))
+
+        # without a retention length, the whole histories are kept
+        agent = Agent(A=A, B=B, control_fac_idx=[1], save_belief_hist=True)
+        for t in range(6):
+            agent.infer_states([0, 1])
+            agent.infer_policies()
+            agent.sample_action()
+        self.assertEqual(len(agent.qs_hist), 6)
+        self.assertEqual(len(agent.q_pi_hist), 6)
+
+    def test_agent_update_D_from_belief_hist(self):
+        """
+        Tests that ``update_D`` learns from the beliefs at the first timepoint of the belief history, and fails (rather than learning from other beliefs)
+        when they are not available
+        """
+
+        num_obs = [3]
+        num_states = [3]
+        A = utils.obj_array_from_list([np.eye(3)])
+        B = utils.random_B_matrix(num_states, [2])
+        pD = utils.dirichlet_like(utils.obj_array_uniform(num_states))
+
+        for belief_hist_len in [None, 2]:
+            agent = Agent(A=A, B=B, pD=pD, save_belief_hist=True, belief_hist_len=belief_hist_len)
+            for obs in [[2], [0], [1]]:
+                agent.infer_states(obs)
+                agent.infer_policies()
+                agent.sample_action()
+
+            if belief_hist_len is None:
+                qD = agent.update_D()
+                self.assertTrue(np.allclose(qD[0], pD[0] + utils.onehot(2, 3)))
+            else:
+                with self.assertRaises(ValueError):
+                    agent.update_D()
+
+        with self.assertRaises(ValueError):
+            Agent(A=A, B=B, pD=pD).update_D()
+
+    def test_agent_snapshot_restore(self):
+        """
+        Tests that restoring a snapshot of an agent (including learned parameters and belief histories) reproduces the
+        trajectory that followed the snapshot, and that the model arrays are shared rather than copied by the snapshot
+        """
+
+        num_obs = [3, 2]
+        num_states = [4, 3]
+        num_controls = [2, 3]
+        A = utils.random_A_matrix(num_obs, num_states)
+        B = utils.random_B_matrix(num_states, num_controls)
+        C = utils.obj_array_from_list([np.random.randn(no) for no in num_obs])
+        pA = utils.dirichlet_like(A, scale=1.0)
+
+        observations = [[np.random.randint(num_ob) for num_ob in num_obs] for _ in range(6)]
+
+        for inference_algo, inference_horizon in [("VANILLA", 1), ("MMP", 2)]:
+            agent = Agent(A=A, B=B, C=C, pA=pA, inference_algo=inference_algo, policy_len=2, inference_horizon=inference_horizon,
+                          save_belief_hist=True, belief_hist_len=4)
+
+            def run(steps):
+                actions = []
+                for t in steps:
+                    np.random.seed(t)
+                    agent.infer_states(observations[t])
+                    agent.infer_policies()
+                    actions.append(agent.sample_action())
+                    if inference_algo == "VANILLA":
+                        agent.update_A(observations[t])
+                return actions
+
+            run(range(3))
+            snapshot = agent.snapshot()
+            self.assertIs(snapshot["pA"][0], agent.pA[0])
+
+            actions = run(range(3, 6))
+            q_pi, pA_0, hist = agent.q_pi, agent.pA[0], [agent.qs_hist[i] for i in range(len(agent.qs_hist))]
+
+            for _ in range(2):
+                agent.restore(snapshot)
+                self.assertEqual(agent.curr_timestep, 3)
+                self.assertEqual(len(agent.qs_hist), 3)
+
+                actions_restored = run(range(3, 6))
+                for action, action_restored in zip(actions, actions_restored):
+                    self.assertTrue(np.array_equal(action, action_restored))
+                self.assertTrue(np.allclose(agent.q_pi, q_pi))
+                self.assertTrue(np.allclose(agent.pA[0], pA_0))
+                for qs, qs_restored in zip(hist, agent.qs_hist):
+                    qs_f = qs[0] if inference_algo == "VANILLA" else qs.factor_arrays[0]
+                    qs_restored_f = qs_restored[0] if inference_algo == "VANILLA" else qs_restored.factor_arrays[0]
+                    self.assertTrue(np.allclose(qs_f, qs_restored_f))
+
+            # learning does not modify the arrays the agent was constructed with
+            self.assertTrue(np.array_equal(pA[0], utils.dirichlet_like(A, scale=1.0)[0]))
+
+    def test_agent_deferred_learning(self):
+        """
+        Tests that an agent with a ``learning_flush_interval`` only updates its observation and transition models every ``learning_flush_interval`` timesteps,
+        on ``Agent.reset`` or on demand
+        """
+
+        num_obs = [3, 2]
+        num_states = [4, 3]
+        num_controls = [2, 3]
+        A = utils.random_A_matrix(num_obs, num_states)
+        B = utils.random_B_matrix(num_states, num_controls)
+        pA = utils.dirichlet_like(A, scale=1.0)
+        pB = utils.dirichlet_like(B, scale=1.0)
+
+        agent = Agent(A=A, B=B, pA=pA, pB=pB, save_belief_hist=True, learning_flush_interval=3)
+        pA_valid, pB_valid = utils.dirichlet_like(A, scale=1.0), utils.dirichlet_like(B, scale=1.0)
+
+        for t in range(5):
+            o = [np.random.randint(num_ob) for num_ob in num_obs]
+            agent.infer_states(o)
+            agent.infer_policies()
+            agent.sample_action()
+
+            pA_valid = learning.update_obs_likelihood_dirichlet_factorized(pA_valid, A, o, agent.qs, agent.A_factor_list)
+            agent.update_A(o)
+            if t > 0:
+                pB_valid = learning.update_state_likelihood_dirichlet_interactions(pB_valid, B, agent.action, agent.qs, agent.qs_hist[-2], agent.B_factor_list)
+                agent.update_B(agent.qs_hist[-2])
+
+            # the accumulated updates are applied after three observations (and three transitions, respectively), and are pending otherwise
+            self.assertEqual(np.allclose(agent.pA[0], pA_valid[0]), t == 2)
+            self.assertEqual(np.allclose(agent.pB[0], pB_valid[0]), t in [0, 3]) # no transitions yet at the first timestep
+            if t == 2:
+                self.assertTrue(np.allclose(agent.A[0], utils.norm_dist(pA_valid[0])))
+
+        agent.reset()
+        for m in range(len(num_obs)):
+            self.assertTrue(np.allclose(agent.pA[m], pA_valid[m]))
+            self.assertTrue(np.allclose(agent.A[m], utils.norm_dist(pA_valid[m])))
+        for f in range(len(num_states)):
+            self.assertTrue(np.allclose(agent.pB[f], pB_valid[f]))
+            self.assertTrue(np.allclose(agent.B[f], utils.norm_dist(pB_valid[f])))
+
+    def test_agent_action_major_B(self):
+        """
+        Tests that the action-major copy of ``B`` used by inference and planning stays consistent with ``B`` as it is learned (in-place, or deferred),
+        and that the predictive beliefs computed with it are unchanged
+        """
+
+        num_obs = [3, 2]
+        num_states = [4, 3]
+        num_controls = [2, 3]
+        B_factor_list = [[0, 1], [1]]
+        A = utils.random_A_matrix(num_obs, num_states)
+        B = utils.random_B_matrix(num_states, num_controls, B_factor_list=B_factor_list)
+        pB = utils.dirichlet_like(B, scale=1.0)
+
+        for inference_algo, learning_flush_interval in [("VANILLA", None), ("VANILLA", 2), ("MMP", None)]:
+            agent = Agent(A=A, B=B, pB=pB, B_factor_list=B_factor_list, inference_algo=inference_algo, learning_flush_interval=learning_flush_interval, save_belief_hist=True)
+
+            for t in range(4):
+                agent.infer_states([np.random.randint(no) for no in num_obs])
+                agent.infer_policies()
+                agent.sample_action()
+                if t > 0 and inference_algo == "VANILLA":
+                    agent.update_B(agent.qs_hist[-2])
+
+                B_by_action = agent._get_B_by_action()
+                for f in range(len(num_states)):
+                    self.assertTrue(B_by_action[f].flags.c_contiguous)
+                    for u in range(num_controls[f]):
+                        self.assertTrue(np.array_equal(B_by_action[f][u], agent.B[f][..., u]))
+
+        qs = utils.random_single_categorical(num_states)
+        B_by_action = utils.action_major(B)
+        for policy in agent.policies:
+            qs_pi = control.get_expected_states_interactions(qs, B, B_factor_list, policy)
+            qs_pi_am = control.get_expected_states_interactions(qs, B, B_factor_list, policy, B_by_action=B_by_action)
+            for f in range(len(num_states)):
+                self.assertTrue(np.allclose(qs_pi[0][f], qs_pi_am[0][f]))
+
+    def test_agent_inductive_matrices_follow_learning(self):
+        """
+        Tests that the inductive matrices ``I`` of an agent are updated when learning changes which states are reachable from each other,
+        and are left as they are otherwise
+        """
+
+        num_states = [3]
+        A = utils.obj_array_from_list([np.eye(3)])
+        B = utils.obj_array_from_list([utils.norm_dist(np.eye(3)[:, :, None] + 1e-3)])
+        pB = utils.dirichlet_like(B, scale=1.0)
+        H = utils.obj_array_from_list([utils.onehot(2, 3)])
+
+        for ii_sparse in [False, True]:
+            agent = Agent(A=A, B=B, pB=pB, H=H, ii_depth=4, ii_sparse=ii_sparse)
+            self.assertTrue(np.array_equal(agent.I[0][1:], np.tile([0.0, 0.0, 1.0], (3, 1))))
+
+            # the agent learns the transitions that chain the goal state to the second state, and the second state to the first one
+            agent.action = np.array([0])
+            for state in [1, 0]:
+                agent.qs = utils.obj_array_from_list([utils.onehot(state, 3)])
+                agent.update_B(utils.obj_array_from_list([utils.onehot(state + 1, 3)]))
+
+            I_ref = control.backwards_induction(agent.H, agent.B, agent.B_factor_list, threshold=agent.ii_threshold, depth=agent.ii_depth)
+            self.assertTrue(np.array_equal(agent.I[0], I_ref[0]))
+            self.assertTrue(np.array_equal(agent.I[0][3], np.ones(3)))
+
+            # learning that doesn't change which states are reachable leaves `I` unchanged
+            I = agent.I
+            agent.update_B(utils.obj_array_from_list([utils.onehot(1, 3)]))
+            self.assertIs(agent.I, I)
+            self.assertTrue(np.array_equal(agent.I[0], I_ref[0]))
+
+    def test_agent_reduce_model(self):
+        """
+        Tests that online Bayesian model reduction removes the hidden state levels that the agent never visited while learning its transition model,
+        and that the reduced agent can continue to infer states and policies
+        """
+
+        np.random.seed(1)
+
+        num_obs = [5, 2]
+        num_states = [5, 3]
+        A_factor_list = [[0], [0, 1]]
+
+        A = utils.obj_array(2)
+        A[0] = np.eye(5)
+        A[1] = utils.norm_dist(np.random.rand(2, 5, 3))
+
+        # the agent only ever moves between the first two levels of the first factor
+        B = utils.obj_array(2)
+        B_0 = np.zeros((5, 5, 2))
+        B_0[:, :, 0] = np.eye(5)
+        B_0[:, :, 1] = np.eye(5)[:, [1, 0, 2, 3, 4]]
+        B[0] = utils.norm_dist(B_0 + 1e-3)
+        B[1] = utils.norm_dist(np.eye(3)[:, :, None] + 1e-3)
+        pB = utils.dirichlet_like(B, scale=1.0)
+        H = utils.obj_array_uniform(num_states)
+
+        agent = Agent(A=A, B=B, pB=pB, H=H, A_factor_list=A_factor_list, save_belief_hist=True, action_selection="stochastic")
+
+        state = 0
+        for t in range(40):
+            agent.infer_states([state, 0])
+            agent.infer_policies()
+            action = agent.sample_action()
+            if t > 0:
+                agent.update_B(agent.qs_hist[-2])
+            if int(action[0]) == 1:
+                state = 1 - state
+
+        levels_removed = agent.reduce_model()
+        self.assertEqual(levels_removed[0], [2, 3, 4])
+        self.assertEqual(agent.num_states, [2, 3 - len(levels_removed[1])])
+        self.assertEqual(agent.A[0].shape, (5, 2))
+        self.assertEqual(agent.A[1].shape, (2, 2, agent.num_states[1]))
+        self.assertEqual(agent.B[0].shape, (2, 2, 2))
+        self.assertTrue(utils.is_normalized(agent.B))
+        self.assertTrue(np.allclose(agent.B[0], utils.norm_dist(agent.pB[0])))
+        self.assertEqual(agent.D[0].shape, (2,))
+        self.assertEqual(agent.H[0].shape, (2,))
+
+        qs = agent.infer_states([1, 0])
+        self.assertTrue(qs[0].argmax() == 1)
+        agent.infer_policies()
+        agent.sample_action()
+        self.assertEqual(len(agent.qs_hist), 1)
+
+    def test_agent_from_sparsified_model(self):
+        """
+        Tests that an agent constructed from a fully connected generative model, whose factor dependencies are detected and removed, infers the same
+        beliefs and policies as the agent constructed with the fully connected model
+        """
+
+        num_obs = [3, 4]
+        num_states = [2, 3, 4]
+        num_controls = [2, 1, 3]
+
+        A_sparse = utils.random_A_matrix(num_obs, num_states, A_factor_list=[[1], [0, 2]])
+        A = utils.obj_array(2)
+        A[0] = np.tile(A_sparse[0][:, None, :, None], (1, 2, 1, 4))
+        A[1] = np.tile(A_sparse[1][:, :, None, :], (1, 1, 3, 1))
+        B = utils.random_B_matrix(num_states, num_controls)
+        C = utils.obj_array_from_list([np.random.randn(no) for no in num_obs])
+
+        agent_dense = Agent(A=A, B=B, C=C)
+        agent_sparse = Agent.from_sparsified_model(A, B, C=C)
+        self.assertEqual(agent_sparse.A_factor_list, [[1], [0, 2]])
+        self.assertEqual(agent_sparse.mb_dict["A_factor_list"], [[1], [0, 2]])
+
+        for t in range(3):
+            obs = [np.random.randint(no) for no in num_obs]
+            qs_dense = agent_dense.infer_states(obs)
+            qs_sparse = agent_sparse.infer_states(obs)
+            for f in range(len(num_states)):
+                self.assertTrue(np.allclose(qs_dense[f], qs_sparse[f]))
+
+            q_pi_dense, _ = agent_dense.infer_policies()
+            q_pi_sparse, _ = agent_sparse.infer_policies()
+            self.assertTrue(np.allclose(q_pi_dense, q_pi_sparse))
+
+            action = agent_dense.sample_action()
+            agent_sparse.action = action
+            agent_sparse.step_time()
 
     def test_agent_with_A_learning_vanilla(self):
         """ Unit test for updating prior Dirichlet parameters over likelihood model (pA) with the ``Agent`` class,
@@ -1697,5 +1697,59 @@ class TestControl(unittest.TestCase):
         sampled_action = control._sample_policy_test(q_pi, policies, num_controls, action_selection="deterministic", seed=seeds[1])
         self.assertEqual(sampled_action[0], 2)
 
+    def test_backwards_induction(self):
+        """
+        Tests the vectorized backwards induction (with dense and sparse reachability matrices) against a reference that loops over pairs of states
+        """
+
+        np.random.seed(0)
+        num_states, num_controls = [6, 4], [3, 2]
+        B = utils.random_B_matrix(num_states, num_controls)
+        for f in range(len(B)):
+            B[f] = utils.norm_dist(B[f] * (B[f] > 0.2)) # prune some of the transitions, so that not every state is reachable in one step
+        H = utils.obj_array_from_list([utils.onehot(0, num_states[0]), utils.norm_dist(np.random.rand(num_states[1]))])
+        threshold, depth = 1/16, 6
+
+        for f in range(len(B)):
+            b = np.zeros((num_states[f], num_states[f]))
+            for i in range(num_states[f]):
+                for j in range(num_states[f]):
+                    b[i, j] = 1.0 if np.any(B[f][i, j, :] > threshold) else 0.0
+
+            I_ref = np.zeros((depth, num_states[f]))
+            I_ref[0, :] = H[f]
+            for i in range(1, depth):
+                I_ref[i, :] = np.where(b.dot(I_ref[i-1, :]) > 0.1, 1.0, 0.0)
+
+            for sparse in [False, True]:
+                I = control.backwards_induction(H, B, [[0], [1]], threshold=threshold, depth=depth, sparse=sparse)
+                self.assertTrue(np.array_equal(I[f], I_ref))
+
+        with self.assertRaises(ValueError):
+            control.backwards_induction(H, B, [[0, 1], [1]], threshold=threshold, depth=depth)
+
+    def test_calc_inductive_cost_policies(self):
+        """
+        Tests that the inductive costs computed for all policies at once are the same as the ones computed for each policy separately
+        """
+
+        np.random.seed(1)
+        num_states, num_controls = [5, 3], [2, 3]
+        B = utils.random_B_matrix(num_states, num_controls)
+        H = utils.obj_array_from_list([utils.onehot(2, num_states[0]), utils.onehot(0, num_states[1])])
+        I = control.backwards_induction(H, B, None, threshold=1/4, depth=4)
+
+        qs = utils.obj_array_from_list([utils.onehot(4, num_states[0]), utils.norm_dist(np.random.rand(num_states[1]))])
+        qs_pi_policies = [[utils.random_single_categorical(num_states) for t in range(2)] for p in range(7)]
+
+        inductive_cost = control.calc_inductive_cost_policies(qs, qs_pi_policies, I)
+        self.assertEqual(inductive_cost.shape, (7,))
+        for p, qs_pi in enumerate(qs_pi_policies):
+            self.assertTrue(np.isclose(inductive_cost[p], control.calc_inductive_cost(qs, qs_pi, I)))
+
+        # the same costs, from predictive beliefs stored as a `utils.PolicyBeliefArray`
+        qs_pi_array = utils.PolicyBeliefArray([np.array([[qs_pi_t[f] for qs_pi_t in qs_pi] for qs_pi in qs_pi_policies]) for f in range(len(num_states))])
+        self.assertTrue(np.allclose(control.calc_inductive_cost_policies(qs, qs_pi_array, I), inductive_cost))
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Unit Tests of forward-backward smoothing of hidden states
+
+__author__: Conor Heins, Alexander Tschantz
+"""
+
+import itertools
+import unittest
+
+import numpy as np
+
+from pymdp import utils
+from pymdp.algos import run_forward_backward
+from pymdp.inference import smooth_posterior_states
+from pymdp.maths import get_joint_likelihood_seq
+
+def _brute_force_posterior(lh_seq, B, actions, prior):
+    """
+    Computes the exact posterior over whole trajectories of the joint hidden state, by enumeration
+    """
+
+    num_states = [B_f.shape[0] for B_f in B]
+    T = len(lh_seq)
+    joint_states = list(itertools.product(*[range(ns) for ns in num_states]))
+
+    trajectories = list(itertools.product(joint_states, repeat=T))
+    probs = np.zeros(len(trajectories))
+    for i, traj in enumerate(trajectories):
+        p = np.prod([prior[f][traj[0][f]] for f in range(len(B))])
+        for t in range(T):
+            p *= lh_seq[t][traj[t]]
+            if t > 0:
+                p *= np.prod([B[f][traj[t][f], traj[t-1][f], actions[t-1][f]] for f in range(len(B))])
+        probs[i] = p
+
+    return trajectories, probs
+
+class TestForwardBackward(unittest.TestCase):
+
+    def test_forward_backward_brute_force(self):
+        """
+        Tests that the smoothed marginals, pairwise joints and log evidence match the ones obtained by enumerating all
+        trajectories, for a model with two hidden state factors (coupled only through the observation model)
+        """
+
+        num_obs = [3, 4]
+        num_states = [3, 2]
+        num_controls = [2, 2]
+
+        A = utils.random_A_matrix(num_obs, num_states)
+        B = utils.random_B_matrix(num_states, num_controls)
+        prior = utils.random_single_categorical(num_states)
+
+        T = 4
+        obs = [[np.random.randint(n) for n in num_obs] for _ in range(T)]
+        obs = utils.process_observation_seq(obs, len(num_obs), num_obs)
+        actions = np.array([[np.random.randint(n) for n in num_controls] for _ in range(T - 1)])
+
+        lh_seq = get_joint_likelihood_seq(A, obs, num_states)
+
+        qs_seq, qss, F = run_forward_backward(lh_seq, B, actions=actions, prior=prior)
+
+        trajectories, probs = _brute_force_posterior(lh_seq, B, actions, prior)
+        self.assertTrue(np.isclose(F, -np.log(probs.sum())))
+        probs /= probs.sum()
+
+        for f in range(len(num_states)):
+            for t in range(T):
+                qs_validation = np.zeros(num_states[f])
+                for traj, p in zip(trajectories, probs):
+                    qs_validation[traj[t][f]] += p
+                self.assertTrue(np.allclose(qs_seq[t][f], qs_validation))
+
+            self.assertEqual(qss[f].shape, (T - 1, num_states[f], num_states[f]))
+            for t in range(T - 1):
+                qss_validation = np.zeros((num_states[f], num_states[f]))
+                for traj, p in zip(trajectories, probs):
+                    qss_validation[traj[t+1][f], traj[t][f]] += p
+                self.assertTrue(np.allclose(qss[f][t], qss_validation))
+
+    def test_smooth_posterior_states_single_factor(self):
+        """
+        Tests the ``inference`` wrapper in the single factor, single timestep case, where the posterior is just the normalized product
+        of the prior and the likelihood
+        """
+
+        num_obs = [5]
+        num_states = [4]
+        num_controls = [3]
+
+        A = utils.random_A_matrix(num_obs, num_states)
+        B = utils.random_B_matrix(num_states, num_controls)
+        prior = utils.random_single_categorical(num_states)
+
+        qs_seq, qss, F = smooth_posterior_states(A, B, [2], prior=prior)
+
+        qs_validation = utils.norm_dist(A[0][2] * prior[0])
+        self.assertTrue(np.allclose(qs_seq[0][0], qs_validation))
+        self.assertEqual(qss[0].shape, (0, num_states[0], num_states[0]))
+        self.assertTrue(np.isclose(F, -np.log((A[0][2] * prior[0]).sum())))
+
+    def test_forward_backward_interacting_B(self):
+        """
+        Tests that an error is raised when the dynamics of some hidden state factor depend on other factors
+        """
+
+        num_states = [2, 3]
+        num_controls = [1, 2]
+        B = utils.random_B_matrix(num_states, num_controls, B_factor_list=[[0], [0, 1]])
+        lh_seq = utils.obj_array(2)
+        lh_seq[0], lh_seq[1] = np.ones(num_states), np.ones(num_states)
+
+        with self.assertRaises(ValueError):
+            run_forward_backward(lh_seq, B, actions=np.zeros((1, 2)))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Unit Tests for the construction of grid world transition models
+
+__author__: Conor Heins, Alexander Tschantz, Daphne Demekas, Brennan Klein
+
+"""
+
+import unittest
+
+import numpy as np
+
+from pymdp.default_models import generate_grid_world_transitions, grid_world_transition_table
+from pymdp.envs import GridWorldEnv, DGridWorldEnv
+
+def loop_grid_world_transitions(action_labels, num_rows, num_cols):
+    """
+    Reference construction of the dense grid world transition model, location by location
+    """
+
+    B = np.zeros((num_rows * num_cols, num_rows * num_cols, len(action_labels)))
+    for row in range(num_rows):
+        for col in range(num_cols):
+            for a, label in enumerate(action_labels):
+                next_row, next_col = row, col
+                if label == "UP":
+                    next_row = max(row - 1, 0)
+                elif label == "DOWN":
+                    next_row = min(row + 1, num_rows - 1)
+                elif label == "LEFT":
+                    next_col = max(col - 1, 0)
+                elif label == "RIGHT":
+                    next_col = min(col + 1, num_cols - 1)
+                B[next_row * num_cols + next_col, row * num_cols + col, a] = 1.0
+    return B
+
+class TestGridWorlds(unittest.TestCase):
+
+    def test_dense_transitions(self):
+        """
+        Tests the vectorized construction of the dense transition model against a location-by-location construction
+        """
+
+        action_labels = ["LEFT", "STAY", "UP", "RIGHT", "DOWN"]
+        for num_rows, num_cols in [(3, 3), (2, 5), (4, 1), (1, 1)]:
+            B = generate_grid_world_transitions(action_labels, num_rows=num_rows, num_cols=num_cols)
+            self.assertTrue(np.array_equal(B, loop_grid_world_transitions(action_labels, num_rows, num_cols)))
+
+            table = grid_world_transition_table(action_labels, num_rows=num_rows, num_cols=num_cols)
+            self.assertTrue(np.array_equal(table, B.argmax(axis=0)))
+
+        with self.assertRaises(ValueError):
+            generate_grid_world_transitions(["UP", "JUMP"])
+        with self.assertRaises(ValueError):
+            generate_grid_world_transitions(action_labels, format="csc")
+
+    def test_sparse_and_factorized_transitions(self):
+        """
+        Tests that the sparse and factorized transition models are equivalent to the dense one
+        """
+
+        action_labels = GridWorldEnv.CONTROL_NAMES
+        B = generate_grid_world_transitions(action_labels, num_rows=4, num_cols=3)
+
+        B_sparse = generate_grid_world_transitions(action_labels, num_rows=4, num_cols=3, format="sparse")
+        B_factorized = generate_grid_world_transitions(action_labels, num_rows=4, num_cols=3, format="factorized")
+        self.assertEqual(B_factorized[0].shape, (4, 4, 5))
+        self.assertEqual(B_factorized[1].shape, (3, 3, 5))
+
+        for a in range(len(action_labels)):
+            self.assertTrue(np.array_equal(B_sparse[a].toarray(), B[:, :, a]))
+            self.assertTrue(np.array_equal(np.kron(B_factorized[0][:, :, a], B_factorized[1][:, :, a]), B[:, :, a]))
+
+    def test_grid_world_envs(self):
+        """
+        Tests that the grid world environments step according to their transition models
+        """
+
+        for env_class, shape in [(GridWorldEnv, [3, 4]), (DGridWorldEnv, [1, 5])]:
+            env = env_class(shape=shape, init_state=0)
+            B = env.get_transition_dist()
+            self.assertTrue(np.array_equal(B, loop_grid_world_transitions(env_class.CONTROL_NAMES, *shape)))
+
+            np.random.seed(0)
+            state = env.reset(init_state=0)
+            for _ in range(20):
+                action = env.sample_action()
+                next_state = env.step(action)
+                self.assertEqual(B[next_state, state, action], 1.0)
+                self.assertEqual(env.P[state][action], next_state)
+                state = next_state
+
+    def test_large_grid_world(self):
+        """
+        Tests that the transition model of a large grid world can be built in sparse and factorized form
+        """
+
+        env = GridWorldEnv(shape=[200, 200], init_state=0)
+        B_sparse = env.get_transition_dist(format="sparse")
+        self.assertEqual(len(B_sparse), env.n_control)
+        self.assertEqual(B_sparse[GridWorldEnv.RIGHT].nnz, env.n_states)
+        self.assertEqual(B_sparse[GridWorldEnv.RIGHT][1, 0], 1.0)
+
+        B_factorized = env.get_transition_dist(format="factorized")
+        self.assertEqual(B_factorized[1].shape, (200, 200, env.n_control))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Unit Tests for the import time of the package
+
+__author__: Conor Heins, Alexander Tschantz, Daphne Demekas, Brennan Klein
+
+"""
+
+import os
+import subprocess
+import sys
+import unittest
+
+# generous upper bound on the wall-clock time of `import pymdp` in a fresh interpreter, in seconds
+IMPORT_TIME_BUDGET = 1.0
+
+# modules that `import pymdp` must not import, since they are only needed for plotting
+HEAVY_MODULES = ["matplotlib", "seaborn", "pandas"]
+
+# submodules of the package that are only imported on first access
+LAZY_SUBMODULES = ["pymdp.viz", "pymdp.rollout", "pymdp.serving", "pymdp.parallel"]
+
+IMPORT_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import pymdp
+elapsed = time.perf_counter() - start
+print(elapsed)
+print(",".join(name for name in {heavy} if name in sys.modules))
+"""
+
+class TestImportTime(unittest.TestCase):
+
+    def _import_pymdp(self):
+        """
+        Imports ``pymdp`` in a fresh interpreter, and returns the time it took and the heavy modules (and lazy submodules) that were imported along with it
+        """
+
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join([root, os.environ.get("PYTHONPATH", "")]))
+        out = subprocess.run(
+            [sys.executable, "-c", IMPORT_SCRIPT.format(heavy=HEAVY_MODULES + LAZY_SUBMODULES)], capture_output=True, text=True, check=True, env=env, cwd=root
+        ).stdout.splitlines()
+
+        return float(out[0]), [name for name in out[1].split(",") if name]
+
+    def test_import_does_not_load_plotting_libraries(self):
+        """
+        Tests that the plotting libraries are only imported on demand, through ``pymdp.viz``
+        """
+
+        _, heavy = self._import_pymdp()
+        self.assertEqual([name for name in heavy if name in HEAVY_MODULES], [])
+
+    def test_lazy_submodules(self):
+        """
+        Tests that the submodules with optional functionality are only imported on first access
+        """
+
+        _, loaded = self._import_pymdp()
+        self.assertEqual([name for name in loaded if name in LAZY_SUBMODULES], [])
+
+        import pymdp
+        for name in LAZY_SUBMODULES:
+            self.assertEqual(getattr(pymdp, name.split(".")[1]).__name__, name)
+
+    def test_import_time_budget(self):
+        """
+        Tests that ``import pymdp`` stays within the startup budget (the best of a few fresh imports is used, to reduce noise)
+        """
+
+        elapsed = min(self._import_pymdp()[0] for _ in range(3))
+        self.assertLess(elapsed, IMPORT_TIME_BUDGET)
+
+if __name__ == "__main__":
+    unittest.main()
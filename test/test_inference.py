@@ -11,7 +11,7 @@ import unittest
 import numpy as np
 
 from pymdp import utils, maths
-from pymdp import inference
+from pymdp import inference, control, learning
 
 class TestInference(unittest.TestCase):
 
@@ -210,5 +210,71 @@ class TestInference(unittest.TestCase):
             self.assertTrue(np.isclose(qs_f_val, qs_f_out).all())
     
 
+    def test_average_states_over_policies_dense(self):
+        """
+        Tests that the Bayesian model average over policies gives the same result whether the policy-conditioned beliefs are stored in 
+        nested object arrays or in a dense `utils.PolicyBeliefArray`
+        """
+
+        num_states = [3, 4, 2]
+        num_policies = 6
+
+        qs_pi = utils.obj_array(num_policies)
+        for p_idx in range(num_policies):
+            qs_pi[p_idx] = utils.random_single_categorical(num_states)
+        q_pi = utils.norm_dist(np.random.rand(num_policies))
+
+        qs_bma_validation = inference.average_states_over_policies(qs_pi, q_pi)
+
+        qs_pi_dense = utils.PolicyBeliefArray([np.stack([qs_pi[p_idx][f] for p_idx in range(num_policies)]) for f in range(len(num_states))])
+        qs_bma_dense = inference.average_states_over_policies(qs_pi_dense, q_pi)
+
+        for f in range(len(num_states)):
+            self.assertTrue(np.allclose(qs_bma_validation[f], qs_bma_dense[f]))
+
+    def test_integer_observations(self):
+        """
+        Tests that observations given as integer arrays of observation indices (one per modality, or one row per timestep) give the same posteriors
+        as the equivalent one-hot observation vectors, without the latter being constructed
+        """
+
+        num_obs = [3, 4]
+        num_states = [3, 2, 2]
+        num_controls = [2, 1, 2]
+        A_factor_list = [[0, 1], [1, 2]]
+        A = utils.random_A_matrix(num_obs, num_states, A_factor_list=A_factor_list)
+        B = utils.random_B_matrix(num_states, num_controls)
+        mb_dict = {"A_factor_list": A_factor_list, "A_modality_list": [[0], [0, 1], [1]]}
+        prior = utils.random_single_categorical(num_states)
+
+        obs_seq = np.array([[np.random.randint(no) for no in num_obs] for _ in range(3)])
+        onehot_seq = [utils.process_observation(tuple(obs_t), len(num_obs), num_obs) for obs_t in obs_seq]
+
+        self.assertTrue(np.array_equal(utils.to_obs_indices(list(obs_seq[0]), len(num_obs)), obs_seq[0]))
+        self.assertIsNone(utils.to_obs_indices(onehot_seq[0], len(num_obs)))
+
+        qs_idx = inference.update_posterior_states_factorized(A, obs_seq[0], num_obs, num_states, mb_dict, prior=prior)
+        qs_onehot = inference.update_posterior_states_factorized(A, onehot_seq[0], num_obs, num_states, mb_dict, prior=prior)
+        for f in range(len(num_states)):
+            self.assertTrue(np.allclose(qs_idx[f], qs_onehot[f]))
+
+        policies = control.construct_policies(num_states, num_controls, policy_len=1)
+        prev_actions = [policy[0] for policy in policies[:2]]
+        for inference_algo in ["MMP", "VMP"]:
+            qs_seq_idx, F_idx = inference.update_posterior_states_full_factorized(A, mb_dict, B, [[0], [1], [2]], obs_seq, policies, prev_actions,
+                                                                                  prior=prior, policy_sep_prior=False, inference_algo=inference_algo)
+            qs_seq_onehot, F_onehot = inference.update_posterior_states_full_factorized(A, mb_dict, B, [[0], [1], [2]], onehot_seq, policies, prev_actions,
+                                                                                        prior=prior, policy_sep_prior=False, inference_algo=inference_algo)
+            self.assertTrue(np.allclose(F_idx, F_onehot))
+            for f in range(len(num_states)):
+                self.assertTrue(np.allclose(qs_seq_idx.factor_arrays[f], qs_seq_onehot.factor_arrays[f]))
+
+        # learning the observation model
+        pA_idx, pA_onehot = utils.dirichlet_like(A), utils.dirichlet_like(A)
+        learning.update_obs_likelihood_dirichlet_inplace(pA_idx, utils.norm_dist_obj_arr(pA_idx), obs_seq[0], qs_idx, A_factor_list)
+        learning.update_obs_likelihood_dirichlet_inplace(pA_onehot, utils.norm_dist_obj_arr(pA_onehot), onehot_seq[0], qs_idx, A_factor_list)
+        for m in range(len(num_obs)):
+            self.assertTrue(np.allclose(pA_idx[m], pA_onehot[m]))
+
 if __name__ == "__main__":
-    unittest.main()
\ No newline at end of file
+    unittest.main()
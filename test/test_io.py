@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Unit Tests for saving and loading generative models
+
+__author__: Conor Heins, Alexander Tschantz, Daphne Demekas, Brennan Klein
+
+"""
+
+import os
+import json
+import tempfile
+import unittest
+
+import numpy as np
+
+from pymdp.agent import Agent
+from pymdp.model import CompiledModel
+from pymdp import io, utils
+
+class TestIO(unittest.TestCase):
+
+    def test_save_load_model(self):
+        """
+        Tests that a saved model bundle is loaded (memory-mapped) with the same arrays, factor lists and policies, and that agents
+        constructed from it behave identically to agents constructed from the original arrays
+        """
+
+        num_obs = [3, 4]
+        num_states = [3, 2, 3]
+        num_controls = [2, 1, 3]
+        A_factor_list = [[0, 1], [1, 2]]
+        B_factor_list = [[0, 2], [1], [2]]
+
+        A = utils.random_A_matrix(num_obs, num_states, A_factor_list=A_factor_list)
+        B = utils.random_B_matrix(num_states, num_controls, B_factor_list=B_factor_list)
+        C = utils.obj_array_from_list([np.random.randn(no) for no in num_obs])
+        pA = utils.dirichlet_like(A, scale=2.0)
+
+        agent = Agent(A=A, B=B, C=C, pA=pA, A_factor_list=A_factor_list, B_factor_list=B_factor_list, policy_len=2)
+
+        with tempfile.TemporaryDirectory() as path:
+            io.save_agent_model(path, agent)
+            model = io.load_model(path)
+
+            self.assertIsNone(model["pB"])
+            self.assertEqual(model["A_factor_list"], A_factor_list)
+            self.assertEqual(model["B_factor_list"], B_factor_list)
+            self.assertEqual(len(model["policies"]), len(agent.policies))
+            for name in ["A", "B", "C", "D", "pA"]:
+                for arr, loaded in zip(getattr(agent, name), model[name]):
+                    self.assertIsInstance(loaded, np.memmap)
+                    self.assertFalse(loaded.flags.writeable)
+                    self.assertTrue(np.array_equal(arr, loaded))
+            self.assertTrue(np.array_equal(agent.E, model["E"]))
+
+            loaded_agent = Agent(**model, lr_pA=0.5)
+            compiled_agent = Agent.from_compiled(CompiledModel(**io.load_model(path, mmap_mode=None)), lr_pA=0.5)
+            agent.lr_pA = 0.5
+
+            for t in range(3):
+                obs = [np.random.randint(no) for no in num_obs]
+                for a in [agent, loaded_agent, compiled_agent]:
+                    np.random.seed(t)
+                    a.infer_states(obs)
+                    a.infer_policies()
+                    a.sample_action()
+                    a.update_A(obs) # learning copies the memory-mapped arrays it updates
+                self.assertTrue(np.allclose(agent.q_pi, loaded_agent.q_pi))
+                self.assertTrue(np.allclose(agent.q_pi, compiled_agent.q_pi))
+            for m in range(len(num_obs)):
+                self.assertTrue(np.allclose(agent.pA[m], loaded_agent.pA[m]))
+                self.assertTrue(np.array_equal(model["pA"][m], pA[m]))
+
+            # bundles of later versions are rejected
+            with open(os.path.join(path, io.MANIFEST_NAME)) as f:
+                manifest = json.load(f)
+            manifest["version"] = io.BUNDLE_VERSION + 1
+            with open(os.path.join(path, io.MANIFEST_NAME), "w") as f:
+                json.dump(manifest, f)
+            with self.assertRaises(ValueError):
+                io.load_model(path)
+
+        with self.assertRaises(FileNotFoundError):
+            io.load_model(path)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,8 @@
 import unittest
 
 import numpy as np
-from pymdp import utils, maths, learning
+from pymdp import utils, maths, learning, inference
+from pymdp.agent import Agent
 
 from copy import deepcopy
 
@@ -297,6 +298,46 @@ class TestLearning(unittest.TestCase):
         for modality, obs_dim in enumerate(num_obs):
             self.assertTrue(np.allclose(pA_updated_test[modality], pA_updated_valid[modality]))
 
+    def test_update_pA_inplace(self):
+        """
+        Test for `learning.update_obs_likelihood_dirichlet_inplace`, which updates the Dirichlet parameters of the observed outcomes (and the
+        corresponding columns of the expected ``A``) in-place, for integer, one-hot and distributional observations
+        """
+
+        num_states = [2, 6, 5]
+        num_obs = [3, 4, 5]
+        A_factor_list = [[0], [1, 2], [0, 2]]
+        learning_rate = np.random.rand()
+
+        A = utils.random_A_matrix(num_obs, num_states, A_factor_list=A_factor_list)
+        A[0][:, 1] = 0.0 # unnormalized column that never receives counts
+        A[0][0, 1] = 1.0
+        A[1][2] = 0.0 # outcome that is impossible under the model
+
+        obs_int = [np.random.randint(obs_dim) for obs_dim in num_obs]
+        obs_onehot = utils.obj_array_from_list([utils.onehot(o, obs_dim) for o, obs_dim in zip(obs_int, num_obs)])
+        obs_distr = utils.obj_array_from_list([utils.norm_dist(np.random.rand(obs_dim)) for obs_dim in num_obs])
+
+        for observation in [obs_int, obs_onehot, obs_distr]:
+            for qs in [utils.random_single_categorical(num_states), utils.obj_array_from_list([utils.onehot(1, ns) for ns in num_states])]:
+                pA = utils.dirichlet_like(A, scale=1.0)
+                pA_updated_valid = learning.update_obs_likelihood_dirichlet_factorized(
+                    pA, A, observation, qs, A_factor_list, lr=learning_rate, modalities=[0, 1]
+                    )
+                A_updated_valid = utils.norm_dist_obj_arr(pA_updated_valid)
+
+                pA_inplace = utils.obj_array_from_list([pA_m.copy() for pA_m in pA])
+                A_inplace = utils.norm_dist_obj_arr(pA_inplace)
+                pA_sub_arrays = list(pA_inplace)
+                learning.update_obs_likelihood_dirichlet_inplace(
+                    pA_inplace, A_inplace, observation, qs, A_factor_list, lr=learning_rate, modalities=[0, 1]
+                    )
+
+                for modality in range(len(num_obs)):
+                    self.assertIs(pA_inplace[modality], pA_sub_arrays[modality])
+                    self.assertTrue(np.allclose(pA_inplace[modality], pA_updated_valid[modality]))
+                    self.assertTrue(np.allclose(A_inplace[modality], A_updated_valid[modality]))
+
     def test_update_pB_single_factor_no_actions(self):
         """
         Test for updating prior Dirichlet parameters over transition likelihood (pB)
@@ -598,6 +639,65 @@ class TestLearning(unittest.TestCase):
                 )
             self.assertTrue(np.all(pB_updated[factor] == validation_pB[factor]))
     
+    def test_update_pB_smoothed_joint(self):
+        """
+        Test for updating prior Dirichlet parameters over transition likelihood (pB) using the pairwise joint posteriors
+        of a forward-backward smoother, accumulated over a whole trajectory
+        """
+
+        num_obs = [4]
+        num_states = [3, 2]
+        num_controls = [2, 2]
+        l_rate = 1.0
+
+        A = utils.random_A_matrix(num_obs, num_states)
+        B = utils.random_B_matrix(num_states, num_controls)
+        pB = utils.obj_array_ones([B_f.shape for B_f in B])
+
+        T = 5
+        obs = [np.random.randint(num_obs[0]) for _ in range(T)]
+        actions = [np.array([np.random.randint(c_dim) for c_dim in num_controls]) for _ in range(T - 1)]
+
+        qs_seq, qss, _ = inference.smooth_posterior_states(A, B, obs, prev_actions=actions)
+
+        pB_updated = pB
+        validation_pB = utils.obj_array_ones([B_f.shape for B_f in B])
+        for t in range(T - 1):
+            qs_joint = utils.obj_array_from_list([qss_f[t] for qss_f in qss])
+            pB_updated = learning.update_state_likelihood_dirichlet(
+                pB_updated, B, actions[t], qs_seq[t+1], qs_seq[t], lr=l_rate, factors="all", qs_joint=qs_joint
+            )
+            for factor in range(len(num_states)):
+                validation_pB[factor][:, :, actions[t][factor]] += l_rate * qss[factor][t] * (B[factor][:, :, actions[t][factor]] > 0)
+
+                # the pairwise joints are consistent with the smoothed marginals
+                self.assertTrue(np.allclose(qss[factor][t].sum(axis=1), qs_seq[t+1][factor]))
+                self.assertTrue(np.allclose(qss[factor][t].sum(axis=0), qs_seq[t][factor]))
+
+        for factor in range(len(num_states)):
+            self.assertTrue(np.allclose(pB_updated[factor], validation_pB[factor]))
+
+        # the in-place and trajectory updates, and the updates of an agent (with and without buffering), accept the same pairwise joints
+        B_factor_list = [[0], [1]]
+        pB_inplace, B_inplace = utils.obj_array_ones([B_f.shape for B_f in B]), utils.obj_array_from_list([B_f.copy() for B_f in B])
+        pB_trajectory, B_trajectory = utils.obj_array_ones([B_f.shape for B_f in B]), utils.obj_array_from_list([B_f.copy() for B_f in B])
+        agents = [Agent(A=A, B=B, pB=pB, lr_pB=l_rate), Agent(A=A, B=B, pB=pB, lr_pB=l_rate, learning_flush_interval=T)]
+        for t in range(T - 1):
+            qs_joint = utils.obj_array_from_list([qss_f[t] for qss_f in qss])
+            learning.update_state_likelihood_dirichlet_inplace(pB_inplace, B_inplace, actions[t], None, None, B_factor_list, lr=l_rate, qs_joint=qs_joint)
+            for agent in agents:
+                agent.action = actions[t]
+                agent.update_B(qs_joint=qs_joint)
+        learning.update_state_likelihood_dirichlet_trajectory(pB_trajectory, B_trajectory, actions, qs_seq, B_factor_list, lr=l_rate, qs_joint=qss)
+        agents[1].flush_learning()
+
+        for factor in range(len(num_states)):
+            for pB_f in [pB_inplace[factor], pB_trajectory[factor]] + [agent.pB[factor] for agent in agents]:
+                self.assertTrue(np.allclose(pB_f, validation_pB[factor]))
+
+        with self.assertRaises(ValueError):
+            agents[0].update_B()
+
     def test_update_pB_interactions(self):
         """
         Test for `learning.update_state_likelihood_dirichlet_factorized`, which is the learning function updating prior Dirichlet parameters over the transition likelihood (pB) 
@@ -662,6 +762,98 @@ class TestLearning(unittest.TestCase):
             self.assertTrue(np.allclose(pB_updated_test[factor], pB_updated_valid[factor]))
 
 
+    def test_update_pB_inplace_and_trajectory(self):
+        """
+        Test for `learning.update_state_likelihood_dirichlet_inplace`, which updates the slice of the action taken (and renormalizes the corresponding columns
+        of ``B``) in-place, and for `learning.update_state_likelihood_dirichlet_trajectory`, which accumulates a whole trajectory of transitions at once
+        """
+
+        num_states = [3, 4, 5]
+        num_controls = [2, 3, 1]
+        B_factor_list = [[0, 1], [0, 1, 2], [1, 2]]
+        factors_to_update = [0, 1]
+        l_rate = np.random.rand()
+        T = 6
+
+        B = utils.random_B_matrix(num_states, num_controls, B_factor_list=B_factor_list)
+        B[0][:, 1, 0, 0] = 0.0 # transition that is impossible under the model
+        B[0][0, 1, 0, 0] = 1.0
+
+        qs_seq = [utils.random_single_categorical(num_states) for _ in range(T)]
+        actions = np.array([[np.random.randint(c_dim) for c_dim in num_controls] for _ in range(T - 1)])
+
+        pB_valid = utils.dirichlet_like(B, scale=1.)
+        pB_inplace = utils.dirichlet_like(B, scale=1.)
+        B_inplace = utils.norm_dist_obj_arr(pB_inplace)
+        for t in range(T - 1):
+            pB_valid = learning.update_state_likelihood_dirichlet_interactions(
+                pB_valid, utils.norm_dist_obj_arr(pB_valid), actions[t], qs_seq[t + 1], qs_seq[t], B_factor_list, lr=l_rate, factors=factors_to_update
+            )
+            pB_returned = learning.update_state_likelihood_dirichlet_inplace(
+                pB_inplace, B_inplace, actions[t], qs_seq[t + 1], qs_seq[t], B_factor_list, lr=l_rate, factors=factors_to_update
+            )
+            self.assertIs(pB_returned, pB_inplace)
+
+            B_valid = utils.norm_dist_obj_arr(pB_valid)
+            for factor in range(len(num_states)):
+                self.assertTrue(np.allclose(pB_inplace[factor], pB_valid[factor]))
+                self.assertTrue(np.allclose(B_inplace[factor], B_valid[factor]))
+
+        pB_trajectory = utils.dirichlet_like(B, scale=1.)
+        B_trajectory = utils.norm_dist_obj_arr(pB_trajectory)
+        learning.update_state_likelihood_dirichlet_trajectory(
+            pB_trajectory, B_trajectory, actions, qs_seq, B_factor_list, lr=l_rate, factors=factors_to_update
+        )
+        for factor in range(len(num_states)):
+            self.assertTrue(np.allclose(pB_trajectory[factor], pB_valid[factor]))
+            self.assertTrue(np.allclose(B_trajectory[factor], B_valid[factor]))
+
+    def test_dirichlet_accumulator(self):
+        """
+        Test for `learning.DirichletAccumulator`, whose flushed increments should coincide with applying the in-place updates of the observation and
+        transition models at every timestep
+        """
+
+        num_states = [3, 4]
+        num_obs = [4, 2]
+        num_controls = [2, 3]
+        A_factor_list = [[0], [0, 1]]
+        B_factor_list = [[0], [0, 1]]
+        T = 5
+
+        A = utils.random_A_matrix(num_obs, num_states, A_factor_list=A_factor_list)
+        B = utils.random_B_matrix(num_states, num_controls, B_factor_list=B_factor_list)
+        qs_seq = [utils.random_single_categorical(num_states) for _ in range(T)]
+        obs_seq = [[np.random.randint(no) for no in num_obs] for _ in range(T)]
+        obs_seq[1] = utils.obj_array_from_list([utils.norm_dist(np.random.rand(no)) for no in num_obs]) # distributional observation
+        actions = [np.array([np.random.randint(nc) for nc in num_controls]) for _ in range(T - 1)]
+
+        pA_valid, pB_valid = utils.dirichlet_like(A), utils.dirichlet_like(B)
+        A_valid, B_valid = utils.norm_dist_obj_arr(pA_valid), utils.norm_dist_obj_arr(pB_valid)
+        pA_test, pB_test = utils.dirichlet_like(A), utils.dirichlet_like(B)
+        A_test, B_test = utils.norm_dist_obj_arr(pA_test), utils.norm_dist_obj_arr(pB_test)
+
+        accumulator = learning.DirichletAccumulator()
+        for t in range(T):
+            learning.update_obs_likelihood_dirichlet_inplace(pA_valid, A_valid, obs_seq[t], qs_seq[t], A_factor_list, lr=0.5)
+            accumulator.add_obs(obs_seq[t], qs_seq[t], A_factor_list, lr=0.5)
+            if t > 0:
+                learning.update_state_likelihood_dirichlet_inplace(pB_valid, B_valid, actions[t - 1], qs_seq[t], qs_seq[t - 1], B_factor_list, lr=0.5, factors=[1])
+                accumulator.add_transition(actions[t - 1], qs_seq[t], qs_seq[t - 1], B_factor_list, lr=0.5, factors=[1])
+        self.assertEqual(accumulator.num_updates, T)
+
+        buffered = accumulator.copy()
+        accumulator.flush(pA_test, A_test, pB_test, B_test)
+        self.assertEqual(accumulator.num_updates, 0)
+        self.assertEqual(len(buffered.B_slices), 1) # only the learned factor is buffered
+
+        for m in range(len(num_obs)):
+            self.assertTrue(np.allclose(pA_test[m], pA_valid[m]))
+            self.assertTrue(np.allclose(A_test[m], A_valid[m]))
+        for f in range(len(num_states)):
+            self.assertTrue(np.allclose(pB_test[f], pB_valid[f]))
+            self.assertTrue(np.allclose(B_test[f], B_valid[f]))
+
     def test_update_pD(self):
         """
         Test updating prior Dirichlet parameters over initial hidden states (pD). 
@@ -891,7 +1083,49 @@ class TestLearning(unittest.TestCase):
             self.assertTrue(B_pruned[f].shape == expected_shape)
             self.assertTrue(utils.is_normalized(B_pruned[f]))
 
-    
+        """ Test 3. Testing `_prune_A()` and `_prune_B()` with factor lists, on Dirichlet parameters (which are not normalized) """
+
+        num_states = [3, 4, 2]
+        num_obs = [3, 2]
+        num_controls = [2, 1, 1]
+        A_factor_list = [[1], [0, 2]]
+        B_factor_list = [[0, 1], [1], [1, 2]]
+        pA = utils.dirichlet_like(utils.random_A_matrix(num_obs, num_states, A_factor_list=A_factor_list), scale=2.0)
+        pB = utils.dirichlet_like(utils.random_B_matrix(num_states, num_controls, B_factor_list=B_factor_list), scale=2.0)
+
+        state_levels_to_prune = [[1], [0, 3], []]
+
+        pA_pruned = learning._prune_A(pA, [[], []], state_levels_to_prune, dirichlet=True, A_factor_list=A_factor_list)
+        self.assertTrue(np.array_equal(pA_pruned[0], pA[0][:, [1, 2]]))
+        self.assertTrue(np.array_equal(pA_pruned[1], pA[1][:, [0, 2], :]))
+
+        pB_pruned = learning._prune_B(pB, state_levels_to_prune, [[], [], []], dirichlet=True, B_factor_list=B_factor_list)
+        self.assertTrue(np.array_equal(pB_pruned[0], pB[0][np.ix_([0, 2], [0, 2], [1, 2], [0, 1])]))
+        self.assertTrue(np.array_equal(pB_pruned[2], pB[2][np.ix_([0, 1], [1, 2], [0, 1], [0])]))
+
+    def test_score_state_reductions(self):
+        """
+        Test that Bayesian model reduction favours removing hidden state levels that were never visited while learning the transition model
+        """
+
+        num_states = [4, 3]
+        num_controls = [2, 1]
+        B = utils.random_B_matrix(num_states, num_controls)
+        pB = utils.dirichlet_like(B, scale=1.0)
+        pD = utils.dirichlet_like(utils.obj_array_uniform(num_states), scale=1.0)
+
+        qs_visited = utils.obj_array_from_list([np.array([0.5, 0.5, 0.0, 0.0]), np.array([0.0, 1.0, 0.0])])
+        qB = pB
+        for t in range(10):
+            qB = learning.update_state_likelihood_dirichlet(qB, B, np.array([t % 2, 0]), qs_visited, qs_visited)
+        qD = learning.update_state_prior_dirichlet(pD, qs_visited)
+
+        F, occupancy = learning.score_state_reductions(qB, pB, qD, pD)
+
+        self.assertTrue(np.all(F[0][:2] > 0) and np.all(F[0][2:] < 0))
+        self.assertTrue(F[1][1] > 0 and F[1][0] < 0 and F[1][2] < 0)
+        self.assertTrue(np.allclose(occupancy[0], [5.5, 5.5, 0.0, 0.0]))
+
 
         
 if __name__ == "__main__":
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Unit Tests for shared and compiled generative models
+
+__author__: Conor Heins, Alexander Tschantz, Daphne Demekas, Brennan Klein
+
+"""
+
+import unittest
+
+import numpy as np
+
+from pymdp.agent import Agent
+from pymdp.model import SharedModel, CompiledModel
+from pymdp import utils, control
+
+class TestModel(unittest.TestCase):
+
+    def test_shared_model_copy_on_write(self):
+        """
+        Tests that agents constructed from a ``SharedModel`` reference its arrays, and that learning only materializes
+        copies of the modalities / factors that are actually updated
+        """
+
+        num_obs = [3, 4]
+        num_states = [3, 2]
+        num_controls = [2, 2]
+
+        A = utils.random_A_matrix(num_obs, num_states)
+        B = utils.random_B_matrix(num_states, num_controls)
+        pA = utils.dirichlet_like(A, scale=1.0)
+        pB = utils.dirichlet_like(B, scale=1.0)
+
+        model = SharedModel(A, B, pA=pA, pB=pB)
+        A_shared = utils.obj_array_from_list([A_m.copy() for A_m in model.A])
+
+        learner = Agent.from_shared_model(model, modalities_to_learn=[0], factors_to_learn=[1], save_belief_hist=True)
+        followers = [Agent.from_shared_model(model) for _ in range(3)]
+
+        # before learning, all agents reference the shared arrays
+        for agent in [learner] + followers:
+            for name, shared in model.shares_memory(agent).items():
+                self.assertTrue(all(shared), name)
+
+        for t in range(3):
+            obs = [np.random.randint(no) for no in num_obs]
+            for agent in [learner] + followers:
+                agent.infer_states(obs)
+                agent.infer_policies()
+                agent.sample_action()
+            learner.update_A(obs)
+            if t > 0:
+                learner.update_B(learner.qs_hist[-2])
+
+        # the learner only owns copies of the modality and factor it learns about
+        sharing = model.shares_memory(learner)
+        self.assertEqual(sharing["A"], [False, True])
+        self.assertEqual(sharing["pA"], [False, True])
+        self.assertEqual(sharing["B"], [True, False])
+        self.assertEqual(sharing["pB"], [True, False])
+
+        # the shared model is unchanged, and the other agents still reference it
+        for m in range(len(num_obs)):
+            self.assertTrue(np.array_equal(model.A[m], A_shared[m]))
+        for agent in followers:
+            for name, shared in model.shares_memory(agent).items():
+                self.assertTrue(all(shared), name)
+
+        # the shared arrays cannot be modified in-place
+        with self.assertRaises(ValueError):
+            followers[0].A[0][0] = 1.0
+
+    def test_compiled_model(self):
+        """
+        Tests that agents constructed from a ``CompiledModel`` share its derived structures, and behave identically to agents
+        constructed with the same arguments by the ``Agent`` constructor
+        """
+
+        num_obs = [3, 4]
+        num_states = [3, 2, 3]
+        num_controls = [2, 1, 3]
+        A_factor_list = [[0, 1], [1, 2]]
+        B_factor_list = [[0, 2], [1], [2]]
+
+        A = utils.random_A_matrix(num_obs, num_states, A_factor_list=A_factor_list)
+        B = utils.random_B_matrix(num_states, num_controls, B_factor_list=B_factor_list)
+        C = utils.obj_array_from_list([np.random.randn(no) for no in num_obs])
+        pA = utils.dirichlet_like(A, scale=1.0)
+
+        for inference_algo in ["VANILLA", "MMP"]:
+            structure = dict(A_factor_list=A_factor_list, B_factor_list=B_factor_list, policy_len=2, inference_algo=inference_algo, inference_horizon=2)
+            model = CompiledModel(A, B, C=C, pA=pA, **structure)
+
+            compiled = [Agent.from_compiled(model, lr_pA=0.5, save_belief_hist=True) for _ in range(2)]
+            reference = Agent(A=A, B=B, C=C, pA=pA, lr_pA=0.5, save_belief_hist=True, **structure)
+
+            self.assertIs(compiled[0].policies, compiled[1].policies)
+            self.assertIs(compiled[0].mb_dict, model.mb_dict)
+            self.assertIsNot(compiled[0].qs_hist, compiled[1].qs_hist)
+            self.assertEqual(compiled[0].lr_pA, 0.5)
+            self.assertEqual(compiled[0].gamma, reference.gamma)
+
+            for t in range(3):
+                obs = [np.random.randint(no) for no in num_obs]
+                for agent in compiled + [reference]:
+                    np.random.seed(t)
+                    agent.infer_states(obs)
+                    agent.infer_policies()
+                    agent.sample_action()
+                if inference_algo == "VANILLA":
+                    compiled[0].update_A(obs)
+                    reference.update_A(obs)
+
+                self.assertTrue(np.allclose(compiled[0].q_pi, reference.q_pi))
+                self.assertTrue(np.array_equal(compiled[0].action, reference.action))
+
+            for m in range(len(num_obs)):
+                self.assertTrue(np.allclose(compiled[0].A[m], reference.A[m]))
+                self.assertIs(compiled[1].A[m], model.A[m])
+            self.assertEqual(len(compiled[1].qs_hist), 3)
+
+        # structural arguments cannot be given per-agent
+        with self.assertRaises(ValueError):
+            Agent.from_compiled(model, policy_len=1)
+
+    def test_compiled_model_inductive_matrices(self):
+        """
+        Tests that agents constructed from the same ``CompiledModel`` keep their own inductive matrices ``I`` up to date while learning
+        """
+
+        A = utils.obj_array_from_list([np.eye(3)])
+        B = utils.obj_array_from_list([utils.norm_dist(np.eye(3)[:, :, None] + 1e-3)])
+        pB = utils.dirichlet_like(B, scale=1.0)
+        H = utils.obj_array_from_list([utils.onehot(2, 3)])
+
+        model = CompiledModel(A, B, pB=pB, H=H, ii_depth=4)
+        agents = [Agent.from_compiled(model) for _ in range(2)]
+
+        # both agents learn the same new transition, one after the other
+        for agent in agents:
+            agent.action = np.array([0])
+            agent.qs = utils.obj_array_from_list([utils.onehot(1, 3)])
+            agent.update_B(utils.obj_array_from_list([utils.onehot(2, 3)]))
+
+            I_ref = control.backwards_induction(agent.H, agent.B, agent.B_factor_list, threshold=agent.ii_threshold, depth=agent.ii_depth)
+            self.assertTrue(np.array_equal(agent.I[0], I_ref[0]))
+        self.assertFalse(np.array_equal(model.agent_state()["I"][0], agents[0].I[0]))
+
+if __name__ == "__main__":
+    unittest.main()
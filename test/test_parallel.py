@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Unit Tests for sharing generative models between processes
+
+__author__: Conor Heins, Alexander Tschantz, Daphne Demekas, Brennan Klein
+
+"""
+
+import multiprocessing
+import pickle
+import unittest
+
+import numpy as np
+
+from pymdp.agent import Agent
+from pymdp.model import CompiledModel
+from pymdp import parallel
+from pymdp.parallel import SharedMemoryModel
+from pymdp import utils
+
+def infer_in_worker(handle, obs):
+    """ Runs state and policy inference with an agent built from the handle of a shared model, in a worker process """
+    agent = Agent.from_shared_memory(handle)
+    qs = agent.infer_states(obs)
+    q_pi, _ = agent.infer_policies()
+    return [qs_f for qs_f in qs], q_pi, agent.A[0].flags.writeable
+
+def detach_in_worker(handle):
+    """ Attaches to a shared model in a worker process, and detaches from it once (and only once) the arrays that reference it are deleted """
+    params = handle.attach()
+    total = float(params["A"][0].sum())
+    try:
+        handle.detach()
+        detached_while_referenced = True
+    except BufferError:
+        detached_while_referenced = False
+    del params
+    handle.detach()
+    return total, detached_while_referenced, handle.name in parallel._ATTACHED
+
+class TestParallel(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(0)
+        self.num_obs, self.num_states, self.num_controls = [3, 4], [3, 2], [2, 2]
+        self.A = utils.random_A_matrix(self.num_obs, self.num_states)
+        self.B = utils.random_B_matrix(self.num_states, self.num_controls)
+        self.C = utils.obj_array_from_list([np.array([1.0, 0.0, -1.0]), np.zeros(4)])
+
+    def test_attach_zero_copy(self):
+        """
+        Tests that the arrays rebuilt from a handle are read-only views onto the shared block, with the values of the original model
+        """
+
+        pA = utils.dirichlet_like(self.A)
+        with SharedMemoryModel(self.A, self.B, C=self.C, pA=pA, A_factor_list=[[0, 1], [0, 1]]) as model:
+            handle = pickle.loads(pickle.dumps(model.handle))
+            self.assertLess(len(pickle.dumps(handle)), 2048)
+            self.assertEqual(handle.nbytes, sum(arr.nbytes for arr in list(self.A) + list(self.B) + list(self.C) + list(pA)))
+
+            params = handle.attach()
+            for name, obj_arr in [("A", self.A), ("B", self.B), ("C", self.C), ("pA", pA)]:
+                for shared, original in zip(params[name], obj_arr):
+                    self.assertTrue(np.array_equal(shared, original))
+                    self.assertFalse(shared.flags.writeable)
+            self.assertIsNone(params["D"])
+            self.assertEqual(params["A_factor_list"], [[0, 1], [0, 1]])
+
+            # attaching again references the same memory
+            self.assertTrue(np.shares_memory(params["B"][1], handle.attach()["B"][1]))
+
+    def test_agent_from_shared_memory(self):
+        """
+        Tests that agents built from a shared model behave as agents built from the original arrays, and that learning is copy-on-write
+        """
+
+        obs = [1, 2]
+        reference = Agent(A=self.A, B=self.B, C=self.C, pA=utils.dirichlet_like(self.A), lr_pA=0.5)
+        qs_ref = reference.infer_states(obs)
+        q_pi_ref, _ = reference.infer_policies()
+
+        with SharedMemoryModel.from_agent(reference) as model:
+            agent = Agent.from_shared_memory(model.handle, lr_pA=0.5)
+            qs = agent.infer_states(obs)
+            q_pi, _ = agent.infer_policies()
+            for f in range(len(qs)):
+                self.assertTrue(np.allclose(qs[f], qs_ref[f]))
+            self.assertTrue(np.allclose(q_pi, q_pi_ref))
+
+            # learning copies the updated arrays, and leaves the shared ones unchanged
+            agent.update_A(obs)
+            reference.update_A(obs)
+            shared = model.handle.attach()
+            for m in range(len(self.A)):
+                self.assertTrue(np.allclose(agent.A[m], reference.A[m]))
+                self.assertTrue(np.allclose(agent.pA[m], reference.pA[m]))
+                self.assertFalse(np.shares_memory(agent.pA[m], shared["pA"][m]))
+                self.assertTrue(np.allclose(shared["A"][m], self.A[m]))
+                self.assertTrue(np.allclose(shared["pA"][m], utils.dirichlet_like(self.A)[m]))
+            self.assertFalse(np.allclose(agent.pA[0], shared["pA"][0]))
+
+            # the same handle can be used to compile a model
+            compiled = CompiledModel(**model.handle.attach())
+            self.assertEqual(len(compiled.policies), len(reference.policies))
+
+    def test_workers(self):
+        """
+        Tests that worker processes, which only receive the handle of the model, build agents that infer the same beliefs as in the parent
+        """
+
+        observations = [[0, 1], [2, 3], [1, 0]]
+        with SharedMemoryModel(self.A, self.B, C=self.C) as model:
+            with multiprocessing.get_context("spawn").Pool(2) as pool:
+                results = pool.starmap(infer_in_worker, [(model.handle, obs) for obs in observations])
+
+        for obs, (qs, q_pi, writeable) in zip(observations, results):
+            agent = Agent(A=self.A, B=self.B, C=self.C)
+            qs_ref = agent.infer_states(obs)
+            q_pi_ref, _ = agent.infer_policies()
+            for f in range(len(qs)):
+                self.assertTrue(np.allclose(qs[f], qs_ref[f]))
+            self.assertTrue(np.allclose(q_pi, q_pi_ref))
+            self.assertFalse(writeable)
+
+    def test_detach(self):
+        """
+        Tests that a worker process can release its mapping of a shared model once it no longer references it, while the owner keeps the model
+        """
+
+        with SharedMemoryModel(self.A, self.B) as model:
+            with multiprocessing.get_context("spawn").Pool(1) as pool:
+                total, detached_while_referenced, still_attached = pool.apply(detach_in_worker, (model.handle,))
+
+            self.assertTrue(np.isclose(total, self.A[0].sum()))
+            self.assertFalse(detached_while_referenced)
+            self.assertFalse(still_attached)
+
+            # detaching has no effect in the process that owns the model
+            model.handle.detach()
+            self.assertTrue(np.array_equal(model.handle.attach()["B"][0], self.B[0]))
+
+if __name__ == "__main__":
+    unittest.main()
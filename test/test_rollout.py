@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Unit Tests for running agent-environment episodes
+
+__author__: Conor Heins, Alexander Tschantz, Daphne Demekas, Brennan Klein
+
+"""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from pymdp import rollout
+from pymdp.agent import Agent
+from pymdp.envs import TMazeEnv
+
+# the factories are defined at module level, so that they can be sent to worker processes
+
+def tmaze_agent(inference_algo="VANILLA"):
+    env = TMazeEnv()
+    agent = Agent(A=env.get_likelihood_dist(), B=env.get_transition_dist(), control_fac_idx=[0], inference_algo=inference_algo, policy_sep_prior=False)
+    agent.C[1][1] = 3.0
+    agent.C[1][2] = -3.0
+    return agent
+
+def tmaze_mmp_agent():
+    return tmaze_agent(inference_algo="MMP")
+
+class TestRollout(unittest.TestCase):
+
+    def test_run_episodes(self):
+        """
+        Tests the shapes and contents of the recorded trajectories, against the agent and environment of each episode
+        """
+
+        num_episodes, T = 6, 4
+        trajectories = rollout.run_episodes(tmaze_agent, TMazeEnv, num_episodes, T, seed=0)
+
+        self.assertEqual(trajectories["obs"].shape, (num_episodes, T, 3))
+        self.assertEqual(trajectories["actions"].shape, (num_episodes, T, 2))
+        self.assertEqual(trajectories["qs_0"].shape, (num_episodes, T, 4))
+        self.assertEqual(trajectories["qs_1"].shape, (num_episodes, T, 2))
+        self.assertEqual(trajectories["q_pi"].shape, (num_episodes, T, 4))
+        self.assertEqual(trajectories["G"].shape, (num_episodes, T, 4))
+
+        # every episode starts in the centre location, and moves to the location chosen by the previous action
+        self.assertTrue(np.all(trajectories["obs"][:, 0, 0] == 0))
+        self.assertTrue(np.array_equal(trajectories["obs"][:, 1:, 0], trajectories["actions"][:, :-1, 0]))
+        self.assertTrue(np.allclose(trajectories["q_pi"].sum(axis=-1), 1.0))
+        self.assertTrue(np.allclose(trajectories["qs_1"].sum(axis=-1), 1.0))
+
+        # the same episode can be reproduced by hand, from its beliefs
+        agent = tmaze_agent()
+        qs = agent.infer_states(list(trajectories["obs"][0, 0]))
+        q_pi, G = agent.infer_policies()
+        self.assertTrue(np.allclose(qs[1], trajectories["qs_1"][0, 0]))
+        self.assertTrue(np.allclose(q_pi, trajectories["q_pi"][0, 0]))
+        self.assertTrue(np.allclose(G, trajectories["G"][0, 0]))
+
+    def test_deterministic_seeding(self):
+        """
+        Tests that the trajectories only depend on the seed, and not on the chunking of the episodes or on the global random state
+        """
+
+        np.random.seed(1)
+        first = rollout.run_episodes(tmaze_agent, TMazeEnv, 8, 3, seed=2)
+        state = np.random.get_state()
+        np.random.seed(3)
+        second = rollout.run_episodes(tmaze_agent, TMazeEnv, 8, 3, seed=2, chunk_size=3)
+
+        for name in first:
+            self.assertTrue(np.array_equal(first[name], second[name]))
+
+        # running the episodes leaves the global random state of the caller unchanged
+        np.random.set_state(state)
+        expected = np.random.rand()
+        np.random.set_state(state)
+        rollout.run_episodes(tmaze_agent, TMazeEnv, 2, 2, seed=2)
+        self.assertEqual(np.random.rand(), expected)
+
+        other = rollout.run_episodes(tmaze_agent, TMazeEnv, 8, 3, seed=4)
+        self.assertFalse(np.array_equal(first["obs"], other["obs"]))
+
+    def test_worker_pool_and_memmap_output(self):
+        """
+        Tests that the episodes run across a pool of worker processes, or written to memory-mapped files, are the same as the ones run serially
+        """
+
+        serial = rollout.run_episodes(tmaze_agent, TMazeEnv, 6, 3, seed=5)
+        parallel = rollout.run_episodes(tmaze_agent, TMazeEnv, 6, 3, seed=5, num_workers=2)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            out_dir = os.path.join(tmpdir, "episodes")
+            rollout.run_episodes(tmaze_agent, TMazeEnv, 6, 3, seed=5, num_workers=2, out_dir=out_dir, chunk_size=4)
+            loaded = rollout.load_episodes(out_dir)
+
+            self.assertIsInstance(loaded["obs"], np.memmap)
+            for name in serial:
+                self.assertTrue(np.array_equal(serial[name], parallel[name]))
+                self.assertTrue(np.array_equal(serial[name], loaded[name]))
+
+            with self.assertRaises(FileNotFoundError):
+                rollout.load_episodes(tmpdir)
+
+    def test_mmp_beliefs(self):
+        """
+        Tests that with marginal message passing, the recorded beliefs are distributions over the hidden states of the current timestep
+        """
+
+        trajectories = rollout.run_episodes(tmaze_mmp_agent, TMazeEnv, 2, 3, seed=6)
+        self.assertTrue(np.allclose(trajectories["qs_0"].sum(axis=-1), 1.0))
+        self.assertTrue(np.allclose(trajectories["qs_0"][:, 0, 0], 1.0)) # the agent observes that it starts in the centre location
+
+if __name__ == "__main__":
+    unittest.main()
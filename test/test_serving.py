@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Unit Tests for serving agent sessions with micro-batching
+
+__author__: Conor Heins, Alexander Tschantz, Daphne Demekas, Brennan Klein
+
+"""
+
+import asyncio
+import unittest
+
+import numpy as np
+
+from pymdp import utils
+from pymdp.agent import Agent
+from pymdp.serving import AgentServer
+
+class StubEnv(object):
+    """ Local stand-in for an external simulator, that returns random observations (which depend on the latest action) after a random delay """
+
+    def __init__(self, num_obs, seed):
+        self.num_obs = num_obs
+        self.rng = np.random.default_rng(seed)
+
+    async def step(self, action):
+        await asyncio.sleep(self.rng.random() * 1e-3)
+        offset = 0 if action is None else int(action[0])
+        return [(int(self.rng.integers(no)) + offset) % no for no in self.num_obs]
+
+class TestServing(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(0)
+        self.num_obs, self.num_states, self.num_controls = [3, 4], [3, 2], [3, 1]
+        self.A = utils.random_A_matrix(self.num_obs, self.num_states)
+        self.B = utils.random_B_matrix(self.num_states, self.num_controls)
+        self.C = utils.obj_array_from_list([np.array([1.0, 0.0, -1.0]), np.zeros(4)])
+
+    def test_sessions_match_agents(self):
+        """
+        Tests that concurrent sessions, whose requests are batched together, have the same beliefs as independent ``Agent`` instances
+        given the same observations
+        """
+
+        num_sessions, T = 6, 4
+
+        async def run_session(server, env):
+            session = server.new_session()
+            history = []
+            obs = await env.step(None)
+            for _ in range(T):
+                action = await session.step(obs)
+                history.append((obs, session.qs, session.q_pi, action))
+                obs = await env.step(action)
+            return history
+
+        async def run_all():
+            async with AgentServer(A=self.A, B=self.B, C=self.C, max_batch_size=4, max_delay=0.01) as server:
+                histories = await asyncio.gather(*[run_session(server, StubEnv(self.num_obs, seed)) for seed in range(num_sessions)])
+            return server, histories
+
+        server, histories = asyncio.run(run_all())
+
+        self.assertEqual(server.num_requests, num_sessions * T)
+        self.assertLess(server.num_batches, num_sessions * T) # some of the requests have been batched together
+
+        for history in histories:
+            agent = Agent(A=self.A, B=self.B, C=self.C)
+            for obs, qs, q_pi, action in history:
+                qs_agent = agent.infer_states(obs)
+                q_pi_agent, _ = agent.infer_policies()
+                agent.sample_action()
+                agent.action = action # ties between actions may be broken differently
+
+                for f in range(len(qs)):
+                    self.assertTrue(np.allclose(qs[f], qs_agent[f]))
+                self.assertTrue(np.allclose(q_pi, q_pi_agent))
+
+    def test_requests_of_a_session_run_in_order(self):
+        """
+        Tests that several requests queued at once for the same session are run in separate batches, in order
+        """
+
+        async def run():
+            async with AgentServer(A=self.A, B=self.B, C=self.C, max_batch_size=8, max_delay=0.01) as server:
+                session = server.new_session()
+                await asyncio.gather(*[session.step([0, 0]) for _ in range(3)])
+            return server, session
+
+        server, session = asyncio.run(run())
+        self.assertEqual(session.curr_timestep, 3)
+        self.assertEqual(server.num_batches, 3)
+
+    def test_server_errors(self):
+        """
+        Tests that requests fail when the server is not started, and that errors raised while running a batch are passed on to the callers
+        """
+
+        server = AgentServer(A=self.A, B=self.B, C=self.C)
+        session = server.new_session()
+
+        with self.assertRaises(RuntimeError):
+            asyncio.run(session.step([0, 0]))
+
+        async def run():
+            async with server:
+                return await session.step([0, 5]) # out-of-range observation index
+
+        with self.assertRaises(IndexError):
+            asyncio.run(run())
+        self.assertEqual(session.curr_timestep, 0)
+
+if __name__ == "__main__":
+    unittest.main()
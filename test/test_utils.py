@@ -7,11 +7,15 @@ __author__: Conor Heins, Alexander Tschantz, Daphne Demekas, Brennan Klein
 
 """
 
+import os
+import pickle
+import tempfile
 import unittest
 
 import numpy as np
 
-from pymdp import utils
+from pymdp import utils, maths, control, inference
+from pymdp.agent import Agent
 
 class TestUtils(unittest.TestCase):
     def test_obj_array_from_list(self):
@@ -24,5 +28,206 @@ class TestUtils(unittest.TestCase):
         
         self.assertTrue(all([np.all(a == b) for a, b in zip(arrs, obs_arrs)]))
 
+    def test_policy_belief_array(self):
+        """
+        Tests that `PolicyBeliefArray` supports the nested policy->timepoint->factor indexing of object arrays, 
+        and that indexing/slicing returns views onto the dense per-factor arrays
+        """
+
+        num_policies, num_timesteps, num_states = 4, 3, [2, 5]
+
+        qs_seq_pi = utils.obj_array(num_policies)
+        for p_idx in range(num_policies):
+            qs_seq_pi[p_idx] = utils.obj_array(num_timesteps)
+            for t in range(num_timesteps):
+                qs_seq_pi[p_idx][t] = utils.random_single_categorical(num_states)
+
+        beliefs = utils.PolicyBeliefArray.from_obj_array(qs_seq_pi)
+
+        self.assertEqual(beliefs.shape, (num_policies, num_timesteps))
+        self.assertEqual(len(beliefs), num_policies)
+        self.assertEqual(len(beliefs[0]), num_timesteps)
+        for f, ns in enumerate(num_states):
+            self.assertEqual(beliefs.factor_arrays[f].shape, (num_policies, num_timesteps, ns))
+
+        for p_idx in range(num_policies):
+            for t in range(num_timesteps):
+                for f in range(len(num_states)):
+                    self.assertTrue(np.allclose(beliefs[p_idx][t][f], qs_seq_pi[p_idx][t][f]))
+        
+        # fancy indexing over factors, as done when picking out the parents of a modality or factor
+        sub_factors = beliefs[1][2][[1]]
+        self.assertTrue(np.allclose(sub_factors[0], qs_seq_pi[1][2][1]))
+
+        # slicing returns views onto the same memory
+        future = beliefs[:, -2:]
+        self.assertEqual(future.shape, (num_policies, 2))
+        future[0][0][0][:] = 0.5
+        self.assertTrue(np.allclose(beliefs[0][1][0], 0.5))
+
+        # conversion back to nested object arrays copies the data
+        nested = beliefs.to_obj_array()
+        nested[0][0][0][:] = 0.0
+        self.assertFalse(np.allclose(beliefs[0][0][0], 0.0))
+
+        uniform = utils.PolicyBeliefArray.uniform(num_policies, num_timesteps, num_states)
+        self.assertTrue(all([utils.is_normalized(uniform[p_idx][t]) for p_idx in range(num_policies) for t in range(num_timesteps)]))
+
+    def test_belief_history(self):
+        """
+        Tests the ring-buffer storage of belief histories, with marginal and policy-conditioned beliefs, bounded and unbounded retention,
+        and memory-mapped backing files
+        """
+
+        num_states = [3, 2]
+
+        # bounded retention: only the latest `maxlen` entries are kept
+        history = utils.BeliefHistory([(ns,) for ns in num_states], maxlen=3)
+        qs_all = [utils.random_single_categorical(num_states) for _ in range(5)]
+        for qs in qs_all:
+            history.append(qs)
+        self.assertEqual(len(history), 3)
+        self.assertEqual(history.capacity, 3)
+        self.assertEqual(history.num_discarded, 2)
+        for idx, qs in enumerate(qs_all[-3:]):
+            for f in range(len(num_states)):
+                self.assertTrue(np.allclose(history[idx][f], qs[f]))
+        self.assertTrue(np.allclose(history[-1][1], qs_all[-1][1]))
+        with self.assertRaises(IndexError):
+            history[3]
+
+        # unbounded retention: the buffers grow as needed
+        history = utils.BeliefHistory([(ns,) for ns in num_states])
+        qs_all = [utils.random_single_categorical(num_states) for _ in range(40)]
+        for qs in qs_all:
+            history.append(qs)
+        self.assertEqual(len(history), 40)
+        for idx, qs in enumerate(qs_all):
+            self.assertTrue(np.allclose(history[idx][0], qs[0]))
+
+        # policy-conditioned beliefs whose temporal window grows, backed by memory-mapped files
+        with tempfile.TemporaryDirectory() as tmpdir:
+            history = utils.BeliefHistory([(4, 3, ns) for ns in num_states], maxlen=2, memmap_dir=tmpdir)
+            beliefs_all = [utils.PolicyBeliefArray.uniform(4, T, num_states) for T in [1, 2, 3]]
+            for beliefs in beliefs_all:
+                beliefs.factor_arrays[0][:] = np.random.rand(*beliefs.factor_arrays[0].shape)
+                history.append(beliefs)
+            self.assertEqual(len(history), 2)
+            for idx, beliefs in enumerate(beliefs_all[1:]):
+                self.assertIsInstance(history[idx], utils.PolicyBeliefArray)
+                self.assertEqual(history[idx].shape, beliefs.shape)
+                self.assertTrue(np.allclose(history[idx].factor_arrays[0], beliefs.factor_arrays[0]))
+            self.assertTrue(os.path.exists(os.path.join(tmpdir, "factor_0.npy")))
+            del history
+
+        with self.assertRaises(ValueError):
+            utils.BeliefHistory([(3,)], memmap_dir="history")
+
+    def test_sparsify_factor_lists(self):
+        """
+        Tests that the factors that each modality and each factor's dynamics are independent of are detected and removed, both by
+        `reduce_a_matrix` and by `sparsify_factor_lists`
+        """
+
+        num_obs = [3, 4]
+        num_states = [2, 3, 4]
+        num_controls = [2, 1, 3]
+
+        # the modalities only depend on factors [1] and [0, 2], and the dynamics of factor 2 only on factors 1 and 2
+        A_sparse = utils.random_A_matrix(num_obs, num_states, A_factor_list=[[1], [0, 2]])
+        B_sparse = utils.random_B_matrix(num_states, num_controls, B_factor_list=[[0], [1], [1, 2]])
+
+        A = utils.obj_array(2)
+        A[0] = np.tile(A_sparse[0][:, None, :, None], (1, 2, 1, 4))
+        A[1] = np.tile(A_sparse[1][:, :, None, :], (1, 1, 3, 1))
+        B = utils.obj_array(3)
+        B[0] = np.tile(B_sparse[0][:, :, None, None, :], (1, 1, 3, 4, 1))
+        B[1] = B_sparse[1]
+        B[2] = np.tile(B_sparse[2][:, None, :, :, :], (1, 2, 1, 1, 1))
+        B_factor_list = [[0, 1, 2], [1], [0, 1, 2]]
+
+        A_reduced_0, factor_idx_0 = utils.reduce_a_matrix(A[0])
+        self.assertEqual(factor_idx_0, [1])
+        self.assertTrue(np.allclose(A_reduced_0, A_sparse[0]))
+
+        pA = utils.dirichlet_like(A, scale=2.0)
+        A_r, B_r, pA_r, pB_r, A_factor_list, B_factor_list = utils.sparsify_factor_lists(A, B, B_factor_list=B_factor_list, pA=pA)
+
+        self.assertEqual(A_factor_list, [[1], [0, 2]])
+        self.assertEqual(B_factor_list, [[0], [1], [1, 2]])
+        self.assertIsNone(pB_r)
+        for m in range(len(num_obs)):
+            self.assertTrue(np.allclose(A_r[m], A_sparse[m]))
+            self.assertTrue(np.allclose(pA_r[m], 2.0 * A_sparse[m]))
+        for f in range(len(num_states)):
+            self.assertTrue(np.allclose(B_r[f], B_sparse[f]))
+
+        # a factor is kept if the Dirichlet parameters depend on it
+        pA[0] = pA[0].copy()
+        pA[0][0, 1, 0, 0] += 1.0
+        _, _, _, _, A_factor_list, _ = utils.sparsify_factor_lists(A, B, B_factor_list=B_factor_list, pA=pA)
+        self.assertEqual(A_factor_list[0], [0, 1, 2])
+
+    def test_ragged(self):
+        """
+        Tests that a ``Ragged`` stores its arrays as views onto one buffer, that its vectorized operations agree with the per-array ones,
+        and that it is accepted in place of object arrays
+        """
+
+        num_obs = [3, 4]
+        num_states = [3, 2]
+        num_controls = [2, 2]
+        A = utils.random_A_matrix(num_obs, num_states)
+        B = utils.random_B_matrix(num_states, num_controls)
+        qs = utils.random_single_categorical(num_states)
+
+        A_ragged = utils.Ragged.from_arrays(A)
+        qs_ragged = utils.Ragged.from_arrays(qs)
+        self.assertEqual(len(A_ragged), len(num_obs))
+        self.assertEqual(A_ragged[1].shape, A[1].shape)
+        self.assertTrue(np.shares_memory(A_ragged[1], A_ragged.buffer))
+        self.assertTrue(utils.is_obj_array(qs_ragged))
+        self.assertTrue(all(np.shares_memory(qs_f, qs_ragged.buffer) for qs_f in utils.to_obj_array(qs_ragged)))
+
+        # vectorized operations, on vectors and on multi-dimensional arrays
+        unnormed = utils.Ragged.from_arrays([np.random.rand(3), np.random.rand(4)])
+        logits = utils.Ragged.from_arrays([np.random.randn(3), np.random.randn(4)])
+        unnormed_A = utils.Ragged.from_arrays([np.random.rand(*A_m.shape) for A_m in A])
+        for i in range(2):
+            self.assertTrue(np.allclose(unnormed.normalize()[i], utils.norm_dist(unnormed[i])))
+            self.assertTrue(np.allclose(logits.softmax()[i], maths.softmax(logits[i])))
+            self.assertTrue(np.allclose(qs_ragged.log()[i], maths.spm_log_single(qs[i])))
+            self.assertTrue(np.allclose(unnormed_A.normalize()[i], utils.norm_dist(unnormed_A[i])))
+            self.assertTrue(np.allclose(unnormed_A.softmax()[i], maths.softmax(unnormed_A[i])))
+        self.assertTrue(np.allclose(utils.Ragged.uniform(num_states)[1], 0.5))
+
+        # writing into an array writes into the buffer
+        copied = qs_ragged.copy()
+        copied[0] = 1.0
+        self.assertTrue(np.all(copied.buffer[:num_states[0]] == 1.0))
+        self.assertTrue(np.allclose(qs_ragged[0], qs[0]))
+
+        # pickling only serializes the buffer and the shapes
+        unpickled = pickle.loads(pickle.dumps(A_ragged))
+        self.assertEqual(unpickled.shapes, A_ragged.shapes)
+        self.assertTrue(np.array_equal(unpickled.buffer, A_ragged.buffer))
+
+        # the core functions accept a `Ragged` in place of object arrays
+        obs = [1, 2]
+        for f, qs_f in enumerate(inference.update_posterior_states(A_ragged, obs, prior=qs_ragged)):
+            self.assertTrue(np.allclose(qs_f, inference.update_posterior_states(A, obs, prior=qs)[f]))
+        policy = np.array([[1, 0]])
+        qs_pi = control.get_expected_states(qs, B, policy)
+        qs_pi_ragged = control.get_expected_states(qs_ragged, utils.Ragged.from_arrays(B), policy)
+        for f in range(len(num_states)):
+            self.assertTrue(np.allclose(qs_pi[0][f], qs_pi_ragged[0][f]))
+
+        agent = Agent(A=A_ragged, B=utils.Ragged.from_arrays(B), pA=utils.Ragged.from_arrays(utils.dirichlet_like(A)))
+        agent.infer_states(obs)
+        agent.infer_policies()
+        agent.sample_action()
+        agent.update_A(obs)
+        self.assertTrue(np.array_equal(A_ragged.buffer, utils.Ragged.from_arrays(A).buffer)) # learning does not write into the buffer
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Unit Tests for the batched environments
+
+__author__: Conor Heins, Alexander Tschantz, Daphne Demekas, Brennan Klein
+
+"""
+
+import unittest
+
+import numpy as np
+
+from pymdp import utils
+from pymdp.envs import GridWorldEnv, TMazeEnv, VecEnv, GridWorldVecEnv, DGridWorldVecEnv, TMazeVecEnv, TMazeNullOutcomeVecEnv, VisualForagingVecEnv
+
+class TestVecEnv(unittest.TestCase):
+
+    def test_grid_world_matches_single_env(self):
+        """
+        Tests that every instance of a batched grid world follows the same trajectory as a ``GridWorldEnv`` given the same actions
+        """
+
+        num_envs, T = 6, 10
+        vec_env = GridWorldVecEnv(shape=[3, 4], num_envs=num_envs, seed=0)
+        states = vec_env.reset()
+
+        envs = [GridWorldEnv(shape=[3, 4], init_state=int(s)) for s in states]
+        for _ in range(T):
+            actions = vec_env.sample_action()
+            states = vec_env.step(actions)
+            self.assertTrue(np.array_equal(states, [env.step(a) for env, a in zip(envs, actions)]))
+
+        self.assertTrue(np.array_equal(vec_env.position, np.unravel_index(states, [3, 4])))
+
+    def test_one_dimensional_grid_world(self):
+        """
+        Tests the batched 1-D grid world, including resetting a subset of the instances
+        """
+
+        vec_env = DGridWorldVecEnv(shape=[1, 5], num_envs=3, seed=0)
+        self.assertTrue(np.array_equal(vec_env.reset(init_state=[0, 2, 4]), [0, 2, 4]))
+        self.assertTrue(np.array_equal(vec_env.step([0, 2, 2]), [0, 3, 4]))
+
+        self.assertTrue(np.array_equal(vec_env.reset(init_state=[1], env_ids=[2]), [1]))
+        self.assertTrue(np.array_equal(vec_env.position, [0, 3, 1]))
+
+    def test_partial_reset_keeps_other_streams(self):
+        """
+        Tests that resetting a subset of the instances leaves the trajectories of the other instances unchanged
+        """
+
+        trajectories = []
+        for reset_at in [None, 3]:
+            vec_env = TMazeVecEnv(num_envs=2, seed=1)
+            obs = [vec_env.reset()]
+            for t in range(200): # long enough for the buffers of random numbers to be refilled
+                if t == reset_at:
+                    vec_env.reset(env_ids=[1])
+                obs.append(vec_env.step(np.tile([[t % 4, 0]], (2, 1))))
+            trajectories.append(np.stack(obs))
+
+        self.assertTrue(np.array_equal(trajectories[0][:, 0], trajectories[1][:, 0]))
+
+    def test_tmaze(self):
+        """
+        Tests that the batched T-maze moves deterministically, and that the cue and reward observations are consistent with the reward condition of each instance
+        """
+
+        num_envs = 200
+        for vec_env, cue_offset in [(TMazeVecEnv(num_envs=num_envs, seed=1), 0), (TMazeNullOutcomeVecEnv(num_envs=num_envs, seed=1), 1)]:
+            obs = vec_env.reset()
+            self.assertTrue(np.all(obs[:, 0] == 0))
+
+            conditions = vec_env.reward_condition
+            self.assertTrue(0 < conditions.sum() < num_envs)
+
+            obs = vec_env.step(np.tile([3, 0], (num_envs, 1)))
+            self.assertTrue(np.all(obs[:, 0] == 3))
+            self.assertTrue(np.array_equal(obs[:, 2], conditions + cue_offset))
+
+            # with deterministic rewards, going to the arm of the reward condition is always rewarded
+            vec_env = TMazeVecEnv(reward_probs=[1.0, 0.0], num_envs=num_envs, seed=2)
+            vec_env.reset()
+            obs = vec_env.step(np.stack([vec_env.reward_condition + 1, np.zeros(num_envs, dtype=int)], axis=1))
+            self.assertTrue(np.all(obs[:, 1] == 1))
+
+    def test_tmaze_reward_statistics(self):
+        """
+        Tests that the rewards sampled by the batched T-maze follow the reward probabilities of the single-instance environment
+        """
+
+        num_envs = 5000
+        vec_env = TMazeVecEnv(reward_probs=[0.8, 0.2], num_envs=num_envs, seed=3)
+        vec_env.reset()
+        obs = vec_env.step(np.stack([vec_env.reward_condition + 1, np.zeros(num_envs, dtype=int)], axis=1))
+
+        A_reward = TMazeEnv(reward_probs=[0.8, 0.2]).get_likelihood_dist()[1]
+        self.assertAlmostEqual(np.mean(obs[:, 1] == 1), A_reward[1, 1, 0], delta=0.03)
+
+    def test_visual_foraging(self):
+        """
+        Tests that the batched visual foraging environment observes the features of the true scene of each instance
+        """
+
+        scenes = np.array([[[1, 2], [0, 1]], [[2, 0], [2, 1]]])
+        vec_env = VisualForagingVecEnv(scenes=scenes, num_envs=20, seed=4)
+        obs = vec_env.reset()
+        self.assertTrue(np.all(obs == 0))
+
+        for loc in range(1, 5):
+            obs = vec_env.step(np.tile([loc, 0], (20, 1)))
+            self.assertTrue(np.all(obs[:, 0] == loc))
+            self.assertTrue(np.array_equal(obs[:, 1], scenes.reshape(2, -1)[vec_env.true_scene, loc - 1]))
+
+    def test_per_instance_random_streams(self):
+        """
+        Tests that the trajectory of an instance only depends on the seed and its index, and not on the number of instances in the batch
+        """
+
+        A = utils.random_A_matrix([3, 4], [3, 2])
+        B = utils.random_B_matrix([3, 2], [2, 2])
+
+        def rollout(num_envs, seed):
+            vec_env = VecEnv(A, B, num_envs=num_envs, seed=seed)
+            obs = [vec_env.reset()]
+            for _ in range(300): # long enough to refill the random number buffers
+                obs.append(vec_env.step(vec_env.sample_action()))
+            return np.stack(obs)
+
+        few, many = rollout(2, seed=5), rollout(7, seed=5)
+        self.assertTrue(np.array_equal(few, many[:, :2]))
+        self.assertFalse(np.array_equal(few, rollout(2, seed=6)))
+
+        # the instances follow different trajectories
+        self.assertFalse(np.array_equal(many[:, 0], many[:, 1]))
+
+if __name__ == "__main__":
+    unittest.main()
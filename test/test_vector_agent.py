@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Vectorized Agent Class
+
+__author__: Conor Heins, Alexander Tschantz, Daphne Demekas, Brennan Klein
+
+"""
+
+import unittest
+
+import numpy as np
+
+from pymdp.agent import Agent
+from pymdp.vector_agent import VectorAgent
+from pymdp import utils
+
+def _stack_obj_arrays(obj_arrays):
+    """ Stacks a list of (per-agent) object arrays into one object array of batched sub-arrays """
+    return utils.obj_array_from_list([np.stack([arr[i] for arr in obj_arrays]) for i in range(len(obj_arrays[0]))])
+
+class TestVectorAgent(unittest.TestCase):
+
+    def _check_against_agents(self, vector_agent, agents, T=5):
+        """
+        Steps the ``VectorAgent`` and the list of independent ``Agent``s through the same observations, and checks that their beliefs
+        and actions coincide at every timestep
+        """
+
+        num_obs = vector_agent.num_obs
+        for t in range(T):
+            observations = np.array([[np.random.randint(no) for no in num_obs] for _ in agents])
+
+            qs = vector_agent.infer_states(observations)
+            q_pi, G = vector_agent.infer_policies()
+            actions = vector_agent.sample_action()
+
+            for n, agent in enumerate(agents):
+                qs_n = agent.infer_states(list(observations[n]))
+                q_pi_n, G_n = agent.infer_policies()
+                action_n = agent.sample_action()
+
+                for f in range(len(qs)):
+                    self.assertTrue(np.allclose(qs[f][n], qs_n[f]))
+                self.assertTrue(np.allclose(G[n], G_n))
+                self.assertTrue(np.allclose(q_pi[n], q_pi_n))
+
+                self.assertTrue(np.array_equal(actions[n], action_n))
+
+        self.assertEqual(vector_agent.curr_timestep, T)
+
+    def test_vector_agent_per_agent_A_and_C(self):
+        """
+        Tests that a ``VectorAgent`` with per-agent observation models and preferences (and a shared transition model, with interacting factors)
+        behaves identically to the corresponding independent ``Agent`` instances
+        """
+
+        num_agents = 4
+        num_obs = [3, 4]
+        num_states = [3, 2, 3]
+        num_controls = [2, 1, 3]
+        A_factor_list = [[0, 1], [1, 2]]
+        B_factor_list = [[0, 2], [1], [2]]
+
+        A_list = [utils.random_A_matrix(num_obs, num_states, A_factor_list=A_factor_list) for _ in range(num_agents)]
+        C_list = [utils.obj_array_from_list([np.random.randn(no) for no in num_obs]) for _ in range(num_agents)]
+        B = utils.random_B_matrix(num_states, num_controls, B_factor_list=B_factor_list)
+
+        vector_agent = VectorAgent(_stack_obj_arrays(A_list), B, num_agents, C=_stack_obj_arrays(C_list),
+                                   A_factor_list=A_factor_list, B_factor_list=B_factor_list, policy_len=2)
+        self.assertEqual(vector_agent.num_obs, num_obs)
+        self.assertEqual(vector_agent.num_states, num_states)
+
+        agents = [Agent(A=A_list[n], B=B, C=C_list[n], A_factor_list=A_factor_list, B_factor_list=B_factor_list, policy_len=2) for n in range(num_agents)]
+
+        self._check_against_agents(vector_agent, agents)
+
+    def test_vector_agent_per_agent_B(self):
+        """
+        Tests that a ``VectorAgent`` with per-agent transition models (and a shared observation model over all factors)
+        behaves identically to the corresponding independent ``Agent`` instances, for both action sampling modes
+        """
+
+        num_agents = 3
+        num_obs = [4]
+        num_states = [3, 2]
+        num_controls = [3, 2]
+
+        A = utils.random_A_matrix(num_obs, num_states)
+        C = utils.obj_array_from_list([np.random.randn(no) for no in num_obs])
+        B_list = [utils.random_B_matrix(num_states, num_controls) for _ in range(num_agents)]
+        D = utils.random_single_categorical(num_states)
+
+        for sampling_mode in ["marginal", "full"]:
+            vector_agent = VectorAgent(A, _stack_obj_arrays(B_list), num_agents, C=C, D=D, sampling_mode=sampling_mode)
+            agents = [Agent(A=A, B=B_list[n], C=C, D=D, sampling_mode=sampling_mode) for n in range(num_agents)]
+
+            self._check_against_agents(vector_agent, agents)
+
+    def test_vector_agent_stochastic(self):
+        """
+        Tests stochastic action selection and distributional observations, which should return valid actions and beliefs
+        """
+
+        num_agents = 6
+        num_obs = [3, 3]
+        num_states = [4]
+        num_controls = [3]
+
+        A = utils.random_A_matrix(num_obs, num_states)
+        B = utils.random_B_matrix(num_states, num_controls)
+
+        vector_agent = VectorAgent(A, B, num_agents, action_selection="stochastic")
+
+        for t in range(3):
+            observations = [utils.norm_dist(np.random.rand(num_agents, no).T).T for no in num_obs]
+            qs = vector_agent.infer_states(observations, distr_obs=True)
+            self.assertTrue(np.allclose(qs[0].sum(axis=1), 1.0))
+
+            q_pi, _ = vector_agent.infer_policies()
+            self.assertEqual(q_pi.shape, (num_agents, len(vector_agent.policies)))
+
+            actions = vector_agent.sample_action()
+            self.assertEqual(actions.shape, (num_agents, 1))
+            self.assertTrue(np.all((actions >= 0) & (actions < num_controls[0])))
+
+if __name__ == "__main__":
+    unittest.main()
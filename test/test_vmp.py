@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+""" Unit Tests of the numpy `run_vmp_factorized` function
+
+__author__: Conor Heins, Alexander Tschantz
+"""
+
+import unittest
+
+import numpy as np
+
+from pymdp import utils
+from pymdp.algos import run_vmp_factorized
+from pymdp.maths import get_joint_likelihood_seq_by_modality, spm_log_single, softmax
+
+def _expectation(X, qs_list, keep_axis=None):
+    """
+    Contracts every axis of ``X`` (except ``keep_axis``) with the corresponding marginal in ``qs_list``, one axis at a time
+    """
+    for axis in reversed(range(X.ndim)):
+        if axis != keep_axis:
+            X = np.tensordot(X, qs_list[axis], axes=([axis], [0]))
+    return X
+
+def _reference_vmp_update(lh_seq, A_factor_list, B, B_factor_list, actions, prior, qs_seq):
+    """
+    Loop-based (non-vectorized) computation of the parallel VMP fixed-point update of every marginal, used for validation
+    """
+
+    infer_len = len(qs_seq)
+    num_factors = len(B)
+    num_states = [B_f.shape[0] for B_f in B]
+
+    qs_new = utils.obj_array(infer_len)
+    for t in range(infer_len):
+        qs_new[t] = utils.obj_array(num_factors)
+        for f in range(num_factors):
+            ln_msg = np.zeros(num_states[f])
+
+            # likelihood messages
+            if t < len(lh_seq):
+                for m, factors_m in enumerate(A_factor_list):
+                    if f in factors_m:
+                        ln_lh = spm_log_single(lh_seq[t][m].reshape([num_states[g] for g in factors_m]))
+                        ln_msg += _expectation(ln_lh, [qs_seq[t][g] for g in factors_m], factors_m.index(f))
+
+            # message from the past
+            if t == 0:
+                ln_msg += spm_log_single(prior[f])
+            else:
+                ln_B = spm_log_single(B[f][..., actions[t-1, f]])
+                ln_msg += _expectation(ln_B, [None] + [qs_seq[t-1][g] for g in B_factor_list[f]], 0)
+
+            # messages from the future
+            if t < infer_len - 1:
+                for i, factors_i in enumerate(B_factor_list):
+                    if f in factors_i:
+                        ln_B = spm_log_single(B[i][..., actions[t, i]])
+                        ln_msg += _expectation(ln_B, [qs_seq[t+1][i]] + [qs_seq[t][g] for g in factors_i], 1 + factors_i.index(f))
+
+            qs_new[t][f] = softmax(ln_msg)
+
+    return qs_new
+
+class TestVMP(unittest.TestCase):
+
+    def test_vmp_single_timestep(self):
+        """
+        With one observation and a one-step inference window, a single VMP iteration with ``tau = 1.0`` should return the exact posterior
+        for a single hidden state factor
+        """
+
+        num_obs = [4]
+        num_states = [3]
+        num_controls = [2]
+
+        A = utils.random_A_matrix(num_obs, num_states)
+        B = utils.random_B_matrix(num_states, num_controls)
+        prior = utils.random_single_categorical(num_states)
+        mb_dict = {'A_factor_list': [[0]], 'A_modality_list': [[0]]}
+
+        obs = [utils.onehot(1, num_obs[0])]
+        lh_seq = get_joint_likelihood_seq_by_modality(A, obs, num_states)
+
+        policy = np.zeros((1, 1), dtype=int)
+        qs_seq, _ = run_vmp_factorized(lh_seq, mb_dict, B, [[0]], policy, prior=prior, num_iter=1, tau=1.0, last_timestep=True)
+
+        qs_validation = utils.norm_dist(A[0][1,:] * prior[0])
+        self.assertEqual(len(qs_seq), 1)
+        self.assertTrue(np.allclose(qs_seq[0][0], qs_validation))
+
+    def test_vmp_fixed_point(self):
+        """
+        Checks that the vectorized messages computed by `run_vmp_factorized` match a loop-based computation, by
+        verifying that the converged beliefs are a fixed point of the reference (parallel) VMP update, for a model with
+        interacting hidden state factors in both the `A` and `B` arrays
+        """
+
+        num_obs = [3, 4]
+        num_states = [3, 2, 2]
+        num_controls = [2, 1, 2]
+        A_factor_list = [[0, 1], [1, 2]]
+        B_factor_list = [[0, 2], [1], [0, 2]]
+        mb_dict = {
+            'A_factor_list': A_factor_list,
+            'A_modality_list': [[m for m, f_list in enumerate(A_factor_list) if f in f_list] for f in range(len(num_states))]
+        }
+
+        A = utils.random_A_matrix(num_obs, num_states, A_factor_list=A_factor_list)
+        B = utils.random_B_matrix(num_states, num_controls, B_factor_list=B_factor_list)
+        prior = utils.random_single_categorical(num_states)
+
+        past_len = 3
+        obs = [[np.random.randint(n) for n in num_obs] for _ in range(past_len)]
+        obs = utils.process_observation_seq(obs, len(num_obs), num_obs)
+        lh_seq = get_joint_likelihood_seq_by_modality(A, obs, num_states)
+
+        prev_actions = np.array([[np.random.randint(n) for n in num_controls] for _ in range(past_len - 1)])
+        policy = np.array([[1, 0, 1], [0, 0, 1]])
+
+        qs_seq, F = run_vmp_factorized(lh_seq, mb_dict, B, B_factor_list, policy, prev_actions=prev_actions, prior=prior, num_iter=200, tau=0.5)
+
+        self.assertEqual(len(qs_seq), past_len + policy.shape[0])
+        self.assertTrue(np.isfinite(F))
+
+        actions = np.vstack((prev_actions, policy))
+        qs_reference = _reference_vmp_update(lh_seq, A_factor_list, B, B_factor_list, actions, prior, qs_seq)
+
+        for t in range(len(qs_seq)):
+            for f in range(len(num_states)):
+                self.assertTrue(np.allclose(qs_seq[t][f], qs_reference[t][f], atol=1e-6))
+
+if __name__ == "__main__":
+    unittest.main()